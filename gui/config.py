@@ -10,7 +10,8 @@ from dataclasses import dataclass
 from gui.events import ApplyValueEvent, EVT_APPLY_VALUE
 from gui.widget import *
 from lib.common_data import common_data
-from lib.config import config, DataSaveFmt, SkinLoadWay, PlayerColorPickWay
+from lib.config import config, DataSaveFmt, SkinLoadWay, PlayerColorPickWay, PlotGapMode, \
+    PlotBackend
 from lib.data import MAX_SIZE
 from lib.skin import skin_mgr
 
@@ -226,11 +227,15 @@ class ConfigLinePanel(wx.SplitterWindow):
                 ConfigData("点/文件", "points_per_file", int, "每个文件存储的最大数据点数量", (100, 5000)),
                 ConfigData("点/保存", "saved_per_points", int, "获取多少个数据点后保存一次数据", (1, 20)),
                 ConfigData("数据加载线程数", "data_load_threads", int, "一般越大越快, 推荐 4-8", (1, 32)),
+                ConfigData("分析进程数", "analysis_workers", int,
+                           "数据点很多时, 按时间分片并使用多个进程计算玩家在线时间段\n设为 1 则不使用多进程 (进程启动的开销较大, 只在数据非常多时有用)", (1, 32)),
+                ConfigData("分析分片大小", "analysis_shard_points", int,
+                           "每个分片的数据点数量, 数据点总数超过该值时才会分片计算", (10000, 5000000)),
             ]),
             ConfigData("分析最短在线时间", "min_online_time", int,
                        "数据分析时使用的单次最小在线时间\n小于该时间忽略此次在线 (秒)", (0, 600)),
             ConfigData("数据空隙修复间隔", "fix_sep", float,
-                       "数据点之间的空隙大于该值时 (秒), 通过增加假数据点(不会保存至磁盘)自动修复",
+                       "数据点之间的空隙大于该值时 (秒), 在图表中按 空隙绘制方式 处理 (不会产生新的数据点)",
                        (100, 600)),
             ConfigData("服务器名", "server_name", str, "重启程序生效"),
             ConfigData("数据文件格式", "data_save_fmt", DataSaveFmt,
@@ -248,11 +253,24 @@ class ConfigLinePanel(wx.SplitterWindow):
                 ConfigData("图表线宽", "plot_line_width", float, range=(0.1, 5.0)),
                 ConfigData("图表线透明度", "plot_line_alpha", float, range=(0.0, 1.0)),
                 ConfigData("图表最大缩放", "plot_max_scale", float, range=(1.5, 400.0)),
+                ConfigData("空隙绘制方式", "plot_gap_mode", PlotGapMode,
+                           tip="数据点之间的空隙大于 数据空隙修复间隔 时的绘制方式",
+                           items_desc={
+                               PlotGapMode.BREAK: "断开折线",
+                               PlotGapMode.HOLD: "保持上一个值",
+                           }),
+                ConfigData("图表绘制方式", "plot_backend", PlotBackend,
+                           tip="原生绘制不会加载matplotlib, 启动更快, 适合性能较低的电脑\n重启程序生效",
+                           items_desc={
+                               PlotBackend.MATPLOTLIB: "matplotlib",
+                               PlotBackend.WX_NATIVE: "原生绘制 (轻量)",
+                           }),
             ]),
             ConfigGroup("全部玩家", [
                 ConfigData("启用获取全部玩家", "enable_full_players", bool, "重复获取服务器状态直到获取到全部玩家名称"),
-                ConfigData("FP循环获取间隔", "fp_re_status_inv", float, "重获全部玩家 的间隔", (1.0, 10.0)),
-                ConfigData("FP最大重试次数", "fp_max_try", int, "重获全部玩家 的最大重试次数", (2, 7))
+                ConfigData("FP每批请求数", "fp_burst_size", int, "重获全部玩家 时每批同时发出的请求数", (1, 16)),
+                ConfigData("FP批次间隔", "fp_burst_inv", float, "重获全部玩家 时两批请求的间隔", (0.0, 5.0)),
+                ConfigData("FP最大批次", "fp_max_try", int, "重获全部玩家 的最大批次数", (2, 7))
             ]),
             ConfigData("记录服务器延迟", "status_ping", bool,
                        "获取服务器信息时是否获取服务器延迟\n减少数据文件大小, 不影响之前的数据\n有极微小的性能提升"),
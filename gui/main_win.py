@@ -1,11 +1,6 @@
-from threading import Event
+from threading import Event, Lock
 from time import time, perf_counter
 
-from matplotlib import pyplot as plt
-from matplotlib import rcParams as mpl_rcParams
-from mcstatus import JavaServer
-from mcstatus.status_response import JavaStatusResponse
-
 from gui.about import AboutPanel
 from gui.config import ConfigPanel
 from gui.events import EVT_GET_STATUS_NOW, EVT_PAUSE_STATUS, EVT_SET_AS_OVERVIEW, SetAsOverviewEvent, \
@@ -14,93 +9,38 @@ from gui.overview import OverviewPanel, ServerStatus
 from gui.players_info import PlayerPanel
 from gui.status_plot import StatusPanel
 from gui.widget import *
+from lib.collector import MultiCollector, ServerMonitor, get_server_targets
 from lib.common_data import common_data
 from lib.data import *
+from lib.hour_stats import HourHistogramCache
+from lib.interval_index import SessionIndexCache
 from lib.perf import Counter
+from lib.player_index import PlayerIndex
 from lib.skin import skin_mgr
 
-mpl_rcParams["font.family"] = "Microsoft YaHei"
-plt.rcParams["axes.unicode_minus"] = False
 ID_SELECT_ALL = wx.NewIdRef(count=1)
 
 
-def translate_status(status: JavaStatusResponse, ping: float) -> ServerPoint:
-    """
-    将Java版服务器状态响应对象转换为ServerPoint对象。
-
-    此函数负责解析给定的Java版服务器状态响应（status），并结合服务器的ping值，
-    创建并返回一个ServerPoint对象，该对象包含了服务器的当前在线玩家数、玩家样本列表和ping值，
-    以及记录这些数据的时间点。
-
-    参数:
-    - status: JavaStatusResponse对象，包含了服务器状态的详细信息。
-    - ping: 浮点数，代表服务器的ping值，即网络延迟。
-
-    返回:
-    - ServerPoint对象，封装了记录时间、在线玩家数、玩家列表和ping值。
-    """
-
-    # 如果状态响应中的玩家列表存在，则直接使用；否则初始化为空列表
-    raw_players = status.players.sample if status.players.sample else []
-
-    # 通过列表推导式，将原始玩家样本列表中的每个玩家转换为Player对象
-    players = [Player(p.name, p.id) for p in raw_players]
-
-    # 创建并返回ServerPoint对象，包含当前时间、在线玩家数、玩家列表和ping值
-    return ServerPoint(
-        time(),
-        status.players.online,
-        players,
-        ping,
-    )
-
-
 class NameTitle(CenteredText):
-    def __init__(self, parent: wx.Window):
-        super().__init__(parent, label=config.server_name)
+    def __init__(self, parent: wx.Window, name: str):
+        super().__init__(parent, label=name)
         self.SetFont(ft(20))
 
 
-def get_server_status_raw(use_ping: bool = True) -> ServerPoint | None:
-    try:
-        server = JavaServer.lookup(config.addr, timeout=config.time_out)
-        status = server.status()
-    except Exception as e:
-        logger.warning(f"获取服务器状态失败: {e}")
-        return None
-    ping = 0
-    try:
-        if use_ping:
-            ping = server.ping()
-    except Exception as e:
-        logger.warning(f"获取延迟失败: {e}, 跳过检测")
-    point = translate_status(status, ping)
-    return point
-
-
-def get_server_status_retry(use_ping: bool = True) -> ServerPoint | None:
-    left_times = copy(config.retry_times)
-    while True:
-        point = get_server_status_raw(use_ping)
-        if point is not None:
-            return point
-        else:
-            left_times -= 1
-            if left_times == 0:
-                logger.error(f"重试[{config.retry_times}]次获取服务器状态后失败")
-                return None
-            else:
-                logger.warning(f"尝试第[{config.retry_times - left_times}]次..")
-
-
 class GUI(wx.Frame):
     def __init__(self):
-        super().__init__(None, title=f"CloudStatus - {config.server_name}", size=(1350, 850))
+        super().__init__(None, size=(1350, 850))
         logger.info("初始化GUI")
-        self.data_manager = DataManager(config.data_dir)
-        self.data_manager.load_data()
-        common_data.data_manager = self.data_manager
+        self.collector = MultiCollector(get_server_targets())
+        self.monitor = self.collector.monitors.get(config.active_server,
+                                                   next(iter(self.collector.monitors.values())))
+        self.monitor_lock = Lock()  # 切换服务器 与 状态线程保存数据点 互斥
+        self.bind_data(self.monitor)
         self.init_ui()
+        self.SetTitle(f"CloudStatus - {self.monitor.target.name}")
+        for name in self.collector.monitors:
+            if name != self.monitor.target.name:
+                self.collector.start_background(name)
         self.server_status = ServerStatus.OFFLINE
         self.event_flag = Event()
         self.stop_flag = Event()
@@ -112,77 +52,92 @@ class GUI(wx.Frame):
         self.status_flag.set()
         wx.CallLater(200, self.load_points_gui)
 
-    def get_server_status(self) -> tuple[str, ServerPoint | None]:
+    def bind_data(self, monitor: ServerMonitor):
+        """把服务器的数据设置为界面使用的公共数据"""
+        monitor.ensure_loaded()
+        self.data_manager = monitor.data_manager
+        common_data.data_manager = self.data_manager
+        common_data.player_index = PlayerIndex(self.data_manager)
+        common_data.session_index = SessionIndexCache(common_data.player_index)
+        common_data.hour_histograms = HourHistogramCache(common_data.session_index)
+
+    def switch_server(self, name: str):
+        """切换界面显示的服务器, 原来的服务器转到后台监测"""
+        monitor = self.collector.monitors[name]
+        if monitor is self.monitor:
+            return
+        logger.info(f"切换到服务器 [{name}]")
+        with wx.BusyCursor():
+            self.collector.stop_background(name)
+            monitor.ensure_loaded()
+            old_monitor = self.monitor
+            with self.monitor_lock:  # 此后状态线程不会再把数据点保存到原来的服务器
+                self.monitor = monitor
+            self.collector.start_background(old_monitor.target.name)
+            self.player_view_panel.player_info_panel.analyze_jobs.cancel()
+            config.set_value("active_server", name)
+            self.bind_data(monitor)
+            self.rebuild_data_pages()
+        self.SetTitle(f"CloudStatus - {name}")
+        self.name_title.SetLabel(name)
+        self.load_points_gui()
+        self.on_req_get_status(None)
+
+    def rebuild_data_pages(self):
+        """重新创建显示数据的面板 (总览, 状态, 玩家)"""
+        self.Freeze()
+        selection = self.notebook.GetSelection()
+        for _ in range(3):
+            self.notebook.DeletePage(0)
+        self.create_data_pages()
+        self.notebook.SetSelection(selection)
+        self.Thaw()
+
+    # noinspection PyAttributeOutsideInit
+    def create_data_pages(self):
+        self.overview_panel = OverviewPanel(self.notebook)
+        self.status_panel = StatusPanel(self.notebook)
+        self.player_view_panel = PlayerPanel(self.notebook)
+        self.notebook.InsertPage(0, self.overview_panel, "总览")
+        self.notebook.InsertPage(1, self.status_panel, "状态")
+        self.notebook.InsertPage(2, self.player_view_panel, "玩家")
+
+    def get_server_status(self, monitor: ServerMonitor) -> tuple[str, ServerPoint | None]:
         """
         返回值:
         ok -> 成功啦, Point
         event -> 有消息, None
         error -> 错误, None
-        fp_error -> full players错误, Point
+        fp_error -> full players不完整 (失败或放弃), Point
         fp_ok -> full players成功, Point
         """
         self.set_status(StatusStatus(ProgressStatus.STATUS))
         logger.debug("获取服务器状态")
-        point = get_server_status_retry(use_ping=config.status_ping)
+        point = self.collector.get_status(monitor.target.addr, use_ping=config.status_ping)
         if point is None or len(point.players) == point.online or (not config.enable_full_players):
             self.set_status(StatusStatus(ProgressStatus.WAIT))
             if point is None:
                 return "error", None
             return "ok", point
-        players = set(point.players)
-        com_point = point.copy()
-        fp_times = 0
-        over_flag = 0
-        while len(players) < com_point.online:
-            self.set_status(StatusStatus(ProgressStatus.FP_STATUS, fp_times + 1, com_point.online - len(players)))
-            now_point = get_server_status_retry(use_ping=False)
-            self.set_status(StatusStatus(ProgressStatus.FP_WAIT, fp_times + 1, com_point.online - len(players)))
-            if self.event_flag.is_set():
-                return "event", None
-            if now_point is None:
-                logger.debug("完整玩家列表获取失败, 返回当前点数据")
-                return "fp_error", point
-            logger.debug(f"第{fp_times}次, 获取到玩家列表: {[p.name for p in now_point.players]}")
-
-            if set(now_point.players) != set(com_point.players):
-                com_point = now_point.copy()
-                com_players = set(com_point.players)
-                if com_point.online != point.online:  # 玩家数量发生变化
-                    logger.debug(f"过程中玩家数量发生变化, 重置玩家列表 ({point.online}->{com_point.online})")
-                    players = com_players
-                    point.online = copy(com_point.online)
-                    fp_times = 0
-                else:
-                    players |= com_players - players
-                fp_times += 1
-                over_flag = 0
-            else:
-                logger.debug("玩家列表无变化, 继续获取")
-                over_flag += 1
-                if over_flag > 4:
-                    logger.debug("玩家列表无变化次数过多, 放弃获取完整玩家列表")
-                    break
-
-            if fp_times > config.fp_max_try:
-                logger.debug(f"尝试次数过多(>{config.fp_max_try}), 放弃获取完整玩家列表")
-                break
-            self.event_flag.wait(timeout=config.fp_re_status_inv)
-            if self.event_flag.is_set():
-                return "event", None
-        point.players = list(players)
-        point.time = com_point.time
-        logger.debug("完整玩家列表获取完成")
+        point = self.collector.get_full_players(
+            monitor.target.addr, point, self.event_flag.is_set,
+            lambda times, left: self.set_status(StatusStatus(ProgressStatus.FP_STATUS, times, left)))
+        if self.event_flag.is_set():
+            return "event", None
         self.set_status(StatusStatus(ProgressStatus.WAIT))
+        if point.completeness < 1:
+            return "fp_error", point
         return "fp_ok", point
 
     def on_close(self, _):
         logger.info("程序停止中...")
-        self.data_manager.save_data()
+        self.collector.save_all()
         skin_mgr.save_cache()
         config.save()
         self.stop_flag.set()
         self.event_flag.set()
         self.status_thread.join()
+        self.collector.stop()
         self.Destroy()
         logger.info("再见!")
         exit(0)
@@ -209,24 +164,26 @@ class GUI(wx.Frame):
     def init_ui(self):
         self.SetFont(ft(12))
         sizer = wx.BoxSizer(wx.VERTICAL)
-        name_title = NameTitle(self)
+        title_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.name_title = NameTitle(self, self.monitor.target.name)
+        self.server_choice = wx.Choice(self, choices=list(self.collector.monitors))
+        self.server_choice.SetStringSelection(self.monitor.target.name)
+        self.server_choice.Show(len(self.collector.monitors) > 1)
+        self.server_choice.Bind(wx.EVT_CHOICE, lambda _: self.switch_server(self.server_choice.GetStringSelection()))
+        title_sizer.Add(self.name_title, proportion=1, flag=wx.EXPAND)
+        title_sizer.Add(self.server_choice, flag=wx.ALIGN_CENTER_VERTICAL)
         self.notebook = wx.Notebook(self)
-        self.overview_panel = OverviewPanel(self.notebook)
-        self.status_panel = StatusPanel(self.notebook)
-        self.player_view_panel = PlayerPanel(self.notebook)
+        self.create_data_pages()
         self.config_panel = ConfigPanel(self.notebook)
         self.about_panel = AboutPanel(self.notebook)
-        self.notebook.AddPage(self.overview_panel, "总览")
-        self.notebook.AddPage(self.status_panel, "状态")
-        self.notebook.AddPage(self.player_view_panel, "玩家")
         self.notebook.AddPage(self.config_panel, "设置")
         self.notebook.AddPage(self.about_panel, "关于")
-        sizer.Add(name_title, flag=wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, border=5)
+        sizer.Add(title_sizer, flag=wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, border=5)
         sizer.Add(wx.StaticLine(self), flag=wx.EXPAND | wx.TOP | wx.BOTTOM, border=5)
         sizer.Add(self.notebook, flag=wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, border=5)
         self.SetSizer(sizer)
 
-        name_title.SetMinSize((MAX_SIZE[0], 36))
+        self.name_title.SetMinSize((-1, 36))
         self.Bind(EVT_GET_STATUS_NOW, self.on_req_get_status)
         self.Bind(EVT_PAUSE_STATUS, self.on_pause_status)
         self.Bind(EVT_SET_AS_OVERVIEW, self.on_set_as_overview)
@@ -258,21 +215,22 @@ class GUI(wx.Frame):
         last_status = perf_counter()
         while True:
             during = perf_counter() - last_status
-            if during >= config.check_inv:
+            monitor = self.monitor  # 获取过程中界面可能切换到其他服务器
+            if during >= monitor.target.interval:
                 last_status = perf_counter()
-                msg, point = self.get_server_status()
+                msg, point = self.get_server_status(monitor)
                 # 当前时间 - 监测所用时间 = 下一次监测提前 本次监测所用时间
                 last_status = max(10.0, perf_counter() - (perf_counter() - last_status))  # 缺掉的时间, 给我补回来！
                 if msg in ["ok", "error", "fp_error", "fp_ok"]:
-                    if point is not None:
-                        self.data_manager.add_point(point)
-                        self.server_status = ServerStatus.ONLINE
-                    else:
-                        if config.save_empty_pts:
-                            point = ServerPoint.create_offline_point()
-                            self.data_manager.add_point(point)
-                        self.server_status = ServerStatus.OFFLINE
-                    wx.CallAfter(self.load_point, point)
+                    with self.monitor_lock:
+                        # 获取期间切换了服务器时丢弃这次的结果, 原来的服务器已经转到后台监测
+                        switched = monitor is not self.monitor
+                        if not switched:
+                            self.server_status = ServerStatus.ONLINE if point is not None else ServerStatus.OFFLINE
+                            point = monitor.add_point(point)
+                            wx.CallAfter(self.load_point, point, monitor)
+                    if not switched:  # 在后台提前重建在线时间段索引, 界面查询时不需要等待
+                        common_data.session_index.get()
 
             self.event_flag.wait(1)
             if self.event_flag.is_set():
@@ -290,14 +248,18 @@ class GUI(wx.Frame):
                     logger.info("状态线程已恢复")
                     last_status = perf_counter()
 
-    def load_point(self, point: ServerPoint | None):
+    def load_point(self, point: ServerPoint | None, monitor: ServerMonitor):
         """在运行过程中 获取到的数据点 的加载函数"""
+        if monitor is not self.monitor:
+            return
         if point:
             self.status_panel.plot.load_point(point, True)
             self.status_panel.cap_list.load_point(point, True)
+            self.player_view_panel.player_info_panel.on_new_point(point)
+            self.overview_panel.player_online_overview.on_new_point(point)
             self.overview_panel.update_data([p.name for p in point.players], point.time, self.server_status)
         else:
             self.overview_panel.update_data([], time(), self.server_status)
 
     def set_status(self, status: StatusStatus):
-        wx.CallAfter(self.status_panel.progress.set_status, status)
+        wx.CallAfter(lambda: self.status_panel.progress.set_status(status))  # 面板可能在切换服务器时被重新创建
@@ -1,10 +1,13 @@
-from copy import copy
 # noinspection PyUnresolvedReferences
 from dataclasses import dataclass, field
+from math import ceil
 from threading import Thread
 from time import localtime, strftime
 
+import numpy as np
+
 from gui.widget import *
+from lib.buckets import BucketUnit, bucket_overlap, calendar_edges
 from lib.color_picker import get_player_color
 from lib.common_data import common_data
 from lib.config import config
@@ -48,34 +51,14 @@ class TimeOnlinePlotUnit(Enum):
     CUSTOM = 3
 
 
-PLOT_PREDEFINE = {
-    TimeOnlinePlotUnit.DAY: (timedelta(hours=1), timedelta(days=1), 24),
-    TimeOnlinePlotUnit.WEEK: (timedelta(days=1), timedelta(weeks=1), 7),
-    TimeOnlinePlotUnit.MONTH: (timedelta(weeks=1), timedelta(days=30), 5),
-    TimeOnlinePlotUnit.CUSTOM: (timedelta(days=1), timedelta(days=1), 1),
+PLOT_PREDEFINE = {  # 时间桶单位, 每个时间桶包含几个单位, 时间桶数量
+    TimeOnlinePlotUnit.DAY: (BucketUnit.HOUR, 1, 24),
+    TimeOnlinePlotUnit.WEEK: (BucketUnit.DAY, 1, 7),
+    TimeOnlinePlotUnit.MONTH: (BucketUnit.WEEK, 1, 5),
+    TimeOnlinePlotUnit.CUSTOM: (BucketUnit.DAY, 1, 1),
 }
 
 
-class TimeFilter:
-    def __init__(self, start: float, end: float):
-        self.start = start
-        self.end = end
-
-    def filter(self, start: float, end: float) -> tuple[float, float] | None:
-        """过滤掉超出范围的时间段, 返回截断的时间片段"""
-        if start < self.start:
-            start = self.start
-        elif start > self.end:
-            start = self.end
-        if end > self.end:
-            end = self.end
-        elif end < self.start:
-            end = self.start
-        if start == end:
-            return None
-        return start, end
-
-
 class DataPlot(wx.Window):
     def __init__(self, parent: wx.Window, datas: list[float], times: list[float]):
         super().__init__(parent, style=wx.TRANSPARENT_WINDOW, name='DataPlotPlot')
@@ -219,11 +202,9 @@ class DataPlot(wx.Window):
 
 class PlayerTimeOnlinePlot(DataPlot):
     def __init__(self, parent: wx.Window, player: str, unit: TimeOnlinePlotUnit):
-        datas, times = self.load_data(player, unit)
         self.unit = unit
-        self.start_dt = datetime.now()
-        self.end_dt = datetime.now()
-        self.step_delta, _, _ = PLOT_PREDEFINE[unit]
+        self.edges = np.empty(0)  # 时间桶边界
+        datas, times = self.load_data(player, unit)
         super().__init__(parent, datas, times)
 
     def get_time_str(self, data: float):
@@ -239,8 +220,8 @@ class PlayerTimeOnlinePlot(DataPlot):
 
     def get_tip_text(self, index: int, data: float):
         data_text = self.get_time_str(data)
-        range_start_dt = self.start_dt + self.step_delta * index
-        range_end_dt = range_start_dt + self.step_delta
+        range_start_dt = datetime.fromtimestamp(self.edges[index])
+        range_end_dt = datetime.fromtimestamp(self.edges[index + 1])
         if self.unit == TimeOnlinePlotUnit.DAY:
             rng = f"{range_start_dt.strftime('%H:00')}"
         elif self.unit == TimeOnlinePlotUnit.WEEK:
@@ -265,39 +246,11 @@ class PlayerTimeOnlinePlot(DataPlot):
             return f"{dt_obj.strftime('%m-%d')}"
 
     def load_data(self, player: str, unit: TimeOnlinePlotUnit) -> tuple[list[float], list[float]]:
-        step_delta, total, count = copy(PLOT_PREDEFINE[unit])
-        step_delta = step_delta.seconds + step_delta.days * 24 * 60 * 60
-        end_dt = datetime.now()
-        start_dt = end_dt - total
-        self.start_dt = start_dt
-        self.end_dt = end_dt
-        self.step_delta = step_delta
-        time_filter = TimeFilter(start_dt.timestamp(), end_dt.timestamp())
-        time_ranges = []
-        for time_range in common_data.data_manager.get_player_online_ranges(player):
-            if t_range := time_filter.filter(*time_range):
-                time_ranges.append(t_range)
-
-        time_datas: dict[int, float] = {i: 0 for i in range(count)}
-
-        def proc_range(start: float, end: float):
-            index = int((start - self.start_dt.timestamp()) / step_delta)
-            if index not in time_datas:
-                time_datas[index] = 0
-            time_datas[index] += end - start
-
-        start_timestamp = start_dt.timestamp()
-        for time_range in time_ranges:
-            start_delta = int((time_range[0] - start_timestamp) / step_delta)
-            end_delta = int((time_range[1] - start_timestamp) / step_delta)
-            if start_delta != end_delta:
-                proc_range(time_range[0], start_timestamp + (start_delta + 1) * step_delta)
-                proc_range(start_timestamp + end_delta * step_delta, time_range[1])
-            else:
-                proc_range(time_range[0], time_range[1])
-
-        times = [start_dt.timestamp() + i * step_delta for i in time_datas.keys()]
-        return list(time_datas.values()), times
+        """按本地日历对齐的时间桶统计在线时长, 最后一个时间桶包含当前时间"""
+        bucket_unit, step, count = PLOT_PREDEFINE[unit]
+        self.edges = calendar_edges(datetime.now().timestamp(), bucket_unit, count, step)
+        starts, ends = common_data.session_index.get().player_sessions(player)
+        return bucket_overlap(starts, ends, self.edges).tolist(), self.edges[:-1].tolist()
 
 
 class PlayerTimeOnlinePlotGroup(wx.Panel):
@@ -335,8 +288,7 @@ class PlayerTimeOnlinePlotGroup(wx.Panel):
             if dialog.ShowModal() != wx.ID_OK:
                 return
             days, interval = dialog.get_values()
-            count = int(days / interval) + 1 if float(int(days / interval)) != days / interval else 0
-            PLOT_PREDEFINE[TimeOnlinePlotUnit.CUSTOM] = (timedelta(days=interval), timedelta(days=days), count)
+            PLOT_PREDEFINE[TimeOnlinePlotUnit.CUSTOM] = (BucketUnit.DAY, interval, max(ceil(days / interval), 1))
             plot = PlayerTimeOnlinePlot(self.notebook, self.player, TimeOnlinePlotUnit.CUSTOM)
             if len(self.plots) > 3:
                 self.notebook.remove_page(3)
@@ -375,68 +327,64 @@ class PlayerOnlineRangeList(wx.ListCtrl):
         return "Unknow"
 
 
+WEEKDAY_NAMES = ["一", "二", "三", "四", "五", "六", "日"]
+
+
 class PlayerDayOnlinePlot(wx.Window):
-    """玩家逐小时在线图表"""
+    """玩家逐小时在线图表, 右键可切换为 星期×小时 热力图"""
 
     def __init__(self, parent: wx.Window, player: str):
         super().__init__(parent, id=wx.ID_ANY, pos=wx.DefaultPosition, style=wx.TRANSPARENT_WINDOW,
                          name='PlayerDayOnlinePlot')
         self.player = player
         self.datas: list[float] = [0.1, 0.4, 0.9, 1.0, 0.1, 0.6]
+        self.week_datas: list[list[float]] = [[0.0] * 24 for _ in range(7)]
+        self.heatmap = False  # 是否显示 星期×小时 热力图
         Thread(target=self.load_hour_online_data, args=(player,), daemon=True).start()
         self.Bind(wx.EVT_PAINT, self.on_paint)
         self.Bind(wx.EVT_ERASE_BACKGROUND, lambda event: None)
         self.Bind(wx.EVT_MOTION, self.on_mouse_move)
+        self.Bind(wx.EVT_RIGHT_DOWN, self.on_menu)
         self.tooltip = ToolTip(self, "")
 
     def load_hour_online_data(self, player: str):
-        """处理出玩家每小时在线的占比"""
-        new_data = {i: 0 for i in range(24)}
-        ranges = common_data.data_manager.get_player_online_ranges(player)
-        days = set()
-        for start, end in ranges:
-            start_date = datetime.fromtimestamp(start)
-            end_date = datetime.fromtimestamp(end)
-            if start_date.hour == end_date.hour:
-                new_data[start_date.hour] += end - start
-                days.add(str(start_date.date()))
-            else:
-                offset_time = datetime.fromtimestamp(start).replace(minute=0, second=0, microsecond=0)
-                while True:
-                    days.add(str(offset_time.date()))
-                    if offset_time == start_date.replace(minute=0, second=0, microsecond=0):
-                        new_end = timedelta(hours=1) + start_date.replace(minute=0, second=0, microsecond=0)
-                        try:
-                            new_data[offset_time.hour] += new_end.timestamp() - start_date.timestamp()
-                        except OSError:
-                            new_end.timestamp()
-                            start_date.timestamp()
-                            new_end.timestamp() - start_date.timestamp()
-                            new_data[offset_time.hour] += new_end.timestamp() - start_date.timestamp()
-                            return
-                    elif offset_time == end_date.replace(minute=0, second=0, microsecond=0):
-                        new_start = end_date.replace(minute=0, second=0, microsecond=0)
-                        new_data[offset_time.hour] += end_date.timestamp() - new_start.timestamp()
-                        break
-                    else:
-                        new_data[offset_time.hour] += 3600
-                    offset_time = timedelta(hours=1) + offset_time
-        new_data = {i: new_data[i] / len(days) / 3600 for i in range(24)}
-        wx.CallAfter(self.set_hour_online_data, list(new_data.values()))
-
-    def set_hour_online_data(self, data: list[float]):
+        """获取玩家每小时在线的占比"""
+        histogram = common_data.hour_histograms.get(player)
+        wx.CallAfter(self.set_hour_online_data, histogram.hours.tolist(), histogram.week.tolist())
+
+    def set_hour_online_data(self, data: list[float], week_data: list[list[float]]):
         self.datas = data
+        self.week_datas = week_data
+        self.Refresh()
+
+    def on_menu(self, _):
+        menu = EasyMenu()
+        menu.Append("显示为热力图 (星期×小时)" if not self.heatmap else "显示为柱状图 (小时)", self.switch_mode)
+        self.PopupMenu(menu)
+
+    def switch_mode(self):
+        self.heatmap = not self.heatmap
+        self.tooltip.set_tip("")
         self.Refresh()
 
     def on_mouse_move(self, event: wx.MouseEvent):
         """实现鼠标查看在线几率数据"""
         width, height = self.GetClientSize()
-        x = event.GetX()
-        hour = int(x / width * len(self.datas))
-        if not 0 <= hour < len(self.datas):
+        x, y = event.GetX(), event.GetY()
+        hour = int(x / width * 24)
+        if not 0 <= hour < 24:
             self.tooltip.set_tip("")
             return
-        text = f"时间: {hour}:00-{hour + 1}:00\n数据: {(self.datas[hour] / sum(self.datas)) * 100:.2f}%"
+        if self.heatmap:
+            weekday = int(y / height * 7)
+            if not 0 <= weekday < 7:
+                self.tooltip.set_tip("")
+                return
+            text = (f"时间: 星期{WEEKDAY_NAMES[weekday]} {hour}:00-{hour + 1}:00\n"
+                    f"在线几率: {self.week_datas[weekday][hour] * 100:.2f}%")
+        else:
+            total = sum(self.datas)
+            text = f"时间: {hour}:00-{hour + 1}:00\n数据: {(self.datas[hour] / total if total else 0) * 100:.2f}%"
         self.tooltip.set_tip(text)
 
     def on_paint(self, _):
@@ -444,6 +392,9 @@ class PlayerDayOnlinePlot(wx.Window):
             dc = wx.PaintDC(self)
         except RuntimeError:
             return
+        if self.heatmap:
+            self.draw_heatmap(dc)
+            return
         dc.SetPen(wx.Pen('#d4d4d4'))  # 设置边框颜色
 
         dc.SetBrush(wx.Brush('#c56c00'))  # 设置填充颜色
@@ -452,6 +403,20 @@ class PlayerDayOnlinePlot(wx.Window):
             dc.DrawRectangle(int(width * i / len(self.datas)) + 2, int(height * (1 - self.datas[i])),
                              int(width / len(self.datas)) - 2, int(height * self.datas[i]))
 
+    def draw_heatmap(self, dc: wx.DC):
+        """颜色越深在线几率越高"""
+        width, height = self.GetClientSize()
+        max_value = max(max(row) for row in self.week_datas) or 1
+        dc.SetPen(wx.Pen('#d4d4d4'))
+        for weekday, row in enumerate(self.week_datas):
+            y0, y1 = int(height * weekday / 7), int(height * (weekday + 1) / 7)
+            for hour, value in enumerate(row):
+                x0, x1 = int(width * hour / 24), int(width * (hour + 1) / 24)
+                ratio = value / max_value
+                dc.SetBrush(wx.Brush(wx.Colour(int(255 - (255 - 0xc5) * ratio), int(255 - (255 - 0x6c) * ratio),
+                                               int(255 - 255 * ratio))))
+                dc.DrawRectangle(x0, y0, x1 - x0, y1 - y0)
+
 
 class PlayerOnlineWin(wx.Frame):
     """
@@ -507,8 +472,8 @@ class PlayerOnlineWin(wx.Frame):
                 break
         self.name_label.SetFont(ft(ft_size))
 
-    def set_icon(self, head: wx.Image):
-        self.SetIcon(wx.Icon(head.ConvertToBitmap(-1)))
+    def set_icon(self, head: wx.Bitmap):
+        self.SetIcon(wx.Icon(head))
 
     def load_card_color(self, head: Image.Image):
         """从玩家头像中提取两个眼睛的颜色并应用到控件中"""
@@ -527,8 +492,9 @@ class PlayerOnlineWin(wx.Frame):
         self.Refresh()
 
     def load_head(self):
-        head = skin_mgr.get_player_head(HeadLoadData(Player(self.player), 120))[1]
-        self.head.SetBitmap(PilImg2WxImg(head))
-        self.set_icon(PilImg2WxImg(head))
+        status, head = skin_mgr.get_player_head(HeadLoadData(Player(self.player), 120))
+        bitmap = head_bitmaps.get_bitmap(self.player, 120, status, head)
+        self.head.SetBitmap(bitmap)
+        self.set_icon(bitmap)
         self.load_card_color(head)
         self.Layout()
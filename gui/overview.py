@@ -2,8 +2,9 @@
 预览面板
 提供 服务器预览 的GUI定义文件
 """
-from threading import Thread
-from time import strftime, localtime
+from collections import OrderedDict
+from threading import Thread, Lock
+from time import strftime, localtime, time
 
 from gui.events import GetStatusNowEvent, AskToAddPlayerEvent, EVT_ASK_TO_ADD_PLAYER, RemovePlayerOverviewEvent, \
     EVT_REMOVE_PLAYER_OVERVIEW
@@ -14,10 +15,16 @@ from lib.common_data import common_data
 from lib.config import config
 from lib.data import ServerPoint, Player
 from lib.log import logger
+from lib.overview_stats import OverviewCounters, ActiveRule
 from lib.skin import skin_mgr, HeadLoadData
 
 MAX_HAP = 20
 MIN_HAP = 6
+CARD_WIDTH = 180
+CARD_HEIGHT = 180
+CARD_NAME_HEIGHT = 32
+CARD_VGAP = 16
+CARD_CACHE_SIZE = 256  # 缓存的卡片位图数量
 
 
 class ServerStatus(Enum):
@@ -26,83 +33,21 @@ class ServerStatus(Enum):
     UNKNOWN = 2
 
 
-class NameLabel(CenteredText):
-    """玩家名称Label (封装了渐变色)"""
+class PlayerCard:
+    """一张玩家卡片的数据, 由 PlayerCardList 绘制"""
 
-    def __init__(self, parent: wx.Window, label: str, size=wx.DefaultSize):
-        super().__init__(parent, label=label, size=size)
-        self.bg_binder = GradientBgBinder(self)
-        self.bg_binder.set_color(self.GetBackgroundColour())
-        self.set_best_font_size()
-
-    def set_color(self, color: wx.Colour, color2: wx.Colour = wx.NullColour):
-        self.bg_binder.set_color(color, color2)
-
-    def set_best_font_size(self):
-        dc = wx.ClientDC(self)
-        ft_size = 18
-        while True:
-            dc.SetFont(ft(ft_size))
-            size = dc.GetTextExtent(self.GetLabel())
-            if size[0] > 180:
-                ft_size -= 1
-            else:
-                break
-        self.SetFont(ft(ft_size))
-
-
-class PlayerHead(CenteredBitmap):
-    """玩家头像 (封装了渐变色)"""
-
-    def __init__(self, parent: wx.Window):
-        super().__init__(parent, size=(88, 88))
-        self.bg_binder = GradientBgBinder(self)
-        self.bg_binder.set_color(self.GetBackgroundColour())
-
-    def set_color(self, color: wx.Colour, color2: wx.Colour = wx.NullColour):
-        self.bg_binder.set_color(color, color2)
-
-
-class PlayerCard(wx.Panel):
-    """玩家名称Label (封装了渐变色)"""
-
-    def __init__(self, parent: wx.Window, name: str):
-        wx.Panel.__init__(self, parent, size=(180, 180))
+    def __init__(self, name: str):
         self.player = name
-        self.head_image = None
-        self.head = PlayerHead(self)
-        self.name_label = NameLabel(self, label=name, size=(-1, 32))
-        Thread(target=self.load_head, daemon=True).start()
-
-        sizer = wx.BoxSizer(wx.VERTICAL)
-        sizer.Add(self.head, flag=wx.EXPAND, proportion=1)
-        sizer.Add(self.name_label, flag=wx.EXPAND, proportion=0)
-        self.SetSizer(sizer)
-        self.head.Bind(wx.EVT_RIGHT_UP, self.on_menu_click)
-
-    def on_menu_click(self, _):
-        menu = wx.Menu()
-        menu.Append(wx.ID_ADD, "添加玩家")
-        menu.AppendSeparator()
-        menu.Append(wx.ID_INFO, "打开玩家信息")
-        menu.Append(wx.ID_COPY, "复制名字")
-        menu.Append(wx.ID_REFRESH, "刷新头像")
-        menu.AppendSeparator()
-        menu.Append(wx.ID_DELETE, "删除玩家")
-        menu.Bind(wx.EVT_MENU, lambda _: self.ProcessEvent(AskToAddPlayerEvent()), id=wx.ID_ADD)
-        menu.Bind(wx.EVT_MENU, lambda _: PlayerOnlineWin(self, self.player).Show(), id=wx.ID_INFO)
-        menu.Bind(wx.EVT_MENU, lambda _: wx.TheClipboard.SetData(wx.TextDataObject(self.player)), id=wx.ID_COPY)
-        menu.Bind(wx.EVT_MENU, self.refresh_head, id=wx.ID_REFRESH)
-        menu.Bind(wx.EVT_MENU, lambda _: self.ProcessEvent(RemovePlayerOverviewEvent(self.player)), id=wx.ID_DELETE)
-        self.PopupMenu(menu)
-        menu.Destroy()
-
-    def refresh_head(self, *_):
-        logger.info("刷新头像")
-        Thread(target=self.load_head, args=(False,), daemon=True).start()
+        self.head_image: Image.Image | None = None
+        self.head_bitmap: wx.Bitmap | None = None
+        self.colors: tuple[tuple[int, int, int], ...] | None = None  # 头像背景左右、名称背景左右 的颜色
 
     def load_card_color(self, head: Image.Image):
-        """从玩家头像中提取两个眼睛的颜色并应用到控件中"""
+        self.colors = self.calc_colors(head)
+
+    @staticmethod
+    def calc_colors(head: Image.Image) -> tuple[tuple[int, int, int], ...]:
+        """从玩家头像中提取两个眼睛的颜色作为卡片的背景色 (可能较慢, 在加载头像的线程中调用)"""
         left_eye, right_eye = get_player_color(head, config.player_card_pick_way)
         color_left, color_right = EasyColor(*left_eye), EasyColor(*right_eye)
 
@@ -114,60 +59,180 @@ class PlayerCard(wx.Panel):
         color_left.sat = color_left.sat * (1 - sat_percent) + sat_target * sat_percent
         color_right.sat = color_right.sat * (1 - sat_percent) + sat_target * sat_percent
 
-        self.head.set_color(color_left.wxcolor, color_right.wxcolor)
-        self.name_label.set_color(color_left.add_luminance(0.1).wxcolor, color_right.add_luminance(0.1).wxcolor)
-        self.Refresh()
-
-    def load_head(self, use_cache: bool = True):
-        head = skin_mgr.get_player_head(HeadLoadData(Player(self.player), 80, use_cache=use_cache))[1]
-        try:
-            self.head.SetBitmap(PilImg2WxImg(head))
-        except RuntimeError:
-            logger.error("无法更新玩家头像 -> 控件已销毁")
-            return
-        self.load_card_color(head)
-        self.head_image = head
-        wx.CallAfter(self.Layout)
+        head_colors = (color_left.wxcolor.Get(includeAlpha=False), color_right.wxcolor.Get(includeAlpha=False))
+        name_colors = (color_left.add_luminance(0.1).wxcolor.Get(includeAlpha=False),
+                       color_right.add_luminance(0.1).wxcolor.Get(includeAlpha=False))
+        return head_colors + name_colors
 
 
 class PlayerCardList(wx.ScrolledWindow):
-    """装一堆玩家卡片的列表"""
+    """
+    装一堆玩家卡片的列表
+    所有卡片都画在这一个窗口上, 只绘制可见的卡片, 每张卡片渲染后的位图按 (玩家, 颜色, 大小) 缓存
+    """
 
     def __init__(self, parent: wx.Window):
         self.old_hgap = 20
         self.old_cols = 10
         wx.ScrolledWindow.__init__(self, parent)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
         self.cards: dict[str, PlayerCard] = {}
-        self.sizer = wx.FlexGridSizer(rows=0, cols=10, vgap=16, hgap=20)
-        self.SetSizer(self.sizer)
+        self.order: list[str] = []  # 卡片的排列顺序
+        self.bitmap_cache: OrderedDict[tuple, wx.Bitmap] = OrderedDict()
+        self.task_lock = Lock()
+        self.head_tasks: list[tuple[PlayerCard, bool]] = []  # 所有卡片共用一个头像加载线程
+        self.loader_thread = Thread(target=self.head_load_thread, daemon=True)
+        self.Bind(wx.EVT_PAINT, self.on_paint)
         self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_LEFT_DCLICK, self.on_card_open)
         self.Bind(wx.EVT_RIGHT_DOWN, self.on_menu)
         self.Bind(EVT_ASK_TO_ADD_PLAYER, self.on_add_player)
         self.Bind(EVT_REMOVE_PLAYER_OVERVIEW, self.on_remove_player)
         self.SetVirtualSize(1316, 630)
         self.SetScrollRate(0, 20)
 
+    def get_card_rect(self, index: int) -> wx.Rect:
+        """卡片在滚动区域中的位置"""
+        row, col = divmod(index, self.old_cols)
+        return wx.Rect(col * (CARD_WIDTH + self.old_hgap), row * (CARD_HEIGHT + CARD_VGAP), CARD_WIDTH, CARD_HEIGHT)
+
+    def card_at(self, x: int, y: int) -> PlayerCard | None:
+        """获取窗口坐标处的卡片"""
+        x, y = self.CalcUnscrolledPosition(x, y)
+        col, col_off = divmod(x, CARD_WIDTH + self.old_hgap)
+        row, row_off = divmod(y, CARD_HEIGHT + CARD_VGAP)
+        if col >= self.old_cols or col_off >= CARD_WIDTH or row_off >= CARD_HEIGHT:
+            return None
+        index = row * self.old_cols + col
+        return self.cards[self.order[index]] if 0 <= index < len(self.order) else None
+
+    def on_paint(self, _):
+        dc = wx.AutoBufferedPaintDC(self)
+        self.DoPrepareDC(dc)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
+        _, view_y = self.CalcUnscrolledPosition(0, 0)
+        height = self.GetClientSize()[1]
+        first_row = view_y // (CARD_HEIGHT + CARD_VGAP)
+        last_row = (view_y + height) // (CARD_HEIGHT + CARD_VGAP)
+        for index in range(first_row * self.old_cols, min((last_row + 1) * self.old_cols, len(self.order))):
+            rect = self.get_card_rect(index)
+            dc.DrawBitmap(self.get_card_bitmap(self.cards[self.order[index]]), rect.x, rect.y)
+
+    def get_card_bitmap(self, card: PlayerCard) -> wx.Bitmap:
+        key = (card.player, card.colors, (CARD_WIDTH, CARD_HEIGHT))
+        bitmap = self.bitmap_cache.get(key)
+        if bitmap is None:
+            bitmap = self.bitmap_cache[key] = self.render_card(card)
+            if len(self.bitmap_cache) > CARD_CACHE_SIZE:
+                self.bitmap_cache.popitem(last=False)
+        else:
+            self.bitmap_cache.move_to_end(key)
+        return bitmap
+
+    def render_card(self, card: PlayerCard) -> wx.Bitmap:
+        """绘制一张卡片: 渐变背景的头像 + 渐变背景的名称"""
+        head_height = CARD_HEIGHT - CARD_NAME_HEIGHT
+        bitmap = wx.Bitmap(CARD_WIDTH, CARD_HEIGHT)
+        dc = wx.MemoryDC(bitmap)
+        if card.colors is None:
+            background = self.GetBackgroundColour()
+            colors = [background] * 4
+        else:
+            colors = [wx.Colour(*color) for color in card.colors]
+        for (color1, color2), y, height in (((colors[0], colors[1]), 0, head_height),
+                                            ((colors[2], colors[3]), head_height, CARD_NAME_HEIGHT)):
+            background = get_gradient_bitmap(color1, color2, (CARD_WIDTH, height), GradientDirection.HORIZONTAL)
+            if background is not None:
+                dc.DrawBitmap(background, 0, y)
+        if card.head_bitmap is not None:
+            dc.DrawBitmap(card.head_bitmap, (CARD_WIDTH - card.head_bitmap.GetWidth()) // 2,
+                          (head_height - card.head_bitmap.GetHeight()) // 2, True)
+
+        ft_size = 18
+        while True:
+            dc.SetFont(ft(ft_size))
+            text_w, text_h = dc.GetTextExtent(card.player)
+            if text_w > CARD_WIDTH and ft_size > 1:
+                ft_size -= 1
+            else:
+                break
+        dc.SetTextForeground(self.GetForegroundColour())
+        dc.DrawText(card.player, (CARD_WIDTH - text_w) // 2, head_height + (CARD_NAME_HEIGHT - text_h) // 2)
+        dc.SelectObject(wx.NullBitmap)
+        return bitmap
+
+    def drop_card_cache(self, player: str):
+        for key in [key for key in self.bitmap_cache if key[0] == player]:
+            del self.bitmap_cache[key]
+
+    def add_head_task(self, card: PlayerCard, use_cache: bool = True):
+        with self.task_lock:
+            self.head_tasks.append((card, use_cache))
+            if not self.loader_thread.is_alive():
+                self.loader_thread = Thread(target=self.head_load_thread, daemon=True)
+                self.loader_thread.start()
+
+    def head_load_thread(self):
+        while True:
+            with self.task_lock:
+                if not self.head_tasks:
+                    return
+                card, use_cache = self.head_tasks.pop(0)
+            if self.cards.get(card.player) is not card:  # 卡片在排队期间已被移除
+                continue
+            status, head = skin_mgr.get_player_head(HeadLoadData(Player(card.player), 80, use_cache=use_cache))
+            bitmap = head_bitmaps.get_bitmap(card.player, 80, status, head)
+            colors = PlayerCard.calc_colors(head)
+            wx.CallAfter(self.set_card_head, card, head, bitmap, colors)
+
+    def set_card_head(self, card: PlayerCard, head: Image.Image, bitmap: wx.Bitmap,
+                      colors: tuple[tuple[int, int, int], ...]):
+        """(在GUI线程中) 应用加载好的头像和卡片颜色"""
+        if self.cards.get(card.player) is not card:
+            return
+        card.head_image = head
+        card.head_bitmap = bitmap
+        card.colors = colors
+        self.drop_card_cache(card.player)  # 头像可能变了但颜色没变
+        self.Refresh()
+
+    def create_card(self, player: str) -> PlayerCard:
+        card = self.cards[player] = PlayerCard(player)
+        self.order.append(player)
+        self.add_head_task(card)
+        return card
+
+    def remove_card(self, player: str):
+        self.cards.pop(player)
+        self.order.remove(player)
+        self.drop_card_cache(player)
+
     def on_card_open(self, event: wx.MouseEvent):
         """当双击玩家卡片"""
-        card: PlayerCard = event.GetEventObject().GetParent()
-        if card.player in self.cards:
+        card = self.card_at(event.GetX(), event.GetY())
+        if card is not None:
             PlayerOnlineWin(self, card.player).Show()
 
     def on_remove_player(self, event: RemovePlayerOverviewEvent):
-        self.sizer.Detach(self.cards[event.player])
-        card = self.cards.pop(event.player)
-        card.Destroy()
+        if event.player in self.cards:
+            self.remove_card(event.player)
+            self.on_size(None)
 
     def on_clear_all_cards(self, _):
         ret = wx.MessageBox("你真的想要清空列表吗?", "警告", wx.YES_NO | wx.ICON_WARNING, self)
         if ret != wx.YES:
             return
-        for card in self.cards.values():
-            self.sizer.Detach(card)
-            card.Destroy()
         self.cards.clear()
+        self.order.clear()
+        self.bitmap_cache.clear()
+        self.on_size(None)
 
-    def on_menu(self, _):
+    def on_menu(self, event: wx.MouseEvent):
+        card = self.card_at(event.GetX(), event.GetY())
+        if card is not None:
+            self.on_card_menu(card)
+            return
         menu = wx.Menu()
         menu.Append(wx.ID_ADD, "添加玩家")
         menu.Append(wx.ID_REFRESH, "刷新所有头像颜色")
@@ -178,6 +243,28 @@ class PlayerCardList(wx.ScrolledWindow):
         self.PopupMenu(menu)
         menu.Destroy()
 
+    def on_card_menu(self, card: PlayerCard):
+        player = card.player
+        menu = wx.Menu()
+        menu.Append(wx.ID_ADD, "添加玩家")
+        menu.AppendSeparator()
+        menu.Append(wx.ID_INFO, "打开玩家信息")
+        menu.Append(wx.ID_COPY, "复制名字")
+        menu.Append(wx.ID_REFRESH, "刷新头像")
+        menu.AppendSeparator()
+        menu.Append(wx.ID_DELETE, "删除玩家")
+        menu.Bind(wx.EVT_MENU, lambda _: self.ProcessEvent(AskToAddPlayerEvent()), id=wx.ID_ADD)
+        menu.Bind(wx.EVT_MENU, lambda _: PlayerOnlineWin(self, player).Show(), id=wx.ID_INFO)
+        menu.Bind(wx.EVT_MENU, lambda _: wx.TheClipboard.SetData(wx.TextDataObject(player)), id=wx.ID_COPY)
+        menu.Bind(wx.EVT_MENU, lambda _: self.refresh_head(card), id=wx.ID_REFRESH)
+        menu.Bind(wx.EVT_MENU, lambda _: self.ProcessEvent(RemovePlayerOverviewEvent(player)), id=wx.ID_DELETE)
+        self.PopupMenu(menu)
+        menu.Destroy()
+
+    def refresh_head(self, card: PlayerCard):
+        logger.info("刷新头像")
+        self.add_head_task(card, False)
+
     def update_all_player_color(self, _):
         dialog = wx.ProgressDialog("更新玩家头像颜色", "正在更新...", len(self.cards), self)
         for i, card in enumerate(self.cards.values()):
@@ -186,22 +273,20 @@ class PlayerCardList(wx.ScrolledWindow):
             dialog.Update(i)
             card.load_card_color(card.head_image)
         dialog.Destroy()
+        self.Refresh()
 
     def update_players(self, players: list[str]) -> None:
-        """更新其中的玩家"""
-        for card in self.cards.values():
-            self.sizer.Detach(card)
-            card.Destroy()
-        self.cards.clear()
-        for player in players:
-            if player in self.cards:
-                continue
-            card = PlayerCard(self, player)
-            card.head.Bind(wx.EVT_LEFT_DCLICK, self.on_card_open)
-            self.cards[player] = card
-            self.sizer.Add(card, flag=wx.EXPAND)
+        """更新其中的玩家, 只移除离开的玩家、添加新加入的玩家, 其余卡片保持不变"""
+        wanted = set(players)
+        left = [player for player in self.cards if player not in wanted]
+        joined = [player for player in dict.fromkeys(players) if player not in self.cards]
+        if not left and not joined:
+            return
+        for player in left:
+            self.remove_card(player)
+        for player in joined:
+            self.create_card(player)
         self.on_size(None)
-        self.Refresh()
 
     def on_add_player(self, event: AskToAddPlayerEvent):
         event.Skip()
@@ -212,41 +297,31 @@ class PlayerCardList(wx.ScrolledWindow):
                 self.add_players([player])
 
     def on_size(self, _):
-        width = self.GetSize()[0]
-        self.SetVirtualSize(width, (len(self.cards) // self.old_cols + 1) * (
-                180 + self.sizer.GetHGap()) - self.sizer.GetHGap())  # (每卡片高度+卡片间距)*卡片行数-卡片间距
+        width = self.GetClientSize()[0]
         now_cols = int(width / 185)
         if now_cols > 1:  # (窗口宽度-卡片宽度和)/卡片列数
-            now_hgap = max(MIN_HAP, min(MAX_HAP, (self.GetSize()[0] - (now_cols * 180)) // (now_cols - 1)))
+            now_hgap = max(MIN_HAP, min(MAX_HAP, (width - (now_cols * CARD_WIDTH)) // (now_cols - 1)))
         else:  # 处理宽度极小的情况
             now_hgap = 5
             now_cols = 1
-        if self.old_hgap != now_hgap and now_cols <= len(self.cards):
-            self.sizer.SetHGap(now_hgap)
-            self.sizer.Layout()
-            self.old_hgap = now_hgap
-        if now_cols != self.old_cols:
-            self.sizer.SetCols(now_cols)
-            self.sizer.Layout()
-            self.old_cols = now_cols
+        self.old_hgap, self.old_cols = now_hgap, now_cols
+        rows = (len(self.order) + now_cols - 1) // now_cols
+        self.SetVirtualSize(width, max(rows * (CARD_HEIGHT + CARD_VGAP) - CARD_VGAP, 0))  # 卡片行数*(卡片高度+间距)-间距
+        self.Refresh()
 
     def add_players(self, players: list[str]):
         for player in players:
             if player not in self.cards:
-                card = PlayerCard(self, player)
-                card.head.Bind(wx.EVT_LEFT_DCLICK, self.on_card_open)
-                self.cards[player] = card
-                self.sizer.Add(card, flag=wx.EXPAND)
+                self.create_card(player)
         self.on_size(None)
 
 
 class PlayerOnlineOverviewPanel(wx.Panel):
     def __init__(self, parent: wx.Window):
         super().__init__(parent)
-        self.activate_total_players = []
-        self.activate_today_players = []
-        self.activate_active_players = []
         self.data_manager = common_data.data_manager
+        self.counters = OverviewCounters(ActiveRule(config.active_min_days, config.active_window_days),
+                                         config.active_day_start)
         self.today_calc_way: int = config.today_player_calc_way
         self.custom_hours: int = config.tcw_custom_hours
         self.custom_start: int = config.tcw_custom_start
@@ -262,21 +337,19 @@ class PlayerOnlineOverviewPanel(wx.Panel):
         sizer.Add(self.total_online_time, flag=wx.EXPAND)
         self.SetSizer(sizer)
 
-        timer = wx.Timer(self)
-        timer.Bind(wx.EVT_TIMER, self.update_data)
-        timer.Start(60 * 1000)
         self.update_data()
         self.total_players.Bind(wx.EVT_LEFT_DCLICK, self.total_players_cbk)
         self.today_players.Bind(wx.EVT_LEFT_DCLICK, self.today_players_cbk)
         self.active_players.Bind(wx.EVT_LEFT_DCLICK, self.active_players_cbk)
         self.today_players.Bind(wx.EVT_RIGHT_DOWN, self.on_today_player_menu)
+        self.active_players.Bind(wx.EVT_RIGHT_DOWN, self.on_active_player_menu)
 
     def total_players_cbk(self, _):
-        dialog = DataShowDialog(self, self.activate_total_players, "玩家", "所有玩家")
+        dialog = DataShowDialog(self, sorted(self.counters.known_players), "玩家", "所有玩家")
         dialog.ShowModal()
 
     def today_players_cbk(self, _):
-        dialog = DataShowDialog(self, self.activate_today_players, "玩家", "今日在线玩家")
+        dialog = DataShowDialog(self, list(self.counters.today_seen.keys()), "玩家", "今日在线玩家")
         dialog.ShowModal()
 
     def on_today_player_menu(self, _):
@@ -305,20 +378,52 @@ class PlayerOnlineOverviewPanel(wx.Panel):
         self.today_calc_way = config.today_player_calc_way = event.GetId()
         self.update_data()
 
-    def active_players_cbk(self, _):
-        dialog = DataShowDialog(self, self.activate_active_players, "玩家", "活跃玩家")
-        dialog.ShowModal()
+    def on_active_player_menu(self, _):
+        menu = wx.Menu()
+        rule = self.counters.rule
+        presets = [ActiveRule(4, 7), ActiveRule(10, 30)]
+        if rule not in presets:
+            presets.append(rule)
+        for i, preset in enumerate(presets):
+            count = len(self.counters.count_active(preset, self.counters.today))  # 只需数位, 可以直接显示人数
+            menu.Append(i, f"{preset} ({count}人)", kind=wx.ITEM_CHECK)
+            menu.Check(i, preset == rule)
+        menu.AppendSeparator()
+        menu.Append(len(presets), "自定义...")
+        menu.Append(len(presets) + 1, f"一天开始时间: {self.counters.day_start}点...")
+
+        def menu_cbk(event: wx.CommandEvent):
+            if event.GetId() < len(presets):
+                self.set_active_rule(presets[event.GetId()])
+            elif event.GetId() == len(presets):
+                dialog = NumberInputDialog(self, "自定义活跃规则", [IntEntryCfg("最近天数:", rule.window_days),
+                                                                    IntEntryCfg("在线天数:", rule.min_days)])
+                if dialog.ShowModal() == wx.ID_OK:
+                    window_days, min_days = dialog.get_values()
+                    self.set_active_rule(ActiveRule(max(min(min_days, window_days), 1), max(window_days, 1)))
+            else:
+                dialog = wx.NumberEntryDialog(self, "一天从几点开始", "请输入小时", "小时",
+                                              self.counters.day_start, 0, 23)
+                if dialog.ShowModal() == wx.ID_OK:
+                    self.counters.day_start = dialog.GetValue()
+                    config.set_value("active_day_start", self.counters.day_start)
+                    self.counters.version = -1  # 日期的划分变了, 需要重建位图
+                    self.update_data()
+
+        menu.Bind(wx.EVT_MENU, menu_cbk)
+        self.PopupMenu(menu)
 
-    def update_data(self, *_):
-        ranges = self.data_manager.get_all_online_ranges().items()
+    def set_active_rule(self, rule: ActiveRule):
+        config.set_value("active_min_days", rule.min_days)
+        config.set_value("active_window_days", rule.window_days)
+        self.counters.set_rule(rule)
+        self.update_data()
 
-        total_players = set()
-        for pt in self.data_manager.points:
-            for player in pt.players:
-                total_players.add(player.name)
-        self.total_players.SetData(str(len(total_players)))
+    def active_players_cbk(self, _):
+        dialog = DataShowDialog(self, sorted(self.counters.active_players), "玩家", "活跃玩家")
+        dialog.ShowModal()
 
-        day_end = datetime.now().timestamp()
+    def get_today_start(self) -> float:
         if self.today_calc_way == 0:
             day_start = (datetime.now() - timedelta(days=1))
         elif self.today_calc_way == 1:
@@ -327,38 +432,23 @@ class PlayerOnlineOverviewPanel(wx.Panel):
             day_start = datetime.now() - timedelta(hours=self.custom_hours)
         else:
             day_start = datetime.combine(datetime.now().date(), datetime.min.time().replace(hour=self.custom_start))
-        day_start = day_start.timestamp()
-        today_players = set()
-        total_online_time = 0
-        for player, times in ranges:
-            for start, end in times:
-                if day_start <= start <= day_end or day_start <= end <= day_end:
-                    today_players.add(player)
-                total_online_time += end - start
-        self.today_players.SetData(str(len(today_players)))
-        self.total_online_time.SetData(string_fmt_time(total_online_time))
-
-        active_players_day: dict[str, set[str]] = {}
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        for player, times in ranges:
-            for start, end in times:
-                start = datetime.fromtimestamp(start)
-                end = datetime.fromtimestamp(end)
-                if player not in active_players_day:
-                    active_players_day[player] = set()
-                if end > seven_days_ago:
-                    active_players_day[player].add(end.strftime("%Y-%m-%d"))
-                elif start > seven_days_ago:
-                    active_players_day[player].add(start.strftime("%Y-%m-%d"))
-        new_active_players_day = {}
-        for player, days in active_players_day.items():
-            if len(days) >= 4:
-                new_active_players_day[player] = days
-        self.active_players.SetData(str(len(new_active_players_day)))
-
-        self.activate_total_players = list(total_players)
-        self.activate_today_players = list(today_players)
-        self.activate_active_players = list(new_active_players_day.keys())
+        return day_start.timestamp()
+
+    def on_new_point(self, point: ServerPoint):
+        """获取到新的数据点时增量更新统计, 展示的数字由随后的 OverviewPanel.update_data 刷新"""
+        if self.counters.version == self.data_manager.version - 1:  # 期间只追加了这一个数据点
+            self.counters.add_point(point, self.data_manager.version)
+
+    def update_data(self, *_):
+        """刷新展示的数字, 数据被其它方式修改过时从在线时间段索引重建统计"""
+        if self.counters.version != self.data_manager.version:
+            self.counters.rebuild(common_data.session_index.get(), self.data_manager.version, time())
+        self.counters.refresh(time(), self.get_today_start())
+        self.total_players.SetData(str(len(self.counters.known_players)))
+        self.today_players.SetData(str(len(self.counters.today_seen)))
+        self.active_players.SetData(str(len(self.counters.active_players)))
+        self.active_players.SetToolTip(str(self.counters.rule))
+        self.total_online_time.SetData(string_fmt_time(self.counters.total_online_time))
 
 
 class OverviewPanel(wx.Panel):
@@ -406,6 +496,7 @@ class OverviewPanel(wx.Panel):
 
     def update_data(self, players: list[str], timestamp: float, status: ServerStatus) -> None:
         self.Freeze()
+        self.player_online_overview.update_data()
         self.time_label.SetLabel("时间: " + strftime("%Y-%m-%d %H:%M:%S", localtime(timestamp)))
         if status == ServerStatus.ONLINE:
             self.status_label.SetLabel("在线")
@@ -3,19 +3,26 @@
 提供 玩家在线数据 查看的GUI定义文件
 """
 from datetime import datetime, timedelta
+from operator import attrgetter
 from threading import Thread, Lock
-from time import perf_counter, strftime, localtime
+from time import strftime, localtime
 
+import numpy as np
 import wx
 from PIL import Image
 
 from gui.events import PlayerOnlineInfoEvent, EVT_PLAYER_ONLINE_INFO, AddPlayersOverviewEvent
 from gui.online_widget import PlayerOnlineWin
-from gui.widget import TimeSelector, ft, string_fmt_time, PilImg2WxImg, EasyMenu
+from gui.widget import TimeSelector, ft, string_fmt_time, PilImg2WxImg, EasyMenu, head_bitmaps
+from lib.analysis import PlayerOnlineInfo, analyze_sessions, session_table
 from lib.common_data import common_data
 from lib.config import config
-from lib.data import Player
+from lib.data import Player, ServerPoint
+from lib.interval_index import SessionIndex
+from lib.jobs import JobManager, CancelToken
+from lib.live_stats import LiveStats
 from lib.log import logger
+from lib.perf import Counter
 from lib.skin import skin_mgr, HeadLoadData, ContentStatus
 
 COL_PLAYER_HEAD = 0
@@ -30,58 +37,74 @@ COL_MAX_ONLINE_SESSION = COL_AVG_ONLINE_SESSION + 1
 COL_LAST_ONLINE = COL_MAX_ONLINE_SESSION + 1
 COL_JOIN_TIME = COL_LAST_ONLINE + 1
 players_sort_map = {
-    COL_NAME: "x.name",
-    COL_TOTAL_ONLINE: "x.total_online_time",
-    COL_TODAY_ONLINE: "x.today_online_time",
-    COL_AVG_ONLINE_DAY: "x.avg_online_per_day",
-    COL_ONLINE_TIMES: "len(x.online_times)",
-    COL_AVG_ONLINE_SESSION: "x.avg_online_per_session",
-    COL_MAX_ONLINE_SESSION: "x.max_online_per_session",
-    COL_LAST_ONLINE: "x.last_offline_time",
-    COL_JOIN_TIME: "x.join_server_time"
+    COL_NAME: attrgetter("name"),
+    COL_TOTAL_ONLINE: attrgetter("total_online_time"),
+    COL_TODAY_ONLINE: attrgetter("today_online_time"),
+    COL_AVG_ONLINE_DAY: attrgetter("avg_online_per_day"),
+    COL_ONLINE_TIMES: lambda x: len(x.online_times),
+    COL_AVG_ONLINE_SESSION: attrgetter("avg_online_per_session"),
+    COL_MAX_ONLINE_SESSION: attrgetter("max_online_per_session"),
+    COL_LAST_ONLINE: attrgetter("last_offline_time"),
+    COL_JOIN_TIME: attrgetter("join_server_time")
+}
+players_text_map = {
+    COL_NAME: attrgetter("name"),
+    COL_TOTAL_ONLINE: lambda x: string_fmt_time(x.total_online_time),
+    COL_TODAY_ONLINE: lambda x: string_fmt_time(x.today_online_time),
+    COL_AVG_ONLINE_DAY: lambda x: string_fmt_time(x.avg_online_per_day),
+    COL_ONLINE_TIMES: lambda x: str(len(x.online_times)),
+    COL_AVG_ONLINE_SESSION: lambda x: string_fmt_time(x.avg_online_per_session),
+    COL_MAX_ONLINE_SESSION: lambda x: string_fmt_time(x.max_online_per_session),
+    COL_LAST_ONLINE: lambda x: strftime("%y-%m-%d %H:%M:%S", localtime(x.last_offline_time)),
+    COL_JOIN_TIME: lambda x: strftime("%y-%m-%d %H:%M:%S", localtime(x.join_server_time))
 }
 
-
-class PlayerOnlineInfo:
-    """一个玩家的在线信息"""
-
-    def __init__(self, name: str, last_offline_time: float):
-        self.name: str = name
-        self.last_offline_time: float = last_offline_time
-        self.join_server_time: float = last_offline_time
-        self.total_online_time: float = 0
-        self.today_online_time: float = 0
-        self.avg_online_per_day: float = 0
-        self.avg_online_per_session: float = 0
-        self.max_online_per_session: float = 0
-        self.online_times: list[tuple[float, float]] = []
-
-
-def sort_players_info(players_info: dict[str, PlayerOnlineInfo], column: int, ascending: bool) -> dict[
-    str, PlayerOnlineInfo]:
-    """根据指定列对玩家信息进行排序"""
-    players_list = list(players_info.values())
-    players_list.sort(key=lambda x: eval(players_sort_map[column]), reverse=not ascending)
-    return {player.name: player for player in players_list}
+ANALYZE_STAGES = [7, 30, None]  # 逐步扩大的分析范围 (天), None为全部数据
+TIMELINE_NAME_WIDTH = 160  # 时间轴左侧玩家名称的宽度
+TIMELINE_HEADER_HEIGHT = 24
+TIMELINE_ROW_HEIGHT = 30
+TIMELINE_ROW_GAP = 6
+TIMELINE_MIN_SPAN = 60  # 最多放大到显示多少秒
+TIMELINE_TICK_STEPS = [60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400, 30 * 86400]
+
+
+def sort_players_order(players: list[PlayerOnlineInfo], column: int) -> np.ndarray:
+    """获取按指定列升序排列的玩家序号 (稳定排序)"""
+    keys = np.array([players_sort_map[column](player) for player in players])
+    return np.argsort(keys, kind="stable")
+
+
+def merge_pixel_spans(starts: np.ndarray, ends: np.ndarray, from_time: float, to_time: float,
+                      width: int) -> np.ndarray:
+    """
+    把 [from_time, to_time] 内的时间段映射到宽度为 width 的像素列上, 并合并相接或落在同一像素列内的相邻时间段
+    tip: 时间段需按开始时间排列且互不重叠, 不足一个像素的时间段也会画出一列
+    :return: (n, 2) 的 [起始列, 结束列) 数组
+    """
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    scale = width / (to_time - from_time)
+    left = np.floor((np.maximum(starts, from_time) - from_time) * scale).astype(np.int64)
+    right = np.ceil((np.minimum(ends, to_time) - from_time) * scale).astype(np.int64)
+    left = np.minimum(left, width - 1)
+    right = np.maximum(right, left + 1)
+    firsts = np.flatnonzero(np.r_[True, left[1:] > right[:-1]])
+    return np.column_stack((left[firsts], np.maximum.reduceat(right, firsts)))
 
 
 class OnlineTimeFilter:
-    def __init__(self, from_time: float = None, to_time: float = None):
+    def __init__(self, from_time: float = None, to_time: float = None, follow_today: bool = False):
         self.from_time = from_time
         self.to_time = to_time
+        self.follow_today = follow_today  # 范围是 "今天", 过了零点后随之移动
 
-    def filter(self, range_: tuple[float, float]) -> tuple[float, float] | None:
-        """过滤并截断时间范围"""
-        if self.from_time is None or self.to_time is None:
-            return range_
-        if self.from_time < range_[0] < self.to_time and self.from_time < range_[1] < self.to_time:
-            return range_
-        elif range_[0] < self.from_time < range_[1] < self.to_time:
-            return self.from_time, range_[1]
-        elif self.from_time < range_[0] < self.to_time < range_[1]:
-            return range_[0], self.to_time
-        else:
-            return None
+    @classmethod
+    def today(cls, timestamp: float = None) -> "OnlineTimeFilter":
+        """timestamp (默认为现在) 所在的一天"""
+        now = datetime.now() if timestamp is None else datetime.fromtimestamp(timestamp)
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = timedelta(days=1) + day_start
+        return cls(day_start.timestamp(), day_end.timestamp(), True)
 
 
 class OnlineInfoColor:
@@ -133,68 +156,184 @@ class DataTabShowDialog(wx.Dialog):
     def set_icon(self, name: str):
         status, head = skin_mgr.get_player_head(HeadLoadData(Player(name), size=80))
         if head:
-            self.SetIcon(wx.Icon(PilImg2WxImg(head).ConvertToBitmap()))
+            self.SetIcon(wx.Icon(head_bitmaps.get_bitmap(name, 80, status, head)))
+
 
+class OnlineTimeline(wx.ScrolledWindow):
+    """
+    所有玩家在线时间段的甘特图
+    所有行都画在这一个窗口上, 只绘制可见的行, 同一像素列内的时间段合并后再绘制
+    Ctrl+滚轮缩放时间轴, 拖动或Shift+滚轮平移, 双击还原
+    """
 
-class OnlineInfoLine(wx.Control):
-    def __init__(self, parent: wx.Window, online_times: list[tuple[float, float]], range_: tuple[float, float]):
-        super().__init__(parent, wx.ID_ANY, wx.DefaultPosition, (-1, 70), wx.NO_BORDER, wx.DefaultValidator,
-                         "OnlineInfoLine")
-        self.SetMinSize((1140, 70))
-        self.online_times = online_times
-        self.range_ = range_
+    def __init__(self, parent: wx.Window):
+        super().__init__(parent)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.EnableScrolling(False, False)  # 表头固定在顶部, 滚动时整个重绘
+        self.SetScrollRate(0, TIMELINE_ROW_HEIGHT)
+        self.session_index = SessionIndex.from_ranges({})
+        self.players: list[str] = []
+        self.range_: tuple[float, float] = (0, 1)  # 可以查看的时间范围
+        self.view: tuple[float, float] = (0, 1)  # 当前显示的时间范围
+        self.drag_start: tuple[int, float] | None = None  # (鼠标x, 开始拖动时的显示起始时间)
 
+        self.tooltip = wx.ToolTip("")
+        self.SetToolTip(self.tooltip)
         self.Bind(wx.EVT_PAINT, self.on_paint)
         self.Bind(wx.EVT_SIZE, self.on_size)
-        self.Bind(wx.EVT_MOTION, self.on_mouse_move)  # 绑定鼠标移动事件
+        self.Bind(wx.EVT_SCROLLWIN, self.on_scroll)
+        self.Bind(wx.EVT_MOUSEWHEEL, self.on_wheel)
+        self.Bind(wx.EVT_LEFT_DOWN, self.on_left_down)
+        self.Bind(wx.EVT_LEFT_UP, self.on_left_up)
+        self.Bind(wx.EVT_LEFT_DCLICK, lambda _: self.set_view(*self.range_))
+        self.Bind(wx.EVT_MOTION, self.on_mouse_move)
+        self.Bind(wx.EVT_MOUSE_CAPTURE_LOST, self.on_capture_lost)
+
+    def set_data(self, session_index: SessionIndex, players: list[str], range_: tuple[float, float]):
+        self.session_index = session_index
+        self.players = players
+        self.range_ = (range_[0], max(range_[1], range_[0] + 1))
+        self.view = self.range_
+        self.SetVirtualSize(0, TIMELINE_HEADER_HEIGHT + len(players) * TIMELINE_ROW_HEIGHT)
+        self.Refresh()
 
-        self.tooltip = wx.ToolTip("")
-        self.SetToolTip(self.tooltip)  # 设置工具提示
+    def get_bar_width(self) -> int:
+        return max(self.GetClientSize()[0] - TIMELINE_NAME_WIDTH - 1, 1)
 
-    def on_paint(self, _):
-        dc = wx.PaintDC(self)
+    def time_at(self, x: int) -> float:
+        """窗口x坐标对应的时间"""
+        from_time, to_time = self.view
+        return from_time + (x - TIMELINE_NAME_WIDTH) / self.get_bar_width() * (to_time - from_time)
 
-        min_time, max_time = self.range_
+    def row_at(self, y: int) -> int | None:
+        """窗口y坐标对应的行"""
+        if y < TIMELINE_HEADER_HEIGHT:
+            return None
+        row = (self.CalcUnscrolledPosition(0, y)[1] - TIMELINE_HEADER_HEIGHT) // TIMELINE_ROW_HEIGHT
+        return row if 0 <= row < len(self.players) else None
+
+    def set_view(self, from_time: float, to_time: float):
+        """设置显示的时间范围, 会被限制在可查看的范围内"""
+        full = self.range_[1] - self.range_[0]
+        span = max(min(to_time - from_time, full), min(TIMELINE_MIN_SPAN, full))
+        from_time = max(min(from_time, self.range_[1] - span), self.range_[0])
+        self.view = (from_time, from_time + span)
+        self.Refresh()
 
-        width, height = self.GetClientSize()
-        width -= 2
-        height -= 2
+    def zoom(self, center: float, factor: float):
+        """以 center 为中心缩放时间轴"""
+        from_time, to_time = self.view
+        ratio = (center - from_time) / (to_time - from_time)
+        span = (to_time - from_time) * factor
+        self.set_view(center - span * ratio, center - span * ratio + span)
 
-        dc.SetBrush(wx.Brush(OnlineInfoColor.BACKGROUND))
-        dc.DrawRectangle(-1, -1, width + 4, height + 4)
+    def on_paint(self, _):
+        dc = wx.AutoBufferedPaintDC(self)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
         dc.Clear()
-        dc.SetPen(wx.Pen(OnlineInfoColor.BAR))
-        dc.SetBrush(wx.Brush(OnlineInfoColor.BAR))  # 因为不知道怎么不画出边框，所以用同样的颜色掩盖一下
-
-        for online_time in self.online_times:
-            start_percent = (online_time[0] - min_time) / (max_time - min_time)
-            end_percent = (online_time[1] - min_time) / (max_time - min_time)
-            dc.DrawRectangle(int(start_percent * width), 1, int((end_percent - start_percent) * width), height - 2)
-
+        if not self.players:
+            dc.SetFont(ft(24))
+            dc.DrawText("这里找不到数据 /_ \\ \n你可以试试先在左边分析下", 20, 20)
+            return
+        width, height = self.GetClientSize()
+        bar_width = self.get_bar_width()
+        _, view_y = self.CalcUnscrolledPosition(0, 0)
+        first_row = max(view_y // TIMELINE_ROW_HEIGHT, 0)
+        last_row = min((view_y + height - TIMELINE_HEADER_HEIGHT) // TIMELINE_ROW_HEIGHT + 1, len(self.players))
+
+        dc.SetFont(ft(10))
+        dc.SetTextForeground(self.GetForegroundColour())
+        bar_pen, bar_brush = wx.Pen(OnlineInfoColor.BAR), wx.Brush(OnlineInfoColor.BAR)
+        for row in range(first_row, last_row):
+            player = self.players[row]
+            y = TIMELINE_HEADER_HEIGHT + row * TIMELINE_ROW_HEIGHT - view_y
+            bar_y, bar_height = y + TIMELINE_ROW_GAP // 2, TIMELINE_ROW_HEIGHT - TIMELINE_ROW_GAP
+            name = wx.Control.Ellipsize(player, dc, wx.ELLIPSIZE_END, TIMELINE_NAME_WIDTH - 8)
+            dc.DrawText(name, 4, y + (TIMELINE_ROW_HEIGHT - dc.GetTextExtent(name)[1]) // 2)
+
+            dc.SetPen(wx.Pen(OnlineInfoColor.BORDER))
+            dc.SetBrush(wx.Brush(OnlineInfoColor.BACKGROUND))
+            dc.DrawRectangle(TIMELINE_NAME_WIDTH, bar_y, bar_width + 1, bar_height)
+            first, last = self.session_index.player_span(player, *self.view)
+            spans = merge_pixel_spans(self.session_index.table.starts[first:last],
+                                      self.session_index.table.ends[first:last], *self.view, bar_width)
+            dc.DrawRectangleList([(TIMELINE_NAME_WIDTH + left, bar_y + 1, right - left, bar_height - 2)
+                                  for left, right in spans.tolist()], bar_pen, bar_brush)
+        self.draw_header(dc, width, bar_width)
+
+    def draw_header(self, dc: wx.DC, width: int, bar_width: int):
+        """绘制固定在顶部的时间刻度"""
         dc.SetPen(wx.Pen(OnlineInfoColor.BORDER))
-        dc.DrawLines([(0, 0), (width + 1, 0), (width + 1, height + 1), (0, height + 1), (0, 0)])
-
-    def on_size(self, event):
+        dc.SetBrush(wx.Brush(self.GetBackgroundColour()))
+        dc.DrawRectangle(-1, -1, width + 2, TIMELINE_HEADER_HEIGHT + 1)
+        from_time, to_time = self.view
+        pixel_time = (to_time - from_time) / bar_width
+        step = next((step for step in TIMELINE_TICK_STEPS if step / pixel_time >= 100), TIMELINE_TICK_STEPS[-1])
+        fmt = "%H:%M" if step < 86400 else "%m-%d"
+        offset = localtime(from_time).tm_gmtoff  # 刻度按本地时间对齐
+        tick = (from_time + offset) // step * step - offset
+        while tick <= to_time:
+            x = TIMELINE_NAME_WIDTH + round((tick - from_time) / pixel_time)
+            if x >= TIMELINE_NAME_WIDTH:
+                dc.DrawLine(x, TIMELINE_HEADER_HEIGHT - 6, x, TIMELINE_HEADER_HEIGHT)
+                dc.DrawText(strftime(fmt, localtime(tick)), x + 2, 2)
+            tick += step
+
+    def on_size(self, event: wx.SizeEvent):
         self.Refresh()
         event.Skip()
 
-    def on_mouse_move(self, event):
-        x, y = event.GetPosition()
-        min_time, max_time = self.range_
-        width, height = self.GetClientSize()
-        width -= 2
-        height -= 2
-
-        # 计算鼠标指针对应的时间
-        if 0 <= x <= width and 0 <= y <= height:
-            time_percent = x / width
-            time_at_mouse = min_time + time_percent * (max_time - min_time)
-            time_str = string_fmt_time(time_at_mouse - min_time)
-            self.tooltip.SetTip(f"Time: {time_str}")
+    def on_scroll(self, event: wx.ScrollWinEvent):
+        event.Skip()
+        wx.CallAfter(self.Refresh)
+
+    def on_wheel(self, event: wx.MouseEvent):
+        from_time, to_time = self.view
+        if event.ControlDown():
+            self.zoom(self.time_at(event.GetX()), 0.8 if event.GetWheelRotation() > 0 else 1.25)
+        elif event.ShiftDown():
+            shift = (to_time - from_time) * (-0.1 if event.GetWheelRotation() > 0 else 0.1)
+            self.set_view(from_time + shift, to_time + shift)
         else:
+            event.Skip()
+
+    def on_left_down(self, event: wx.MouseEvent):
+        if event.GetX() >= TIMELINE_NAME_WIDTH and self.players:
+            self.drag_start = (event.GetX(), self.view[0])
             self.tooltip.SetTip("")
+            self.CaptureMouse()
+        event.Skip()
+
+    def on_left_up(self, event: wx.MouseEvent):
+        if self.drag_start is not None:
+            self.drag_start = None
+            if self.HasCapture():
+                self.ReleaseMouse()
+        event.Skip()
+
+    def on_capture_lost(self, _):
+        self.drag_start = None
 
+    def on_mouse_move(self, event: wx.MouseEvent):
         event.Skip()
+        x, y = event.GetPosition()
+        if self.drag_start is not None and event.Dragging():
+            start_x, start_time = self.drag_start
+            span = self.view[1] - self.view[0]
+            from_time = start_time + (start_x - x) / self.get_bar_width() * span
+            self.set_view(from_time, from_time + span)
+            return
+        row = self.row_at(y)
+        if row is None or x < TIMELINE_NAME_WIDTH:
+            self.tooltip.SetTip("")
+            return
+        player, time_ = self.players[row], self.time_at(x)
+        tip = f"{player}\n{strftime('%y-%m-%d %H:%M:%S', localtime(time_))}"
+        first, last = self.session_index.player_span(player, time_, time_)
+        if last > first:
+            table = self.session_index.table
+            tip += f"\n在线 {string_fmt_time(table.ends[first] - table.starts[first])}"
+        self.tooltip.SetTip(tip)
 
 
 # noinspection PyPep8Naming
@@ -213,33 +352,18 @@ class PlayerOnlinePanel(wx.Panel):
         widget_sizer.Add(self.reset_btn)
         widget_sizer.Add(self.load_btn)
 
-        vbox = wx.BoxSizer(wx.VERTICAL)
         self.sizer = wx.BoxSizer(wx.VERTICAL)
-        self.scroll_panel = wx.ScrolledWindow(self)
-        self.scroll_panel.SetScrollbars(1, 1, 0, 450)
-        self.scroll_panel.SetScrollRate(20, 20)  # 滚动速度
-        self.data_panel = wx.Panel(self.scroll_panel)
-        vbox.Add(self.data_panel, wx.EXPAND)
-
-        self.scroll_panel.SetSizer(vbox)
+        self.timeline = OnlineTimeline(self)
         self.sizer.Add(self.time_selector, flag=wx.EXPAND, proportion=0)
-        self.sizer.Add(self.scroll_panel, flag=wx.EXPAND, proportion=1)
+        self.sizer.Add(self.timeline, flag=wx.EXPAND, proportion=1)
         self.SetSizer(self.sizer)
 
         self.reset_btn.Bind(wx.EVT_BUTTON, self.on_filter_update)
         self.load_btn.Bind(wx.EVT_BUTTON, self.on_filter_update)
 
-        self.raw_data: dict[str, list[tuple[float, float]]] = {}
-        self.active_datas: dict[str, list[tuple[float, float]]] = {}
+        self.session_index = SessionIndex.from_ranges({})
         self.active_filter: OnlineTimeFilter = OnlineTimeFilter()
 
-        self.data_sizer = wx.FlexGridSizer(0, 2, 5, 5)
-        self.data_panel.SetFont(ft(36))
-        self.data_sizer.Add(wx.StaticText(self.data_panel, label="这里找不到数据 /_ \\ \n你可以试试先在左边分析下"),
-                            wx.EXPAND)
-        self.data_panel.SetFont(ft(12))
-        self.data_panel.SetSizer(self.data_sizer)
-
     def on_filter_update(self, event: wx.Event):
         if event.GetEventObject() == self.reset_btn:
             self.active_filter = OnlineTimeFilter()
@@ -255,50 +379,22 @@ class PlayerOnlinePanel(wx.Panel):
             if not r:
                 self.time_selector.hour_enable = True
         self.filter_data()
-        self.redraw()
 
     def update_data(self, datas: dict[str, list[tuple[float, float]]]):
-        self.raw_data = datas
+        self.session_index = SessionIndex.from_ranges(datas)
         self.filter_data()
-        self.redraw()
 
     def filter_data(self):
-        self.active_datas.clear()
-        for player_name, online_times in self.raw_data.items():
-            for online_time in online_times:
-                result = self.active_filter.filter(online_time)
-                if not result:
-                    continue
-                if player_name not in self.active_datas:
-                    self.active_datas[player_name] = []
-                self.active_datas[player_name].append(result)
-
-    def redraw(self):
-        self.Freeze()
-        for child in self.data_sizer.GetChildren():
-            child.GetWindow().Destroy()
-        self.data_sizer.SetRows(len(self.active_datas))
-        if self.active_filter.from_time:
-            range_ = (self.active_filter.from_time, self.active_filter.to_time)
+        table = self.session_index.table
+        if not len(table):
+            self.timeline.set_data(self.session_index, [], (0, 1))
+        elif self.active_filter.from_time is None or self.active_filter.to_time is None:
+            self.timeline.set_data(self.session_index, list(table.names),
+                                   (float(table.starts.min()), float(table.ends.max())))
         else:
-            range_ = {0: 1145141919810, 1: 1145141919811}
-            for online_time in self.active_datas.values():
-                for time_ in online_time:
-                    if time_[0] < range_[0]:
-                        range_[0] = time_[0]
-                    if time_[1] > range_[1]:
-                        range_[1] = time_[1]
-            range_ = (range_[0], range_[1])
-
-        for player_name, online_times in self.active_datas.items():
-            self.data_sizer.Add(wx.StaticText(self.data_panel, label=player_name), proportion=0)
-            self.data_sizer.Add(OnlineInfoLine(self.data_panel, online_times, range_), flag=wx.EXPAND, proportion=1)
-        if not self.active_datas:
-            self.data_sizer.Add(wx.StaticText(self.data_panel, label="这里找不到数据 /_ \\"), wx.EXPAND)
-        self.data_panel.Layout()
-        self.scroll_panel.Layout()
-        self.Layout()
-        self.Thaw()
+            from_time, to_time = self.active_filter.from_time, self.active_filter.to_time
+            players = [name for name in table.names if self.session_index.online_seconds(name, from_time, to_time) > 0]
+            self.timeline.set_data(self.session_index, players, (from_time, to_time))
 
 
 class PlayerPanel(wx.Notebook):
@@ -359,8 +455,9 @@ class PlayerHeadList(wx.ImageList):
                 name, use_cache = self.tasks.pop(0)
             status, pil_image = skin_mgr.get_player_head(HeadLoadData(Player(name), 16, 1.0, use_cache))
             if status == ContentStatus.FAILED:
-                pil_image = Image.open("assets/default_skin/error_head_16px.png")
-            self[name] = PilImg2WxImg(pil_image).ConvertToBitmap()
+                self[name] = self.default
+                continue
+            self[name] = head_bitmaps.get_bitmap(name, 16, status, pil_image)
 
     def __getitem__(self, name: str):
         return self.GetBitmap(self.head_map[name])
@@ -374,13 +471,16 @@ class PlayerInfoPanel(wx.Panel):
 
     def __init__(self, parent: wx.Window):
         super().__init__(parent)
-        day_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = timedelta(days=1) + day_start
-        self.active_filter = OnlineTimeFilter(day_start.timestamp(), day_end.timestamp())
+        self.active_filter = OnlineTimeFilter.today()
         self.data_manager = common_data.data_manager  # 获取数据管理器用于数据操作
         self.sort_column = COL_NAME  # 设置默认排序列为玩家名列
         self.sort_ascending = False  # 降序排列
-        self.activate_datas = {}  # 初始化激活数据字典
+        self.players: list[PlayerOnlineInfo] = []  # 分析得到的玩家信息
+        self.player_ids: dict[str, int] = {}  # 玩家名 -> 在 self.players 中的序号
+        self.order = np.empty(0, dtype=np.int64)  # 行 -> 玩家序号
+        self.rows_of = np.empty(0, dtype=np.int64)  # 玩家序号 -> 行
+        self.sort_cache: dict[int, np.ndarray] = {}  # 列 -> 升序排列的玩家序号, 数据变化后失效
+        self.live_stats: LiveStats | None = None  # 分析完成后, 用新的数据点实时更新玩家信息
 
         sizer = wx.BoxSizer(wx.VERTICAL)
         # 创建时间选择控件并狠狠地给它注入两个按钮
@@ -398,7 +498,7 @@ class PlayerInfoPanel(wx.Panel):
         self.analyze_gauge = wx.Gauge(self, range=100, style=wx.GA_SMOOTH | wx.GA_TEXT)
 
         self.image_list = PlayerHeadList()
-        self.player_info_lc = wx.ListCtrl(self, style=wx.LC_REPORT)
+        self.player_info_lc = wx.ListCtrl(self, style=wx.LC_REPORT | wx.LC_VIRTUAL)
         column_map = {
             COL_PLAYER_HEAD: ("", 24),
             COL_RANK: ("排名", 50),
@@ -418,6 +518,8 @@ class PlayerInfoPanel(wx.Panel):
             else:
                 self.player_info_lc.InsertColumn(col + 1, name, width=width, format=wx.LIST_FORMAT_CENTER)
         self.player_info_lc.AssignImageList(self.image_list, wx.IMAGE_LIST_SMALL)
+        self.player_info_lc.OnGetItemText = self.OnGetItemText
+        self.player_info_lc.OnGetItemImage = self.OnGetItemImage
         self.start_analyze_btn.SetMaxSize((-1, 50))
         self.start_analyze_btn.SetMinSize((-1, 50))
         self.analyze_gauge.SetMaxSize((-1, 30))
@@ -430,7 +532,7 @@ class PlayerInfoPanel(wx.Panel):
         sizer.Add(self.player_info_lc, proportion=1, flag=wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, border=5)
         self.SetSizer(sizer)
 
-        self.analyze_thread = Thread(target=self.analyze_players, daemon=True)
+        self.analyze_jobs = JobManager("Analyzer")
         self.start_analyze_btn.Bind(wx.EVT_BUTTON, self.start_analyze)
         self.player_info_lc.Bind(wx.EVT_LIST_COL_CLICK, self.on_column_click)
         self.player_info_lc.Bind(wx.EVT_LIST_ITEM_RIGHT_CLICK, self.on_menu)
@@ -452,7 +554,7 @@ class PlayerInfoPanel(wx.Panel):
         first = players[0]
 
         def get_data(line, column) -> str:
-            return self.player_info_lc.GetItemText(line, column)
+            return self.OnGetItemText(line, column)
 
         def copy_detail():
             wx.TheClipboard.SetData(wx.TextDataObject(self.get_player_detail(first)))
@@ -479,7 +581,7 @@ class PlayerInfoPanel(wx.Panel):
     def get_player_detail(self, item: int):
 
         def get_data(line, column) -> str:
-            return self.player_info_lc.GetItemText(line, column)
+            return self.OnGetItemText(line, column)
 
         texts = [
             f"玩家: {get_data(item, COL_NAME)}",
@@ -498,7 +600,7 @@ class PlayerInfoPanel(wx.Panel):
         texts: dict[str, str] = {}
         name = ""
         for item in selections:
-            name = self.player_info_lc.GetItemText(item, COL_NAME)
+            name = self.get_row_player(item).name
             detail = self.get_player_detail(item)
             texts[name] = detail
         dialog = DataTabShowDialog(self, name if len(texts) == 1 else f"{len(texts)}玩家的详情", texts)
@@ -507,15 +609,15 @@ class PlayerInfoPanel(wx.Panel):
     ### Menu Event ###
 
     def on_activate_player(self, event: wx.ListEvent):
-        player = self.player_info_lc.GetItemText(event.GetItem().GetId(), COL_NAME)
+        player = self.get_row_player(event.GetIndex()).name
         self.open_hour_online_win(player)
 
     def refresh_player_head(self, selections: list[int]):
-        for name in [self.player_info_lc.GetItemText(i, COL_NAME) for i in selections]:
+        for name in [self.get_row_player(i).name for i in selections]:
             self.image_list.add_task(name, False)
 
     def add_players_to_preview(self, selections: list[int]):
-        event = AddPlayersOverviewEvent([self.player_info_lc.GetItemText(i, COL_NAME) for i in selections])
+        event = AddPlayersOverviewEvent([self.get_row_player(i).name for i in selections])
         event.SetEventObject(self)
         self.ProcessEvent(event)
 
@@ -524,9 +626,7 @@ class PlayerInfoPanel(wx.Panel):
 
     def on_filter_update(self, event: wx.Event):
         if event.GetEventObject() == self.reset_btn:
-            day_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = timedelta(days=1) + day_start
-            self.active_filter = OnlineTimeFilter(day_start.timestamp(), day_end.timestamp())
+            self.active_filter = OnlineTimeFilter.today()
         else:
             if self.time_selector.hour_enable:
                 r = self.time_selector.hour_enable = False
@@ -541,149 +641,130 @@ class PlayerInfoPanel(wx.Panel):
         self.start_analyze(None)
 
     def start_analyze(self, _):
-        """启动分析任务"""
-        self.analyze_gauge.SetValue(0)
-        self.analyze_thread = Thread(target=self.analyze_players, daemon=True)
-        self.analyze_thread.start()
-
-    def analyze_players(self):
-        """分析玩家在线信息"""
-        players_info = self.get_player_infos()  # 获取玩家在线信息
-        sorted_players_info = sort_players_info(players_info, self.sort_column, self.sort_ascending)
-        self.activate_datas = sorted_players_info
-        event = PlayerOnlineInfoEvent({name: info.online_times for name, info in players_info.items()})
-        event.SetEventObject(self)
-        self.ProcessEvent(event)
-        self.image_list.clear()
+        """启动分析任务, 正在运行的旧任务会被取消, 相同的任务不会重复运行"""
+        window = None
+        if self.active_filter.from_time is not None and self.active_filter.to_time is not None:
+            window = (self.active_filter.from_time, self.active_filter.to_time)
+        key = (window, config.min_online_time, self.data_manager.version)
+        if not self.analyze_jobs.job or self.analyze_jobs.job.key != key or not self.analyze_jobs.job.running:
+            self.analyze_gauge.SetValue(0)
+        self.analyze_jobs.submit(key, self.analyze_players, window)
+
+    def analyze_players(self, token: CancelToken, window: tuple[float, float] | None):
+        """
+        分析玩家在线信息
+        先分析最近的数据并展示部分结果, 再逐步扩大到全部数据
+        """
+        timer = Counter()
+        timer.start()
+        logger.info("开始分析玩家数据")
+        # 按最短在线时间合并后的时间段, 数据点很多时分片使用多个进程计算
+        snapshot = common_data.player_index.sync()
+        raw = session_table(snapshot, config.min_online_time, config.analysis_workers, config.analysis_shard_points)
+        token.check()
+        stages = [days for days in ANALYZE_STAGES
+                  if days is None or (len(raw) and raw.starts.min() < raw.last_time - days * 86400)]
+        for i, days in enumerate(stages):
+            table = raw if days is None else raw.clip_from(raw.last_time - days * 86400)
+            players_info = analyze_sessions(table, config.min_online_time, window)
+            token.check()
+            live_stats = None
+            if days is None:
+                live_stats = LiveStats(players_info, raw, config.min_online_time, window, snapshot.version)
+            wx.CallAfter(self.show_result, token, players_info, live_stats, (i + 1) / len(stages))
+            if days is not None:
+                logger.debug(f"最近 {days} 天的分析完成, 耗时 {timer.endT()}")
+        logger.info(f"分析完成, 共 {len(raw.names)} 个玩家, 耗时 {timer.endT()}")
+
+    def show_result(self, token: CancelToken, players_info: dict[str, PlayerOnlineInfo],
+                    live_stats: LiveStats | None, progress: float):
+        """展示分析结果, live_stats 为None时为部分结果"""
+        if token.cancelled:  # 已经有新的分析任务了
+            return
         for name in players_info.keys():
-            self.image_list.append(name)
-        self.populate_list(sorted_players_info)
+            if name not in self.image_list.head_map:
+                self.image_list.append(name)
+        self.live_stats = None
+        self.populate_list(players_info)
+        self.analyze_gauge.SetValue(int(progress * 100))
+        if live_stats is not None:
+            self.set_live_stats(live_stats)
+            event = PlayerOnlineInfoEvent({name: info.online_times for name, info in players_info.items()})
+            event.SetEventObject(self)
+            self.ProcessEvent(event)
 
     def populate_list(self, players_info: dict[str, PlayerOnlineInfo]):
-        """填充玩家信息到列表控件"""
-        self.player_info_lc.Freeze()
-        self.player_info_lc.DeleteAllItems()
-        for i, player_info, in enumerate(players_info.values()):
-            self.add_player(player_info, i + 1)
-        self.player_info_lc.Thaw()
-
-    def add_player(self, player: PlayerOnlineInfo, rank: int):
-        """添加一组信息进入列表"""
-        line = self.player_info_lc.GetItemCount()
-        data = {
-            COL_PLAYER_HEAD: self.image_list.head_map[player.name],
-            COL_RANK: str(rank),
-            COL_NAME: player.name,
-            COL_TOTAL_ONLINE: string_fmt_time(player.total_online_time),
-            COL_TODAY_ONLINE: string_fmt_time(player.today_online_time),
-            COL_AVG_ONLINE_DAY: string_fmt_time(player.avg_online_per_day),
-            COL_ONLINE_TIMES: str(len(player.online_times)),
-            COL_AVG_ONLINE_SESSION: string_fmt_time(player.avg_online_per_session),
-            COL_MAX_ONLINE_SESSION: string_fmt_time(player.max_online_per_session),
-            COL_LAST_ONLINE: strftime("%y-%m-%d %H:%M:%S", localtime(player.last_offline_time)),
-            COL_JOIN_TIME: strftime("%y-%m-%d %H:%M:%S", localtime(player.join_server_time))
-        }
-        for col, content in data.items():
-            if col == 0:
-                self.player_info_lc.InsertItem(line, "", content)
-            else:
-                self.player_info_lc.SetItem(line, col, content)
-
-    def get_player_infos(self) -> dict[str, PlayerOnlineInfo]:
-        """获取玩家在线时间信息"""
-        last_players: set[Player] = set()
-        player_infos: dict[str, PlayerOnlineInfo] = {}
-        length = len(self.data_manager.points)
-        last_progress = perf_counter()
-        logger.info("开始分析玩家数据")
-        for i, point in enumerate(self.data_manager.points):
-            players_set = set(point.players)  # 获取当前数据点的玩家集合
-            # 计算新增和下线玩家
-            added_players = players_set - last_players  # 获取新增玩家的集合
-            for player in added_players:
-                if player.name not in player_infos:
-                    player_infos[player.name] = PlayerOnlineInfo(player.name, point.time)  # 新增当前不存在在线数据的玩家
-                else:
-                    player_infos[player.name].last_offline_time = point.time  # 修改已存在玩家的最后在线时间
-
-            if i == length - 1:  # 获取下线玩家的集合, 最后的数据点处理所有玩家
-                lose_players = players_set
-            else:
-                lose_players = last_players - players_set
-            for player in lose_players:
-                info = player_infos[player.name]
-                info.online_times.append((info.last_offline_time, point.time))  # 添加玩家在线时间段
-                info.total_online_time += point.time - info.last_offline_time  # 累加玩家在线时间
-                info.last_offline_time = point.time  # 修改玩家最后在线时间
-
-            # 善后工作awa
-            last_players = players_set
-            if perf_counter() - last_progress > 0.5:  # OMG这个脚本怎么跑这么快
-                wx.CallAfter(self.analyze_gauge.SetValue, (i / length) * 100)
-                last_progress = perf_counter()
-
-        wx.CallAfter(self.analyze_gauge.SetValue, 100)
-        logger.info("分析完成")
-        for info in player_infos.values():
-            # 合并或删除在线时间段
-            merged_online_times = []
-            i = 0
-            while i < len(info.online_times):
-                start, end = info.online_times[i]
-                if end - start < config.min_online_time:
-                    # 如果在线时间小于min_online_time，检查是否可以与下一个时间段合并
-                    if i + 1 < len(info.online_times) and info.online_times[i + 1][0] - end < config.min_online_time:
-                        # 合并时间段
-                        # noinspection PyUnusedLocal
-                        end = info.online_times[i + 1][1]
-                        i += 1  # 跳过下一个时间段
-                else:
-                    # 否则，添加到合并列表
-                    merged_online_times.append((start, end))
-                i += 1
-
-            info.online_times = merged_online_times
-            info.total_online_time = sum(end - start for start, end in info.online_times)  # 重新计算总在线时间
-
-            if not info.online_times:
-                continue
-
-            # 计算玩家平均每天在线时间
-            days = set()  # 计算玩家在线天数
-            for start, end in info.online_times:
-                dt_obj = datetime.fromtimestamp(start)
-                days.add(str(dt_obj.date()))
-            info.avg_online_per_day = info.total_online_time / len(days)  # 总时间 / 玩家在线天数
-
-            # 计算玩家平均每次在线时间
-            times = len(info.online_times)  # 计算玩家在线次数
-            info.avg_online_per_session = info.total_online_time / times  # 总时间 / 玩家在线次数
-
-            # 计算玩家最大在线时间
-            info.max_online_per_session = 0
-            for start, stop in info.online_times:
-                during = stop - start
-                if during > info.max_online_per_session:  # 超过则代替
-                    info.max_online_per_session = during
-
-            # 计算玩家今天在线时间
-            match_times = []
-            for start, stop in info.online_times:
-                t = self.active_filter.filter((start, stop))
-                if t:
-                    match_times.append(t)
-            info.today_online_time = sum(stop - start for start, stop in match_times)
-
-            logger.debug(
-                f"玩家: {info.name}, "
-                f"在线时间: {info.total_online_time}, "
-                f"平均在线时间: {info.avg_online_per_session}, "
-                f"平均每天在线时间: {info.avg_online_per_day}, "
-                f"最大在线时间: {info.max_online_per_session}, "
-                f"今日在线时间: {info.today_online_time}"
-            )
-
-        return player_infos
+        """设置列表展示的玩家信息, 列表是虚拟的, 只有可见的单元格会被格式化"""
+        self.players = list(players_info.values())
+        self.player_ids = {player.name: i for i, player in enumerate(self.players)}
+        self.sort_cache.clear()
+        self.apply_sort()
+
+    def apply_sort(self):
+        """按当前的排序列重新排列行"""
+        ascending = self.sort_cache.get(self.sort_column)
+        if ascending is None:
+            ascending = self.sort_cache[self.sort_column] = sort_players_order(self.players, self.sort_column)
+        self.order = ascending if self.sort_ascending else ascending[::-1]
+        self.rows_of = np.empty_like(self.order)
+        self.rows_of[self.order] = np.arange(len(self.order))
+        self.player_info_lc.SetItemCount(len(self.order))
+        self.player_info_lc.Refresh()
+
+    def get_row_player(self, item: int) -> PlayerOnlineInfo:
+        return self.players[self.order[item]]
+
+    def OnGetItemText(self, item: int, col: int) -> str:
+        if col == COL_RANK:
+            return str(item + 1)
+        elif col in players_text_map:
+            return players_text_map[col](self.get_row_player(item))
+        return ""
+
+    def OnGetItemImage(self, item: int) -> int:
+        return self.image_list.head_map.get(self.get_row_player(item).name, 0)
+
+    def set_live_stats(self, live_stats: LiveStats):
+        """使用新的分析结果进行实时更新, 并补上分析开始后获取到的数据点"""
+        self.live_stats = live_stats
+        time_index = self.data_manager.time_index
+        for point in time_index.points[time_index.range(live_stats.last_time, float("inf"))[0]:]:
+            live_stats.update(point)
+        live_stats.version = self.data_manager.version
+
+    def on_new_point(self, point: ServerPoint):
+        """获取到新的数据点后, 只刷新 上线/下线/在线 的玩家所在的行, 不会重新排序"""
+        if self.live_stats is None:
+            return
+        if self.live_stats.version == self.data_manager.version and point.time <= self.live_stats.last_time:
+            return  # 已在 set_live_stats 补上
+        if self.live_stats.version != self.data_manager.version - 1:  # 期间数据点被删除或修改过, 重新分析
+            self.live_stats = None
+            self.start_analyze(None)
+            return
+        self.live_stats.version = self.data_manager.version
+        rolled = self.active_filter.follow_today and point.time >= self.active_filter.to_time
+        if rolled:  # 过了零点, "今天" 移动到新的一天
+            self.active_filter = OnlineTimeFilter.today(point.time)
+            self.live_stats.set_window((self.active_filter.from_time, self.active_filter.to_time))
+        changed, new_players = self.live_stats.update(point)
+        if not changed and not rolled:
+            return
+        self.sort_cache.clear()
+        for name in new_players:  # 新玩家添加到列表末尾
+            self.player_ids[name] = len(self.players)
+            self.players.append(self.live_stats.infos[name])
+            self.image_list.append(name)
+        if new_players:
+            new_ids = np.arange(len(self.order), len(self.players))
+            self.order = np.concatenate([self.order, new_ids])
+            self.rows_of = np.concatenate([self.rows_of, new_ids])
+            self.player_info_lc.SetItemCount(len(self.order))
+        if rolled:  # 所有玩家的今日在线时长都变了
+            self.player_info_lc.Refresh()
+            return
+        for name in changed:
+            self.player_info_lc.RefreshItem(int(self.rows_of[self.player_ids[name]]))
 
     def on_column_click(self, event):
         """列头点击事件处理函数"""
@@ -696,5 +777,4 @@ class PlayerInfoPanel(wx.Panel):
             self.sort_column = column
             self.sort_ascending = True
 
-        sorted_players_info = sort_players_info(self.activate_datas, column, self.sort_ascending)
-        self.populate_list(sorted_players_info)
+        self.apply_sort()
@@ -0,0 +1,289 @@
+"""
+在线人数图表的公共部分
+提供 数据点管理、缩放/拖动、ToolTip 等与绘制后端无关的逻辑
+"""
+from datetime import datetime
+from threading import Thread
+
+import numpy as np
+import wx
+
+from gui.events import JumpToPointEvent
+from gui.widget import ToolTip, EasyMenu, DataShowDialog
+from lib.common_data import common_data
+from lib.config import config, PlotGapMode
+from lib.data import DataFilter, ServerPoint
+from lib.log import logger
+from lib.plot_tiles import TilePyramid, PlotView
+
+clamp = lambda x, a, b: max(min(x, b), a)
+
+
+def build_gap_line(times: list[float], values: list[float], sep: float,
+                   mode: PlotGapMode) -> tuple[np.ndarray, np.ndarray]:
+    """
+    处理数据点之间的空隙, 只修改用于绘制的数组, 不会创建新的数据点
+    :param times: 数据点时间列表 (已排序)
+    :param values: 数据点数值列表
+    :param sep: 超过该间隔 (秒) 视为空隙
+    :param mode: 空隙的绘制方式, 断开折线(NaN) 或 保持上一个值
+    :return: 绘制用的时间数组和数值数组
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    gaps = np.flatnonzero(np.diff(times) >= sep) + 1  # 空隙后第一个点的索引
+    if len(gaps) == 0:
+        return times, values
+    if mode == PlotGapMode.HOLD:
+        insert_times = times[gaps]
+        insert_values = values[gaps - 1]
+    else:
+        insert_times = (times[gaps - 1] + times[gaps]) / 2
+        insert_values = np.full(len(gaps), np.nan)
+    return np.insert(times, gaps, insert_times), np.insert(values, gaps, insert_values)
+
+
+class PlotBase:
+    """
+    图表用于展示在线人数数据 (公共逻辑)
+    子类需要是一个wx.Window, 并实现 get_plot_extent, draw_plot, update_scale
+    """
+
+    def init_plot(self: "PlotBase | wx.Window"):
+        """初始化数据与鼠标控制, 由子类在窗口创建后调用"""
+        self.activate_filter = DataFilter()
+        self.raw_datas: dict[float, ServerPoint] = {}  # 全部数据点
+        self.datas: dict[float, ServerPoint] = {}  # 展示的数据点 (不包含缩放)
+        self.pyramid = TilePyramid()  # 展示的数据点的瓦片金字塔, 用于缩放/拖动时取得可视范围的绘制数据
+        self.offset: float = 0.0  # 当前显示的起始索引
+        self.scale: float = 1.0  # 缩放大小
+        self.drag_start_x: int = 0  # 拖动起始位置
+        self.drag_start_offset: float = 0.0  # 拖动开始时候的偏移量
+        self.active_mouse_point: ServerPoint | None = None  # 目前ToolTip展示的数据点
+
+        self.draw_call = wx.CallLater(50, self.draw_plot)
+        self.draw_plot()
+        self.Bind(wx.EVT_MOUSE_EVENTS, self.control_plot)
+        self.tooltip = ToolTip(self, "")  # 创建工具提示
+
+        self.tooltip.label.SetForegroundColour(wx.Colour(int(config.plot_fg_color[1:], base=16)))
+        self.tooltip.SetBackgroundColour(wx.Colour(int(config.plot_bg_color[1:], base=16)))
+
+    def get_plot_extent(self) -> tuple[int, int]:
+        """图表绘制区域在控件中的 左, 右 边界 (像素)"""
+        raise NotImplementedError
+
+    def draw_plot(self):
+        """完整地重新绘制图表"""
+        raise NotImplementedError
+
+    def update_scale(self):
+        """更新图表缩放范围"""
+        raise NotImplementedError
+
+    @property
+    def crt_range(self):
+        """目前展示图表区域占整个图表的比例"""
+        return 1 / self.scale
+
+    def get_plot_width(self) -> int:
+        """图表绘制区域的宽度 (像素)"""
+        x0, x1 = self.get_plot_extent()
+        return max(x1 - x0, 1)
+
+    def get_visible_range(self) -> tuple[float, float]:
+        """目前可视范围的 开始, 结束 时间"""
+        min_time, max_time = self.pyramid.time_range
+        size = max_time - min_time
+        in_pt = min_time + size * self.offset
+        return in_pt, in_pt + size / self.scale
+
+    def get_view(self, in_pt: float, out_pt: float, pixels: int) -> tuple[PlotView, float]:
+        """
+        获取可视范围的绘制数据
+        :return: 绘制数据, 处理空隙使用的间隔
+        """
+        view = self.pyramid.view(in_pt, out_pt, pixels)
+        sep = max(config.fix_sep, view.bucket_width * 1.5)  # 聚合视图中相邻的非空桶不视为空隙
+        wx.CallAfter(self.pyramid.prefetch, in_pt, out_pt, pixels)  # 预取相邻的瓦片
+        return view, sep
+
+    def on_mouse_move(self: "PlotBase | wx.Window", x: int, y: int):
+        """ToolTip的显示更新"""
+        if not self.datas:
+            return
+        # 检测鼠标指针是否是否在图表控件内
+        if not self.GetClientRect().Contains(x, y):
+            self.tooltip.set_tip("")
+            return
+
+        exact_time = self.time_at(x)
+        if exact_time is None:  # 超出范围不予受理
+            self.tooltip.set_tip("")
+            return
+
+        # 获取距离该时间最近的数据点
+        closest_time = self.pyramid.nearest_time(exact_time)
+        point = self.active_mouse_point = self.datas[closest_time]
+
+        # 格式化数据点显示ToolTip
+        time_str = datetime.fromtimestamp(closest_time).strftime('%Y-%m-%d %H:%M:%S')
+        players = ""
+        for i, player in enumerate(point.players):
+            if i == len(point.players) - 1:
+                players += f"{player.name}"
+            elif i % 3 == 2:
+                players += f"{player.name}\n"
+            else:
+                players += f"{player.name}, "
+        tooltip_text = f"时间: {time_str}\n人数: {point.online}"
+        if point.players:
+            tooltip_text += f"\n玩家: \n{players}"
+        self.tooltip.set_tip(tooltip_text)
+
+    def time_at(self, x: int) -> float | None:
+        """获取鼠标x坐标对应的时间, 超出图表范围时返回None"""
+        x0, x1 = self.get_plot_extent()
+        percent = (x - x0) / max(x1 - x0, 1)  # 鼠标x坐标在图表中的百分比
+        if percent < 0 or percent > 1:
+            return None
+        real_percent = self.offset + percent * self.crt_range
+        min_time, max_time = self.pyramid.time_range
+        return min_time + (max_time - min_time) * real_percent
+
+    def show_menu(self: "PlotBase | wx.Window", x: int, y: int):
+        """右键菜单: 跳转到数据点, 查询某时刻/可视范围内在线的玩家"""
+        exact_time = self.time_at(x) if self.datas else None
+        if exact_time is None:
+            return
+        menu = EasyMenu()
+        if self.active_mouse_point:
+            menu.Append("跳转到数据点", self.jump_to_point, self.active_mouse_point)
+        menu.Append("该时刻在线的玩家", self.show_players_at, exact_time)
+        menu.Append("可视范围内在线过的玩家", self.show_players_between, *self.get_visible_range())
+        self.PopupMenu(menu, x, y)
+
+    def jump_to_point(self: "PlotBase | wx.Window", point: ServerPoint):
+        event = JumpToPointEvent(point)
+        event.SetEventObject(self)
+        self.ProcessEvent(event)
+
+    def show_players_at(self: "PlotBase | wx.Window", timestamp: float):
+        players = sorted(common_data.data_manager.get_players_at(timestamp), key=str.lower)
+        time_str = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        DataShowDialog(self, players, "玩家", f"{time_str} 在线的玩家 ({len(players)})").ShowModal()
+
+    def show_players_between(self: "PlotBase | wx.Window", from_time: float, to_time: float):
+        """在线时间段索引可能需要重建, 在线程中查询, 完成后再显示对话框"""
+        session_index = common_data.session_index
+
+        def query():
+            players = sorted(session_index.get().players_between(from_time, to_time), key=str.lower)
+            wx.CallAfter(self.show_players_dialog, players, from_time, to_time)
+
+        Thread(target=query, daemon=True).start()
+
+    def show_players_dialog(self: "PlotBase | wx.Window", players: list[str], from_time: float, to_time: float):
+        if not self:  # 查询期间面板已被销毁 (切换服务器)
+            return
+        from_str = datetime.fromtimestamp(from_time).strftime('%m-%d %H:%M')
+        to_str = datetime.fromtimestamp(to_time).strftime('%m-%d %H:%M')
+        DataShowDialog(self, players, "玩家", f"{from_str} ~ {to_str} 在线过的玩家 ({len(players)})").ShowModal()
+
+    def update_filter(self, filter_: DataFilter):
+        """更新数据点过滤器"""
+        self.activate_filter = filter_
+        self.datas = {p.time: p for p in filter_.filter_points(self.raw_datas)}  # 根据筛选条件更新数据
+        self.reload_pyramid()
+        if filter_.from_time is not None:
+            self.scale = 1.0
+            self.offset = 0
+        if self.draw_call.IsRunning():
+            self.draw_call.Restart()
+        else:
+            self.draw_call.Start()
+
+    def control_plot(self: "PlotBase | wx.Window", event: wx.MouseEvent):
+        """
+        滚轮缩放和拖动
+        """
+        event.Skip()
+        if event.LeftDown():  # 开始拖动图表
+            self.drag_start_x = event.GetX()
+            self.drag_start_offset = self.offset
+            self.tooltip.set_tip("")
+            return
+        elif event.Dragging():  # 拖动图表中...
+            if self.drag_start_x == 0:
+                return
+            drag_distance_percent = (self.drag_start_x - event.GetX()) / self.get_plot_width()
+            real_percent = drag_distance_percent / self.scale
+            self.offset = self.drag_start_offset + real_percent
+        elif event.LeftUp():  # 拖放结束
+            self.drag_start_x = self.drag_start_offset = 0
+            self.on_mouse_move(event.GetX(), event.GetY())
+        elif event.RightDown():
+            self.tooltip.set_tip("")
+            self.show_menu(event.GetX(), event.GetY())
+        elif event.GetWheelRotation():
+            last_scale = self.scale
+            if event.GetWheelRotation() > 0:
+                self.scale /= 0.9  # 放大
+                if not self.scale >= config.plot_max_scale:
+                    self.offset += (1 / last_scale - 1 / self.scale) / 2
+            else:
+                self.scale *= 0.9  # 缩小
+                self.offset -= (1 / self.scale - 1 / last_scale) / 2
+        elif event.Moving():
+            self.on_mouse_move(event.GetX(), event.GetY())
+            return
+        else:
+            return
+        self.offset = round(clamp(self.offset, 0, 1 - self.crt_range), 5)
+        self.scale = round(clamp(self.scale, 1, config.plot_max_scale), 5)
+        logger.debug(f"起始偏移: {self.offset}, 缩放: {self.scale}")
+        self.update_scale()
+
+    def load_point(self, point: ServerPoint, runtime_add: bool = False):
+        """
+        添加数据点 (GUI层面)
+        :param point: 数据点
+        :param runtime_add: 是否为运行时添加, 以便自动滚动图表
+        """
+        self.add_data(point)
+        # 自动滚动
+        if runtime_add and round(self.offset + self.crt_range, 3) == 1:
+            self.offset = 1 - self.crt_range
+        # 启动刷新计时器
+        if self.draw_call.IsRunning():
+            self.draw_call.Restart()
+        elif runtime_add:
+            self.draw_call.Start()
+
+    def add_data(self, point: ServerPoint):
+        """
+        添加数据点
+        tip: 数据空隙在绘制时处理, 见 build_gap_line
+        :param point: 数据点
+        """
+        self.raw_datas[point.time] = point
+        if self.activate_filter.check(point):
+            self.datas[point.time] = point
+            self.pyramid.append(point.time, point.online)
+
+    def points_init(self, points: list[ServerPoint]):
+        """
+        用存储的数据点初始化图表
+        :param points: 数据点列表
+        """
+        self.raw_datas = {p.time: p for p in points}
+        self.datas = {p.time: p for p in points}
+        self.reload_pyramid()
+        self.scale = 1 / 0.15
+        self.offset = 1 - self.crt_range
+        self.draw_plot()
+
+    def reload_pyramid(self):
+        """用展示的数据点重建瓦片金字塔"""
+        times = sorted(self.datas.keys())
+        self.pyramid.set_data(times, [self.datas[t].online for t in times])
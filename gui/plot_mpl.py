@@ -0,0 +1,117 @@
+"""
+在线人数图表 - matplotlib 绘制后端
+"""
+from datetime import datetime
+
+import numpy as np
+import wx
+from matplotlib import pyplot as plt
+from matplotlib import rcParams as mpl_rcParams
+from matplotlib.backends import backend_wxagg as wxagg
+from matplotlib.dates import DateFormatter
+from matplotlib.figure import Figure
+from matplotlib.ticker import Formatter
+from matplotlib.transforms import Bbox
+
+from gui.plot_base import PlotBase, build_gap_line
+from lib.config import config
+
+mpl_rcParams["font.family"] = "Microsoft YaHei"
+plt.rcParams["axes.unicode_minus"] = False
+
+
+class UniqueIntFormatter(Formatter):
+    def __init__(self):
+        super().__init__()
+
+    def format_ticks(self, values):
+        # 只保留整数且唯一的值
+        unique_ints = set(int(v) for v in values if v.is_integer())
+        return [str(v)[:-2] if v in unique_ints else '' for v in values]
+
+
+class MplPlot(PlotBase, wxagg.FigureCanvasWxAgg):
+    """图表用于展示在线人数数据 (matplotlib绘制)"""
+
+    def __init__(self, parent: wx.Window):
+        wxagg.FigureCanvasWxAgg.__init__(self, parent, wx.ID_ANY, Figure(tight_layout=True))
+        self.axes = self.figure.gca()
+        self.line = None  # 在线人数折线
+        self.band = None  # 聚合视图下的 最小-最大 人数范围
+
+        # 创建图表
+        self.set_control_color()
+        config.hook_configs(self.set_control_color, "plot_fg_color", "plot_bg_color", "plot_grid_color")
+        config.hook_configs(self.line_config_cbk, "plot_line_color", "plot_line_width", "plot_line_alpha",
+                            "fix_sep", "plot_gap_mode")
+        self.init_plot()
+
+    def set_control_color(self, *_):
+        axes = self.figure.gca()
+        # axes.set_title("在线人数", color=config.plot_fg_color)
+        axes.set_xlabel("时间", color=config.plot_fg_color)
+        axes.set_ylabel("在线人数", color=config.plot_fg_color)
+        axes.tick_params(axis='x', colors=config.plot_fg_color)
+        axes.tick_params(axis='y', colors=config.plot_fg_color)
+        axes.set_facecolor(config.plot_bg_color)
+        axes.grid(True, color=config.plot_grid_color)
+        self.figure.set_facecolor(config.plot_bg_color)
+        self.figure.set_edgecolor(config.plot_fg_color)
+        self.figure.canvas.draw()
+
+    def line_config_cbk(self, *_):
+        self.draw_plot()
+
+    def get_plot_extent(self) -> tuple[int, int]:
+        box: Bbox = self.axes.get_window_extent()
+        return round(box.x0), round(box.x1)
+
+    def update_scale(self):
+        """
+        更新图表缩放范围
+        tip: 只绘制可视范围内的 原始数据点/对应级别的聚合瓦片, 绘制量与数据总量无关
+        """
+        if not self.datas or self.line is None:
+            return
+        in_pt, out_pt = self.get_visible_range()
+        view, sep = self.get_view(in_pt, out_pt, self.get_plot_width())
+        times, values = build_gap_line(view.times, view.values, sep, config.plot_gap_mode)
+        self.line.set_data([datetime.fromtimestamp(t) for t in times], values)
+        if self.band is not None:
+            self.band.remove()
+            self.band = None
+        if not view.is_raw:
+            _, mins = build_gap_line(view.times, view.mins, sep, config.plot_gap_mode)
+            _, maxs = build_gap_line(view.times, view.maxs, sep, config.plot_gap_mode)
+            self.band = self.axes.fill_between([datetime.fromtimestamp(t) for t in times], mins, maxs,
+                                               color=config.plot_line_color, alpha=config.plot_line_alpha * 0.3,
+                                               linewidth=0)
+
+        # 设置 X 轴范围
+        self.axes.set_xlim(datetime.fromtimestamp(in_pt), datetime.fromtimestamp(out_pt))
+
+        # 计算当前可视区域内数据的 Y 轴范围
+        visible = (view.times >= in_pt) & (view.times <= out_pt)
+        if visible.any():
+            y_min = np.nanmin((view.values if view.is_raw else view.mins)[visible])
+            y_max = np.nanmax((view.values if view.is_raw else view.maxs)[visible])
+            margin = (y_max - y_min) * 0.1  # 添加 10% 边距
+            self.axes.set_ylim(y_min - margin, y_max + margin)
+
+        # 重新绘制图表
+        self.figure.canvas.draw()
+
+    def draw_plot(self):
+        """绘制图表"""
+        if not self.datas:
+            return
+        self.axes.cla()
+        self.band = None
+        self.axes.grid(True, color=config.plot_grid_color)
+        self.line, = self.axes.plot(
+            [datetime.fromtimestamp(self.pyramid.time_range[0])], [np.nan],
+            color=config.plot_line_color, linewidth=config.plot_line_width, alpha=config.plot_line_alpha
+        )
+        self.axes.xaxis.set_major_formatter(DateFormatter('%d %H:%M'))
+        self.axes.yaxis.set_major_formatter(UniqueIntFormatter())
+        self.update_scale()
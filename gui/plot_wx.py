@@ -0,0 +1,203 @@
+"""
+在线人数图表 - wx原生绘制后端
+不依赖matplotlib, 使用 wx.GraphicsContext 直接绘制可视范围内的数据
+"""
+from math import ceil, floor, log10
+from time import localtime, strftime
+
+import numpy as np
+import wx
+
+from gui.plot_base import PlotBase, build_gap_line
+from lib.config import config
+from lib.plot_tiles import PlotView
+
+MARGIN_LEFT = 55
+MARGIN_RIGHT = 15
+MARGIN_TOP = 10
+MARGIN_BOTTOM = 45
+TIME_STEPS = [60, 300, 600, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600,
+              86400, 2 * 86400, 7 * 86400, 14 * 86400, 30 * 86400, 91 * 86400, 365 * 86400]
+TIME_TICK_WIDTH = 90  # 每个时间刻度至少占用的像素
+VALUE_TICK_HEIGHT = 30  # 每个人数刻度至少占用的像素
+
+
+def hex_colour(color: str, alpha: float = 1.0) -> wx.Colour:
+    rgb = int(color[1:], base=16)
+    return wx.Colour(rgb >> 16 & 0xFF, rgb >> 8 & 0xFF, rgb & 0xFF, round(alpha * 255))
+
+
+def value_ticks(y_min: float, y_max: float, count: int) -> list[float]:
+    """获取人数轴的刻度, 步长为 1, 2, 5 的十的幂倍 且不小于1"""
+    raw_step = (y_max - y_min) / max(count, 1)
+    step = 1.0
+    if raw_step > 1:
+        mag = 10 ** floor(log10(raw_step))
+        step = next(m * mag for m in (1, 2, 5, 10) if m * mag >= raw_step)
+    start = ceil(y_min / step) * step
+    return list(np.arange(start, y_max + step * 1e-6, step))
+
+
+def time_ticks(in_pt: float, out_pt: float, count: int) -> list[float]:
+    """获取时间轴的刻度, 按本地时间对齐"""
+    span = out_pt - in_pt
+    step = next((s for s in TIME_STEPS if span / s <= count), TIME_STEPS[-1])
+    tz_offset = localtime(in_pt).tm_gmtoff
+    start = ceil((in_pt + tz_offset) / step) * step - tz_offset
+    return list(np.arange(start, out_pt, step))
+
+
+class WxPlot(PlotBase, wx.Window):
+    """图表用于展示在线人数数据 (wx原生绘制)"""
+
+    def __init__(self, parent: wx.Window):
+        wx.Window.__init__(self, parent, style=wx.FULL_REPAINT_ON_RESIZE)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.SetFont(wx.Font(9, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL,
+                             faceName="Microsoft YaHei"))
+        self.view: PlotView | None = None  # 目前可视范围的绘制数据
+        self.view_sep: float = config.fix_sep
+        self.x_range: tuple[float, float] = (0.0, 1.0)
+        self.y_range: tuple[float, float] = (0.0, 1.0)
+
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_SIZE, self.on_size)
+        config.hook_configs(self.color_config_cbk, "plot_fg_color", "plot_bg_color", "plot_grid_color")
+        config.hook_configs(self.line_config_cbk, "plot_line_color", "plot_line_width", "plot_line_alpha",
+                            "fix_sep", "plot_gap_mode")
+        self.init_plot()
+
+    def color_config_cbk(self, *_):
+        self.Refresh()
+
+    def line_config_cbk(self, *_):
+        self.draw_plot()
+
+    def on_size(self, event: wx.SizeEvent):
+        event.Skip()
+        self.update_scale()  # 宽度变化后可视范围需要的数据量也会变化
+
+    def get_plot_extent(self) -> tuple[int, int]:
+        return MARGIN_LEFT, max(self.GetClientSize()[0] - MARGIN_RIGHT, MARGIN_LEFT + 1)
+
+    def get_plot_rect(self) -> wx.Rect:
+        width, height = self.GetClientSize()
+        return wx.Rect(MARGIN_LEFT, MARGIN_TOP,
+                       max(width - MARGIN_LEFT - MARGIN_RIGHT, 1), max(height - MARGIN_TOP - MARGIN_BOTTOM, 1))
+
+    def draw_plot(self):
+        """绘制图表"""
+        self.update_scale()
+
+    def update_scale(self):
+        """
+        更新图表缩放范围
+        tip: 只取得可视范围内的 原始数据点/对应级别的聚合瓦片, 真正的绘制在 on_paint 中完成
+        """
+        if not self.datas:
+            self.view = None
+            self.Refresh()
+            return
+        in_pt, out_pt = self.get_visible_range()
+        self.view, self.view_sep = self.get_view(in_pt, out_pt, self.get_plot_width())
+        self.x_range = (in_pt, out_pt)
+
+        # 计算当前可视区域内数据的 Y 轴范围
+        view = self.view
+        visible = (view.times >= in_pt) & (view.times <= out_pt)
+        if visible.any():
+            y_min = float(np.nanmin((view.values if view.is_raw else view.mins)[visible]))
+            y_max = float(np.nanmax((view.values if view.is_raw else view.maxs)[visible]))
+            margin = max((y_max - y_min) * 0.1, 0.5)  # 添加 10% 边距
+            self.y_range = (y_min - margin, y_max + margin)
+        self.Refresh()
+
+    def on_paint(self, _):
+        dc = wx.AutoBufferedPaintDC(self)
+        dc.SetBackground(wx.Brush(hex_colour(config.plot_bg_color)))
+        dc.Clear()
+        gc: wx.GraphicsContext = wx.GraphicsContext.Create(dc)
+        if gc is None:
+            return
+        gc.SetFont(self.GetFont(), hex_colour(config.plot_fg_color))
+        rect = self.get_plot_rect()
+        self.draw_axes(gc, rect)
+        if self.view is not None and len(self.view.times):
+            gc.Clip(rect)
+            self.draw_line(gc, rect)
+            gc.ResetClip()
+
+    def map_x(self, times: np.ndarray, rect: wx.Rect) -> np.ndarray:
+        x0, x1 = self.x_range
+        return rect.x + (times - x0) / max(x1 - x0, 1e-9) * rect.width
+
+    def map_y(self, values: np.ndarray, rect: wx.Rect) -> np.ndarray:
+        y0, y1 = self.y_range
+        return rect.y + rect.height - (values - y0) / max(y1 - y0, 1e-9) * rect.height
+
+    def draw_axes(self, gc: wx.GraphicsContext, rect: wx.Rect):
+        """绘制 网格、刻度、坐标轴标签"""
+        fg_pen = wx.Pen(hex_colour(config.plot_fg_color))
+        grid_pen = wx.Pen(hex_colour(config.plot_grid_color))
+        if self.view is not None:
+            for value in value_ticks(*self.y_range, rect.height // VALUE_TICK_HEIGHT):
+                y = float(self.map_y(np.float64(value), rect))
+                gc.SetPen(grid_pen)
+                gc.StrokeLine(rect.x, y, rect.GetRight(), y)
+                text = str(int(value))
+                text_w, text_h = gc.GetTextExtent(text)
+                gc.DrawText(text, rect.x - text_w - 5, y - text_h / 2)
+            for tick in time_ticks(*self.x_range, rect.width // TIME_TICK_WIDTH):
+                x = float(self.map_x(np.float64(tick), rect))
+                gc.SetPen(grid_pen)
+                gc.StrokeLine(x, rect.y, x, rect.GetBottom())
+                text = strftime("%d %H:%M", localtime(tick))
+                text_w, _ = gc.GetTextExtent(text)
+                gc.DrawText(text, x - text_w / 2, rect.GetBottom() + 4)
+        gc.SetPen(fg_pen)
+        gc.SetBrush(wx.TRANSPARENT_BRUSH)
+        gc.DrawRectangle(rect.x, rect.y, rect.width, rect.height)
+
+        text_w, text_h = gc.GetTextExtent("时间")
+        gc.DrawText("时间", rect.x + (rect.width - text_w) / 2, rect.GetBottom() + 6 + text_h)
+        text_w, text_h = gc.GetTextExtent("在线人数")
+        gc.DrawText("在线人数", 2, rect.y + (rect.height + text_w) / 2, np.pi / 2)
+
+    def draw_line(self, gc: wx.GraphicsContext, rect: wx.Rect):
+        """绘制折线, 以及聚合视图下的 最小-最大 人数范围"""
+        view = self.view
+        times, values = build_gap_line(view.times, view.values, self.view_sep, config.plot_gap_mode)
+        xs = self.map_x(times, rect)
+        if not view.is_raw:
+            _, mins = build_gap_line(view.times, view.mins, self.view_sep, config.plot_gap_mode)
+            _, maxs = build_gap_line(view.times, view.maxs, self.view_sep, config.plot_gap_mode)
+            band = gc.CreatePath()
+            for seg in self.split_segments(values):
+                seg_xs = xs[seg]
+                upper, lower = self.map_y(maxs[seg], rect), self.map_y(mins[seg], rect)
+                band.MoveToPoint(seg_xs[0], upper[0])
+                for x, y in zip(seg_xs[1:], upper[1:]):
+                    band.AddLineToPoint(x, y)
+                for x, y in zip(seg_xs[::-1], lower[::-1]):
+                    band.AddLineToPoint(x, y)
+                band.CloseSubpath()
+            gc.SetPen(wx.TRANSPARENT_PEN)
+            gc.SetBrush(wx.Brush(hex_colour(config.plot_line_color, config.plot_line_alpha * 0.3)))
+            gc.FillPath(band)
+
+        ys = self.map_y(values, rect)
+        path = gc.CreatePath()
+        for seg in self.split_segments(values):
+            path.MoveToPoint(xs[seg.start], ys[seg.start])
+            for x, y in zip(xs[seg.start + 1:seg.stop], ys[seg.start + 1:seg.stop]):
+                path.AddLineToPoint(x, y)
+        gc.SetPen(wx.Pen(hex_colour(config.plot_line_color, config.plot_line_alpha),
+                         max(round(config.plot_line_width), 1)))
+        gc.StrokePath(path)
+
+    @staticmethod
+    def split_segments(values: np.ndarray) -> list[slice]:
+        """按 NaN 把折线分成连续的几段"""
+        valid = ~np.isnan(values)
+        edges = np.flatnonzero(np.diff(np.r_[False, valid, False].astype(np.int8)))
+        return [slice(int(start), int(stop)) for start, stop in zip(edges[::2], edges[1::2])]
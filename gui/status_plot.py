@@ -2,96 +2,103 @@
 状态面板
 提供 在线人数图表 的GUI定义文件
 """
-from bisect import bisect_right
+from collections import OrderedDict
 from time import localtime, strftime, perf_counter
 
+import numpy as np
 import wx
-from matplotlib import pyplot as plt
-from matplotlib import rcParams as mpl_rcParams
-from matplotlib.backends import backend_wxagg as wxagg
-from matplotlib.dates import DateFormatter
-from matplotlib.figure import Figure
-from matplotlib.ticker import Formatter
-from matplotlib.transforms import Bbox
 
 from gui.events import *
+from gui.plot_base import PlotBase
 from gui.widget import *
 from lib.common_data import common_data
 from lib.data import *
 from lib.perf import Counter
 
-mpl_rcParams["font.family"] = "Microsoft YaHei"
-plt.rcParams["axes.unicode_minus"] = False
 ID_SELECT_ALL = wx.NewIdRef(count=1)
+ROW_CACHE_SIZE = 512  # 数据点列表缓存的格式化行数量
 
-clamp = lambda x, a, b: max(min(x, b), a)
 
+def create_plot(parent: wx.Window) -> PlotBase | wx.Window:
+    """按配置创建图表, 选择原生绘制时不会导入matplotlib"""
+    if config.plot_backend == PlotBackend.WX_NATIVE:
+        from gui.plot_wx import WxPlot
+        return WxPlot(parent)
+    from gui.plot_mpl import MplPlot
+    return MplPlot(parent)
 
-class UniqueIntFormatter(Formatter):
-    def __init__(self):
-        super().__init__()
-
-    def format_ticks(self, values):
-        # 只保留整数且唯一的值
-        unique_ints = set(int(v) for v in values if v.is_integer())
-        return [str(v)[:-2] if v in unique_ints else '' for v in values]
 
+class RowIndex:
+    """
+    数据点列表的 行 -> 数据点在时间索引中的位置 的紧凑数组
+    tip: 行按时间顺序排列, 数组是递增的, 所以 位置 -> 行 可以二分查找
+    """
 
-class BiDict:
     def __init__(self):
-        self._forward = dict()  # int -> str
-        self._reverse = dict()  # str -> int
-
-    def __getitem__(self, key):
-        if isinstance(key, int):
-            return self._forward[key]
-        elif isinstance(key, str):
-            return self._reverse[key]
-        else:
-            raise TypeError("Keys must be int or str")
-
-    def __setitem__(self, key, value):
-        if not isinstance(key, int):
-            raise TypeError("Keys must be integers")
-        if not isinstance(value, str):
-            raise TypeError("Values must be strings")
-        # 移除旧的映射（如果存在）
-        if key in self._forward:
-            old_value = self._forward[key]
-            del self._reverse[old_value]
-        # 检查新值是否重复
-        if value in self._reverse:
-            raise ValueError(f"Duplicate value '{value}' found")
-        # 更新双向映射
-        self._forward[key] = value
-        self._reverse[value] = key
-
-    def __delitem__(self, key):
-        if isinstance(key, int):
-            value = self._forward.pop(key)
-            del self._reverse[value]
-        elif isinstance(key, str):
-            original_key = self._reverse.pop(key)
-            del self._forward[original_key]
-        else:
-            raise TypeError("Key must be int or str")
-
-    def __len__(self):
-        return len(self._forward)
-
-    def __iter__(self):
-        return iter(self._forward)
+        self._rows = np.empty(0, dtype=np.int64)
+        self.length = 0
 
-    def values(self):
-        return self._forward.values()
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows[:self.length]
 
-    def clear(self):
-        self._forward.clear()
-        self._reverse.clear()
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, row: int) -> int:
+        return int(self._rows[row])
+
+    def set_range(self, start: int, stop: int):
+        """显示 [start, stop) 位置的数据点"""
+        self._rows = np.arange(start, stop, dtype=np.int64)
+        self.length = len(self._rows)
+
+    def set_runs(self, starts: np.ndarray, stops: np.ndarray):
+        """显示若干个 [start, stop) 区间 (升序, 不相交) 内的数据点"""
+        lengths = stops - starts
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        self._rows = np.arange(lengths.sum(), dtype=np.int64) + offsets
+        self.length = len(self._rows)
+
+    def row_of(self, position: int) -> int:
+        """获取位置对应的行, 不在列表中时返回 -1"""
+        row = int(np.searchsorted(self.rows, position))
+        if row < self.length and self._rows[row] == position:
+            return row
+        return -1
+
+    def shift(self, position: int) -> int:
+        """
+        时间索引中插入了一个数据点, 把不早于它的位置都后移一位
+        :return: 该位置在列表中应在的行
+        """
+        row = int(np.searchsorted(self.rows, position))
+        self._rows[row:self.length] += 1
+        return row
 
-    def update(self, other):
-        for key, value in iter(other):
-            self[key] = value
+    def insert(self, position: int) -> int:
+        """
+        时间索引中插入了一个数据点, 把它加入列表
+        :return: 数据点所在的行
+        """
+        row = self.shift(position)
+        if row < self.length:  # 插入到中间
+            self._rows = np.insert(self.rows, row, position)
+            self.length += 1
+            return row
+        if self.length == len(self._rows):  # 扩容
+            self._rows = np.resize(self._rows, max(64, self.length * 2))
+        self._rows[self.length] = position
+        self.length += 1
+        return row
+
+    def remove_positions(self, positions: list[int]):
+        """时间索引中批量删除了数据点 (位置升序), 同步删除对应的行并前移其余的位置"""
+        positions = np.asarray(positions, dtype=np.int64)
+        rows = self.rows[~np.isin(self.rows, positions, assume_unique=True)]
+        rows -= np.searchsorted(positions, rows)
+        self._rows = rows
+        self.length = len(rows)
 
 
 class StatusPanel(wx.SplitterWindow):
@@ -100,7 +107,7 @@ class StatusPanel(wx.SplitterWindow):
         sizer_l = wx.BoxSizer(wx.VERTICAL)
         self.left_panel = wx.Panel(self)
         self.data_jumper = DataJumper(self.left_panel)
-        self.plot = Plot(self.left_panel)
+        self.plot = create_plot(self.left_panel)
         self.progress = ProgressShower(self.left_panel)
 
         border_width = 5
@@ -129,6 +136,7 @@ class StatusPanel(wx.SplitterWindow):
 
     def on_filter_change(self, event: FilterChangeEvent):
         self.plot.update_filter(event.filter)
+        self.cap_list.update_filter(event.filter)
 
     def on_jump_to_point(self, event: JumpToPointEvent):
         self.cap_list.jump_to_point(event.point)
@@ -138,10 +146,29 @@ class CapList(wx.Panel):
     def __init__(self, parent: wx.Window):
         super().__init__(parent)
         self.data_manager = common_data.data_manager
-        self.point_id_mapping = BiDict()
+        self.row_index = RowIndex()
+        self.activate_filter = DataFilter()
+        self.row_cache: OrderedDict[str, tuple[str, str, str, str]] = OrderedDict()  # 数据点ID -> 格式化后的行
+        self.player_index = common_data.player_index
+        self.search_names: list[str] = []  # 查找到的玩家
+        self.match_starts = self.match_stops = np.empty(0, dtype=np.int64)  # 匹配的行区间 [start, stop)
+        self.match_attr = wx.ItemAttr()
+        self.match_attr.SetBackgroundColour(wx.Colour(255, 242, 160))
         sizer = wx.BoxSizer(wx.VERTICAL)
         title = CenteredText(self, label="数据点列表")
         title.SetFont(ft(14))
+        search_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.search_ctrl = wx.SearchCtrl(self, style=wx.TE_PROCESS_ENTER)
+        self.search_ctrl.SetDescriptiveText("查找玩家")
+        self.search_ctrl.ShowCancelButton(True)
+        self.prev_btn = wx.Button(self, label="上一个", size=(60, -1))
+        self.next_btn = wx.Button(self, label="下一个", size=(60, -1))
+        self.only_matched_check = wx.CheckBox(self, label="只显示匹配")
+        self.search_info = CenteredText(self, label="", x_center=False)
+        search_sizer.Add(self.search_ctrl, flag=wx.EXPAND, proportion=1)
+        search_sizer.Add(self.prev_btn, proportion=0)
+        search_sizer.Add(self.next_btn, proportion=0)
+        search_sizer.Add(self.only_matched_check, flag=wx.EXPAND | wx.LEFT, proportion=0, border=4)
         self.cap_list = wx.ListCtrl(self, style=wx.LC_REPORT | wx.LC_VIRTUAL)
         self.cap_list.SetFont(ft(10))
         cols = [("序号", 55), ("时间", 115), ("延迟", 75), ("在线", 40), ("玩家", 150)]
@@ -151,8 +178,11 @@ class CapList(wx.Panel):
                 continue
             self.cap_list.InsertColumn(i + 1, name, width=width, format=wx.LIST_FORMAT_CENTRE)
         sizer.Add(title, flag=wx.EXPAND, proportion=0)
+        sizer.Add(search_sizer, flag=wx.EXPAND | wx.TOP | wx.BOTTOM, proportion=0, border=2)
+        sizer.Add(self.search_info, flag=wx.EXPAND, proportion=0)
         sizer.Add(self.cap_list, flag=wx.EXPAND, proportion=1)
         self.SetSizer(sizer)
+        self.search_info.Hide()
 
         self.Bind(wx.EVT_MENU, self.on_select_all, id=ID_SELECT_ALL)
 
@@ -162,7 +192,14 @@ class CapList(wx.Panel):
         self.line_height = self.get_line_height()
         self.cap_list.SetItemCount(10000)
         self.cap_list.OnGetItemText = self.OnGetItemText
+        self.cap_list.OnGetItemAttr = self.OnGetItemAttr
         self.cap_list.Bind(wx.EVT_LIST_ITEM_RIGHT_CLICK, self.on_item_menu)
+        self.search_ctrl.Bind(wx.EVT_TEXT_ENTER, self.on_search)
+        self.search_ctrl.Bind(wx.EVT_SEARCH, self.on_search)
+        self.search_ctrl.Bind(wx.EVT_SEARCH_CANCEL, self.on_search_cancel)
+        self.prev_btn.Bind(wx.EVT_BUTTON, lambda _: self.jump_to_match(False))
+        self.next_btn.Bind(wx.EVT_BUTTON, lambda _: self.jump_to_match(True))
+        self.only_matched_check.Bind(wx.EVT_CHECKBOX, lambda _: self.reload_rows())
 
     def get_line_height(self) -> int:
         lc = wx.ListCtrl(self, wx.LC_REPORT)
@@ -172,21 +209,55 @@ class CapList(wx.Panel):
         lc.Destroy()
         return height
 
+    def get_row_point(self, item: int) -> ServerPoint:
+        return self.data_manager.time_index.points[self.row_index[item]]
+
+    def get_selected_rows(self) -> list[int]:
+        rows = []
+        item = self.cap_list.GetFirstSelected()
+        while item != -1:
+            rows.append(item)
+            item = self.cap_list.GetNextSelected(item)
+        return rows
+
     def OnGetItemText(self, item: int, col: int):
-        pt = self.data_manager.get_point(self.point_id_mapping[item])
         if col == 0:
             return str(item + 1)
-        elif col == 1:
-            return strftime("%y-%m-%d %H:%M", localtime(pt.time))
-        elif col == 2:
-            return f"{pt.ping:.2f}ms"
-        elif col == 3:
-            return str(pt.online)
-        elif col == 4:
-            return ", ".join([p.name for p in pt.players])
+        elif 1 <= col <= 4:
+            return self.get_row_texts(item)[col - 1]
         else:
             return ""
 
+    def OnGetItemAttr(self, item: int):
+        return self.match_attr if self.is_matched_row(item) else None
+
+    def get_row_texts(self, item: int) -> tuple[str, str, str, str]:
+        """获取一行格式化后的 时间, 延迟, 在线, 玩家, 只有可见的行会被格式化并缓存"""
+        pt = self.get_row_point(item)
+        texts = self.row_cache.get(pt.id_)
+        if texts is not None:
+            self.row_cache.move_to_end(pt.id_)
+            return texts
+        texts = (
+            strftime("%y-%m-%d %H:%M", localtime(pt.time)),
+            f"{pt.ping:.2f}ms",
+            str(pt.online),
+            ", ".join([p.name for p in pt.players]),
+        )
+        self.row_cache[pt.id_] = texts
+        if len(self.row_cache) > ROW_CACHE_SIZE:
+            self.row_cache.popitem(last=False)
+        return texts
+
+    def update_filter(self, filter_: DataFilter):
+        """只显示过滤器时间范围内的数据点"""
+        self.activate_filter = filter_
+        self.reload_rows()
+        if filter_.from_time is None:
+            self.cap_list.ScrollList(0, (self.cap_list.GetItemCount() - 1) * self.line_height)
+        else:
+            self.cap_list.ScrollList(0, -self.cap_list.GetScrollPos(wx.VERTICAL) * self.line_height)
+
     def on_item_menu(self, event: wx.ListEvent):
         item = event.GetIndex()
         if item >= 0:
@@ -222,51 +293,138 @@ class CapList(wx.Panel):
             line: wx.MenuItem = menu.Append(-1, "设为预览")
             menu.Bind(wx.EVT_MENU, lambda e: self.set_as_overview(item), id=line.GetId())
             line: wx.MenuItem = menu.Append(-1, "删除")
-            menu.Bind(wx.EVT_MENU, lambda e: self.delete_item(item), id=line.GetId())
+            menu.Bind(wx.EVT_MENU, lambda e: self.delete_items([item]), id=line.GetId())
+            selected_rows = self.get_selected_rows()
+            if len(selected_rows) > 1:
+                line: wx.MenuItem = menu.Append(-1, f"删除选中 ({len(selected_rows)})")
+                menu.Bind(wx.EVT_MENU, lambda e: self.delete_selected(selected_rows), id=line.GetId())
             self.PopupMenu(menu, event.GetPoint())
         else:
             event.Skip()
 
-    def delete_item(self, item: int):
-        point: ServerPoint = self.data_manager.get_point(self.point_id_mapping[item])
-        self.data_manager.remove_point(point)
-        del self.point_id_mapping[item]
-        values = list(self.point_id_mapping.values())
-        self.point_id_mapping.clear()
-        self.point_id_mapping.update(enumerate(values))
-        self.cap_list.SetItemCount(self.cap_list.GetItemCount() - 1)
+    def reload_rows(self):
+        """按 过滤器 和 查找结果 重新生成列表的行"""
+        start, stop = self.activate_filter.slice(self.data_manager.time_index)
+        if self.only_matched_check.GetValue() and self.search_names:
+            starts, stops = self.player_index.get_runs(self.search_names)
+            starts, stops = np.clip(starts, start, stop), np.clip(stops, start, stop)
+            in_range = stops > starts
+            self.row_index.set_runs(starts[in_range], stops[in_range])
+        else:
+            self.row_index.set_range(start, stop)
+        self.update_match_rows()
+        self.cap_list.SetItemState(-1, 0, wx.LIST_STATE_SELECTED)
+        self.cap_list.SetItemCount(len(self.row_index))
         self.cap_list.Refresh()
 
+    def update_match_rows(self):
+        """把查找到的玩家的数据点位置区间 转换为 列表中的行区间"""
+        if not self.search_names:
+            self.match_starts = self.match_stops = np.empty(0, dtype=np.int64)
+            return
+        starts, stops = self.player_index.get_runs(self.search_names)
+        row_starts = np.searchsorted(self.row_index.rows, starts)
+        row_stops = np.searchsorted(self.row_index.rows, stops)
+        not_empty = row_stops > row_starts
+        self.match_starts, self.match_stops = row_starts[not_empty], row_stops[not_empty]
+
+    def is_matched_row(self, row: int) -> bool:
+        index = int(np.searchsorted(self.match_starts, row, side="right")) - 1
+        return index >= 0 and row < self.match_stops[index]
+
+    def on_search(self, _):
+        timer = Counter()
+        timer.start()
+        query = self.search_ctrl.GetValue()
+        self.search_names = self.player_index.find_players(query)
+        self.reload_rows()
+        if not query.strip():
+            self.search_info.Hide()
+        elif not self.search_names:
+            self.search_info.SetLabel(f"没有找到玩家 {query.strip()}")
+            self.search_info.Show()
+        else:
+            names = ", ".join(self.search_names[:3]) + (" 等" if len(self.search_names) > 3 else "")
+            match_count = int((self.match_stops - self.match_starts).sum())
+            self.search_info.SetLabel(f"{names}: {match_count} 个数据点, {len(self.match_starts)} 段")
+            self.search_info.Show()
+            self.jump_to_match(True)
+        self.Layout()
+        logger.debug(f"查找玩家用时: {timer.endT()}")
+
+    def on_search_cancel(self, _):
+        self.search_ctrl.SetValue("")
+        self.on_search(None)
+
+    def jump_to_match(self, forward: bool):
+        """跳转到 下一段/上一段 匹配的行"""
+        if len(self.match_starts) == 0:
+            return
+        current = self.cap_list.GetFirstSelected()
+        if forward:
+            index = int(np.searchsorted(self.match_starts, current, side="right"))
+            index = index if index < len(self.match_starts) else 0
+        else:
+            index = int(np.searchsorted(self.match_starts, current, side="left")) - 1
+            index = index if index >= 0 else len(self.match_starts) - 1
+        self.show_row(int(self.match_starts[index]))
+
+    def delete_items(self, rows: list[int]):
+        """批量删除行对应的数据点"""
+        points = [self.get_row_point(row) for row in rows]
+        positions = self.data_manager.remove_points(points)
+        self.row_index.remove_positions(positions)
+        self.update_match_rows()
+        self.cap_list.SetItemState(-1, 0, wx.LIST_STATE_SELECTED)
+        self.cap_list.SetItemCount(len(self.row_index))
+        self.cap_list.Refresh()
+
+    def delete_selected(self, rows: list[int]):
+        ret = wx.MessageBox(f"确定要删除选中的 {len(rows)} 个数据点吗?", "警告", wx.YES_NO | wx.ICON_WARNING, self)
+        if ret == wx.YES:
+            self.delete_items(rows)
+
     def set_as_overview(self, item: int):
-        point: ServerPoint = self.data_manager.get_point(self.point_id_mapping[item])
+        point = self.get_row_point(item)
         event = SetAsOverviewEvent(point)
         event.SetEventObject(self)
         self.ProcessEvent(event)
 
     def load_point(self, point: ServerPoint, runtime_add: bool = False):
-        line = self.cap_list.GetItemCount()
-        self.point_id_mapping[line] = point.id_
-        self.cap_list.SetItemCount(line + 1)
+        position = self.data_manager.time_index.index_of(point)
+        matched = not self.search_names or any(p.name in self.search_names for p in point.players)
+        if not self.activate_filter.check(point) or (self.only_matched_check.GetValue() and not matched):
+            self.row_index.shift(position)
+            return
+        line = self.row_index.insert(position)
+        if self.search_names:
+            self.update_match_rows()
+        self.cap_list.SetItemCount(len(self.row_index))
         if runtime_add:
             self.cap_list.ScrollList(0, (line - 1) * self.line_height)
 
     def points_init(self, points: list[ServerPoint]):
         timer = Counter()
         timer.start()
-        self.cap_list.SetItemCount(len(points))
-        for i, point in enumerate(points):
-            self.point_id_mapping[i] = point.id_
+        self.reload_rows()
         logger.debug(f"数据点列表初始化用时: {timer.endT()}")
         self.cap_list.ScrollList(0, (self.cap_list.GetItemCount() - 1) * self.line_height)
 
     def on_select_all(self, _):
-        for i in range(self.cap_list.GetItemCount()):
-            self.cap_list.Select(i)
+        self.cap_list.SetItemState(-1, wx.LIST_STATE_SELECTED, wx.LIST_STATE_SELECTED)
 
     def jump_to_point(self, point: ServerPoint):
+        line = self.row_index.row_of(self.data_manager.time_index.index_of(point))
+        if line == -1:
+            return
+        self.show_row(line)
+
+    def show_row(self, line: int):
+        """选中一行, 并把它滚动到列表中间"""
         show_lines = self.cap_list.GetSize()[1] // self.line_height
-        line = self.point_id_mapping[point.id_]
+        self.cap_list.SetItemState(-1, 0, wx.LIST_STATE_SELECTED)
         self.cap_list.Select(line)
+        self.cap_list.Focus(line)
         self.cap_list.ScrollList(0,
                                  (line - show_lines // 2 - self.cap_list.GetScrollPos(wx.VERTICAL)) * self.line_height)
 
@@ -337,240 +495,6 @@ class DataJumper(wx.Panel):
         self.ProcessEvent(event)
 
 
-class Plot(wxagg.FigureCanvasWxAgg):
-    """图表用于展示在线人数数据"""
-
-    def __init__(self, parent: wx.Window):
-        super().__init__(parent, wx.ID_ANY, Figure(tight_layout=True))
-        self.activate_filter = DataFilter()
-
-        # 创建图表
-        self.set_control_color()
-        config.hook_configs(self.set_control_color, "plot_fg_color", "plot_bg_color", "plot_grid_color")
-        config.hook_configs(self.line_config_cbk, "plot_line_color", "plot_line_width","plot_line_alpha")
-
-        # 初始化数据
-        self.raw_datas: dict[float, ServerPoint] = {}  # 全部数据点
-        self.datas: dict[float, ServerPoint] = {}  # 展示的数据点 (不包含缩放)
-        self.axes = self.figure.gca()
-        self.offset: float = 0.0  # 当前显示的起始索引
-        self.scale: float = 1.0  # 缩放大小
-        self.drag_start_x: int = 0  # 拖动起始位置
-        self.drag_start_offset: float = 0.0  # 拖动开始时候的偏移量
-        self.last_point_time = 0  # 上一个数据点的时间
-        self.active_mouse_point: ServerPoint | None = None  # 目前ToolTip展示的数据点
-
-        self.draw_call = wx.CallLater(50, self.draw_plot)
-        self.draw_plot()
-        self.Bind(wx.EVT_MOUSE_EVENTS, self.control_plot)
-        self.tooltip = ToolTip(self, "")  # 创建工具提示
-
-        self.tooltip.label.SetForegroundColour(wx.Colour(int(config.plot_fg_color[1:], base=16)))
-        self.tooltip.SetBackgroundColour(wx.Colour(int(config.plot_bg_color[1:], base=16)))
-
-    def set_control_color(self, *_):
-        axes = self.figure.gca()
-        # axes.set_title("在线人数", color=config.plot_fg_color)
-        axes.set_xlabel("时间", color=config.plot_fg_color)
-        axes.set_ylabel("在线人数", color=config.plot_fg_color)
-        axes.tick_params(axis='x', colors=config.plot_fg_color)
-        axes.tick_params(axis='y', colors=config.plot_fg_color)
-        axes.set_facecolor(config.plot_bg_color)
-        axes.grid(True, color=config.plot_grid_color)
-        self.figure.set_facecolor(config.plot_bg_color)
-        self.figure.set_edgecolor(config.plot_fg_color)
-        self.figure.canvas.draw()
-
-    def line_config_cbk(self, *_):
-        self.draw_plot()
-
-    @property
-    def crt_range(self):
-        """目前展示图表区域占整个图表的比例"""
-        return 1 / self.scale
-
-    def on_mouse_move(self, x: int, y: int):
-        """ToolTip的显示更新"""
-        if not self.datas:
-            return
-        # 检测鼠标指针是否是否在图表控件内
-        if not self.GetClientRect().Contains(x, y):
-            self.tooltip.set_tip("")
-            return
-
-        # 计算鼠标位置在图表中的百分比
-        box: Bbox = self.axes.get_window_extent()
-        percent = (x - round(box.x0)) / (round(box.x1) - round(box.x0))  # 鼠标x坐标在图表中的百分比
-        if percent < 0 or percent > 1:  # 超出范围不予受理
-            self.tooltip.set_tip("")
-            return
-
-        # 获取距离该百分比最近的数据点
-        real_percent = self.offset + percent * self.crt_range
-        times = sorted(self.datas.keys())
-        min_time = min(times)
-        exact_time = min_time + (max(times) - min_time) * real_percent
-        index = bisect_right(times, exact_time)
-        closest_time = times[index - 1]
-        point = self.active_mouse_point = self.datas[closest_time]
-
-        # 格式化数据点显示ToolTip
-        time_str = datetime.fromtimestamp(closest_time).strftime('%Y-%m-%d %H:%M:%S')
-        players = ""
-        for i, player in enumerate(point.players):
-            if i == len(point.players) - 1:
-                players += f"{player.name}"
-            elif i % 3 == 2:
-                players += f"{player.name}\n"
-            else:
-                players += f"{player.name}, "
-        tooltip_text = f"时间: {time_str}\n人数: {point.online}"
-        if point.players:
-            tooltip_text += f"\n玩家: \n{players}"
-        self.tooltip.set_tip(tooltip_text)
-
-    def update_filter(self, filter_: DataFilter):
-        """更新数据点过滤器"""
-        self.activate_filter = filter_
-        self.datas = {p.time: p for p in filter_.filter_points(self.raw_datas)}  # 根据筛选条件更新数据
-        if filter_.from_time is not None:
-            self.scale = 1.0
-            self.offset = 0
-        if self.draw_call.IsRunning():
-            self.draw_call.Restart()
-        else:
-            self.draw_call.Start()
-
-    def control_plot(self, event: wx.MouseEvent):
-        """
-        滚轮缩放和拖动
-        """
-        event.Skip()
-        if event.LeftDown():  # 开始拖动图表
-            self.drag_start_x = event.GetX()
-            self.drag_start_offset = self.offset
-            self.tooltip.set_tip("")
-            return
-        elif event.Dragging():  # 拖动图表中...
-            if self.drag_start_x == 0:
-                return
-            box: Bbox = self.axes.get_window_extent()
-            plot_width = round(box.x1 - box.x0)
-            drag_distance_percent = (self.drag_start_x - event.GetX()) / plot_width
-            real_percent = drag_distance_percent / self.scale
-            self.offset = self.drag_start_offset + real_percent
-        elif event.LeftUp():  # 拖放结束
-            self.drag_start_x = self.drag_start_offset = 0
-            self.on_mouse_move(event.GetX(), event.GetY())
-        elif event.RightDown():
-            if self.active_mouse_point:
-                event = JumpToPointEvent(self.active_mouse_point)
-                event.SetEventObject(self)
-                self.ProcessEvent(event)
-        elif event.GetWheelRotation():
-            last_scale = self.scale
-            if event.GetWheelRotation() > 0:
-                self.scale /= 0.9  # 放大
-                if not self.scale >= config.plot_max_scale:
-                    self.offset += (1 / last_scale - 1 / self.scale) / 2
-            else:
-                self.scale *= 0.9  # 缩小
-                self.offset -= (1 / self.scale - 1 / last_scale) / 2
-        elif event.Moving():
-            self.on_mouse_move(event.GetX(), event.GetY())
-            return
-        else:
-            return
-        self.offset = round(clamp(self.offset, 0, 1 - self.crt_range), 5)
-        self.scale = round(clamp(self.scale, 1, config.plot_max_scale), 5)
-        logger.debug(f"起始偏移: {self.offset}, 缩放: {self.scale}")
-        self.update_scale()
-
-    def load_point(self, point: ServerPoint, runtime_add: bool = False):
-        """
-        添加数据点 (GUI层面)
-        :param point: 数据点
-        :param runtime_add: 是否为运行时添加, 以便自动滚动图表
-        """
-        self.add_data(point)
-        # 自动滚动
-        if runtime_add and round(self.offset + self.crt_range, 3) == 1:
-            self.offset = 1 - self.crt_range
-        # 启动刷新计时器
-        if self.draw_call.IsRunning():
-            self.draw_call.Restart()
-        elif runtime_add:
-            self.draw_call.Start()
-
-    def add_data(self, point: ServerPoint, fix_add: bool = False):
-        """
-        添加数据点
-        :param point: 数据点
-        :param fix_add: 是否为间隔修复添加
-        """
-        if point.time >= self.last_point_time + config.fix_sep:
-            self.add_data(point.copy(self.last_point_time + ((point.time - self.last_point_time) / 2)), fix_add=True)
-        self.raw_datas[point.time] = point
-        if self.activate_filter.check(point):
-            self.datas[point.time] = point
-        if not fix_add:
-            self.last_point_time = point.time
-
-    def points_init(self, points: list[ServerPoint]):
-        """
-        用存储的数据点初始化图表
-        :param points: 数据点列表
-        """
-        self.raw_datas = {p.time: p for p in points}
-        self.datas = {p.time: p for p in points}
-        self.last_point_time = points[-1].time if points else time()
-        self.scale = 1 / 0.15
-        self.offset = 1 - self.crt_range
-        self.draw_plot()
-
-    def update_scale(self):
-        """更新图表缩放范围"""
-        if not self.datas:
-            return
-        min_time = min(self.datas.keys())
-        max_time = max(self.datas.keys())
-        size = max_time - min_time
-        in_pt = min_time + size * self.offset
-        out_pt = in_pt + size / self.scale
-
-        # 设置 X 轴范围
-        self.axes.set_xlim(datetime.fromtimestamp(in_pt), datetime.fromtimestamp(out_pt))
-
-        # 计算当前可视区域内数据的 Y 轴范围
-        visible_times = [t for t in self.datas.keys() if in_pt <= t <= out_pt]
-        if visible_times:
-            visible_values = [self.datas[t].online for t in visible_times]
-            y_min, y_max = min(visible_values), max(visible_values)
-            margin = (y_max - y_min) * 0.1  # 添加 10% 边距
-            self.axes.set_ylim(y_min - margin, y_max + margin)
-
-        # 重新绘制图表
-        self.axes.relim(visible_only=True)
-        self.figure.canvas.draw()
-
-    def draw_plot(self):
-        """绘制图表"""
-        if not self.datas:
-            return
-        self.axes.cla()
-        self.axes.grid(True, color=config.plot_grid_color)
-        if len(self.datas) == 0:  # 没有数据就退出
-            return
-        self.axes.plot(
-            [datetime.fromtimestamp(t) for t in self.datas.keys()],
-            [p.online for p in self.datas.values()],
-            color=config.plot_line_color, linewidth=config.plot_line_width, alpha=config.plot_line_alpha
-        )
-        self.axes.xaxis.set_major_formatter(DateFormatter('%d %H:%M'))
-        self.axes.yaxis.set_major_formatter(UniqueIntFormatter())
-        self.update_scale()
-
-
 class ProgressShower(wx.Panel):
     def __init__(self, parent: wx.Window):
         super().__init__(parent)
@@ -632,9 +556,6 @@ class ProgressShower(wx.Panel):
         if self.status.status == ProgressStatus.WAIT:
             progress_percent = (perf_counter() - self.start_wait) / config.check_inv
             self.info_text.format(f"{config.check_inv - (perf_counter() - self.start_wait):.1f}秒")
-        elif self.status.status == ProgressStatus.FP_WAIT:
-            progress_percent = (perf_counter() - self.start_wait) / config.fp_re_status_inv
-            self.info_text.format(f"{config.fp_re_status_inv - (perf_counter() - self.start_wait):.1f}秒")
         else:
             self.timer.Stop()
             return
@@ -645,18 +566,15 @@ class ProgressShower(wx.Panel):
 
     def set_status(self, status: StatusStatus):
         self.status = status
-        if status.status in [ProgressStatus.WAIT, ProgressStatus.FP_WAIT]:
+        if status.status == ProgressStatus.WAIT:
             self.start_wait = perf_counter()
             self.timer.Start(490)
-            if status.status == ProgressStatus.FP_WAIT:
-                self.info_text.fmt = f"等待第{status.times}次获取玩家列表, 等待: {'{}'}, 剩余玩家: {status.players_left}"
-            else:
-                self.info_text.fmt = "下一次获取: {}后"
+            self.info_text.fmt = "下一次获取: {}后"
         elif status.status in [ProgressStatus.STATUS, ProgressStatus.FP_STATUS]:
             self.timer.Stop()
             self.progress_bar.Pulse()
             if status.status == ProgressStatus.FP_STATUS:
-                self.info_text.SetLabel(f"第{status.times}次获取玩家列表...")
+                self.info_text.SetLabel(f"第{status.times}批获取玩家列表, 剩余玩家: {status.players_left}")
         elif status.status == ProgressStatus.PAUSE:
             self.timer.Stop()
             self.progress_bar.Pulse()
@@ -3,21 +3,29 @@ widget.py
 在此项目中用到的:
 实用小部件&实用函数
 """
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime, time as dt_time, date as dt_date, timedelta
 from enum import Enum
+from functools import lru_cache
+from threading import Lock
 from typing import Callable, Any
 
+import numpy as np
 import wx
 from PIL import Image
-from PIL import ImageDraw
 from colour import Color
 from wx.adv import DatePickerCtrl
 
+from lib.skin import ContentStatus
+
 font_cache: dict[int, wx.Font] = {}
 maxsize = 1919810
 GA_LOOP_TIME = 5
 GA_WAIT_TIME = 2
+GRADIENT_CACHE_SIZE = 512  # 缓存的渐变色位图数量
+GRADIENT_CACHE_MAX_PIXELS = 256 * 256  # 只缓存不超过该面积的渐变色位图 (卡片等小控件), 窗口背景每次都重新生成
+HEAD_BITMAP_CACHE_SIZE = 1024  # 缓存的头像位图数量
 
 
 class GradientDirection(Enum):
@@ -29,7 +37,6 @@ class ProgressStatus(Enum):
     WAIT = 0
     STATUS = 1
     FP_STATUS = 2
-    FP_WAIT = 3
     PAUSE = 4
 
 
@@ -84,13 +91,60 @@ def string_fmt_time(seconds: float) -> str:
     return time_str
 
 
+def pil_rgba(image: Image.Image) -> Image.Image:
+    """只转换一次到RGBA, 已经是RGBA时直接使用"""
+    return image if image.mode == "RGBA" else image.convert("RGBA")
+
+
 def PilImg2WxImg(image: Image.Image):
-    """PIL的Image转化为wxImage"""
-    bitmap: wx.Image = wx.Image(image.size[0], image.size[1])
-    bitmap.SetData(image.convert("RGB").tobytes())
-    bitmap.alpha_buffer = image.convert("RGBA").tobytes()[3::4]
-    bitmap.SetAlphaBuffer(bitmap.alpha_buffer)
-    return bitmap
+    """PIL的Image转化为wxImage, RGB与透明度都从同一份RGBA数据中取出"""
+    pixels = np.frombuffer(pil_rgba(image).tobytes(), dtype=np.uint8).reshape(-1, 4)
+    return wx.Image(image.size[0], image.size[1], np.ascontiguousarray(pixels[:, :3]).tobytes(),
+                    np.ascontiguousarray(pixels[:, 3]).tobytes())
+
+
+def PilImg2WxBitmap(image: Image.Image) -> wx.Bitmap:
+    """PIL的Image直接转化为wxBitmap, 不经过wxImage"""
+    return wx.Bitmap.FromBufferRGBA(image.size[0], image.size[1], pil_rgba(image).tobytes())
+
+
+class HeadBitmapCache:
+    """
+    按 (玩家, 尺寸, 状态) 缓存转换后的头像位图
+    tip: 皮肤管理器会缓存渲染后的头像对象, 只有头像对象不变时才复用位图, 刷新头像后会重新转换
+         获取失败时返回的都是同一张错误头像, 每个尺寸只转换并缓存一次, 不按玩家区分
+    """
+
+    def __init__(self, max_size: int = HEAD_BITMAP_CACHE_SIZE):
+        self.max_size = max_size
+        self.lock = Lock()
+        self.cache: OrderedDict[tuple, tuple[Image.Image, wx.Bitmap]] = OrderedDict()
+
+    def get_bitmap(self, name: str, size: int, status: Any, head: Image.Image) -> wx.Bitmap:
+        """获取头像对应的位图"""
+        failed = status == ContentStatus.FAILED
+        key = (None if failed else name, size, status)
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None and (failed or cached[0] is head):
+                self.cache.move_to_end(key)
+                return cached[1]
+        bitmap = PilImg2WxBitmap(head)
+        with self.lock:
+            self.cache[key] = (head, bitmap)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        return bitmap
+
+    def drop(self, name: str):
+        """删除某玩家的所有位图"""
+        with self.lock:
+            for key in [key for key in self.cache if key[0] == name]:
+                del self.cache[key]
+
+
+head_bitmaps = HeadBitmapCache()
 
 
 class EasyColor:
@@ -186,30 +240,32 @@ class GradientBgBinder:
 
 def get_gradient_bitmap(color1: wx.Colour, color2: wx.Colour, size: tuple[int, int],
                         dir_: GradientDirection) -> wx.Bitmap | None:
+    """获取渐变色位图, 小尺寸且参数相同的位图会被共用"""
+    width, height = int(size[0]), int(size[1])
+    render = cached_gradient_bitmap if width * height <= GRADIENT_CACHE_MAX_PIXELS else gradient_bitmap
+    return render((color1.Red(), color1.Green(), color1.Blue()),
+                  (color2.Red(), color2.Green(), color2.Blue()), (width, height), dir_)
+
+
+def gradient_bitmap(rgb1: tuple[int, int, int], rgb2: tuple[int, int, int], size: tuple[int, int],
+                    dir_: GradientDirection) -> wx.Bitmap | None:
     width, height = size
-    if color1.GetRGB() == color2.GetRGB():
-        image = Image.new("RGB", (width, height), color1.GetRGB())
-    else:
-        image = Image.new("RGB", (width, height), (0, 0, 0))
-        draw = ImageDraw.Draw(image)
-        if dir_ == GradientDirection.HORIZONTAL:
-            for x in range(width):
-                r = int(color1[0] + (color2[0] - color1[0]) * x / width)
-                g = int(color1[1] + (color2[1] - color1[1]) * x / width)
-                b = int(color1[2] + (color2[2] - color1[2]) * x / width)
-                draw.line((x, 0, x, height), fill=(r, g, b))
-        elif dir_ == GradientDirection.VERTICAL:
-            for y in range(height):
-                r = int(color1[0] + (color2[0] - color1[0]) * y / height)
-                g = int(color1[1] + (color2[1] - color1[1]) * y / height)
-                b = int(color1[2] + (color2[2] - color1[2]) * y / height)
-                draw.line((0, y, width, y), fill=(r, g, b))
-        else:
-            raise ValueError("Invalid direction")
-    bitmap = wx.Image(image.width, image.height, image.tobytes())
-    if not bitmap.IsOk():
+    if width <= 0 or height <= 0:
+        return None
+    if dir_ not in (GradientDirection.HORIZONTAL, GradientDirection.VERTICAL):
+        raise ValueError("Invalid direction")
+    length = width if dir_ == GradientDirection.HORIZONTAL else height
+    start, end = np.array(rgb1, dtype=np.float64), np.array(rgb2, dtype=np.float64)
+    line = (start + (end - start) * (np.arange(length) / length)[:, None]).astype(np.uint8)  # (length, 3)
+    buffer = np.empty((height, width, 3), dtype=np.uint8)
+    buffer[:] = line[None, :, :] if dir_ == GradientDirection.HORIZONTAL else line[:, None, :]
+    image = wx.Image(width, height, buffer)
+    if not image.IsOk():
         return None
-    return bitmap.ConvertToBitmap()
+    return image.ConvertToBitmap()
+
+
+cached_gradient_bitmap = lru_cache(maxsize=GRADIENT_CACHE_SIZE)(gradient_bitmap)
 
 
 class EasyMenu(wx.Menu):
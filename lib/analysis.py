@@ -0,0 +1,264 @@
+"""
+玩家在线分析
+把玩家倒排索引中的数据点区间转换为在线时间段数组, 并用NumPy一次性计算所有玩家的统计信息
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from lib.config import config
+from lib.player_index import IndexSnapshot, PlayerIndex
+
+
+class PlayerOnlineInfo:
+    """一个玩家的在线信息"""
+
+    def __init__(self, name: str, last_offline_time: float):
+        self.name: str = name
+        self.last_offline_time: float = last_offline_time
+        self.join_server_time: float = last_offline_time
+        self.total_online_time: float = 0
+        self.today_online_time: float = 0
+        self.avg_online_per_day: float = 0
+        self.avg_online_per_session: float = 0
+        self.max_online_per_session: float = 0
+        self.online_times: list[tuple[float, float]] = []
+
+
+def local_day_edges(from_time: float, to_time: float, hour: int = 0) -> np.ndarray:
+    """
+    获取覆盖 [from_time, to_time] 的每一天的开始时间戳 (本地时间, 会处理夏令时)
+    :param hour: 一天从几点开始
+    :return: 升序的时间戳数组, 最后一个元素是最后一天的结束时间
+    """
+    start = datetime.fromtimestamp(from_time).replace(hour=hour, minute=0, second=0, microsecond=0)
+    if start.timestamp() > from_time:
+        start -= timedelta(days=1)
+    edges = [start.timestamp()]
+    while edges[-1] <= to_time:
+        start += timedelta(days=1)
+        edges.append(start.timestamp())
+    return np.asarray(edges, dtype=np.float64)
+
+
+class SessionTable:
+    """
+    所有玩家的在线时间段
+    以 (玩家序号, 开始时间, 结束时间) 三个数组保存, 按 玩家序号, 开始时间 排序
+    """
+
+    def __init__(self, names: list[str], players: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 last_time: float = 0, online: set[str] = None):
+        self.names = names
+        self.players = players
+        self.starts = starts
+        self.ends = ends
+        self.last_time = last_time  # 生成时最后一个数据点的时间
+        self.online = online if online is not None else set()  # 生成时最后一个数据点中在线的玩家
+
+    def __len__(self):
+        return len(self.players)
+
+    @property
+    def durations(self) -> np.ndarray:
+        return self.ends - self.starts
+
+    @classmethod
+    def from_index(cls, index: PlayerIndex) -> "SessionTable":
+        """从玩家倒排索引的最新快照生成在线时间段"""
+        return cls.from_snapshot(index.sync())
+
+    @classmethod
+    def from_snapshot(cls, snapshot: IndexSnapshot) -> "SessionTable":
+        """
+        从玩家倒排索引的快照生成在线时间段
+        玩家在 [start, stop) 位置的数据点中在线, 则在线时间为 times[start] 至 times[stop] (最后一个数据点时仍在线则到它为止)
+        """
+        times = snapshot.times
+        names, players, start_pos, stop_pos = flat_runs(snapshot)
+        if len(players) == 0:
+            empty = np.empty(0, dtype=np.float64)
+            return cls(names, players, empty, empty)
+        online = {names[i] for i in np.unique(players[stop_pos == len(times)])}
+        return cls(names, players, times[start_pos], times[np.minimum(stop_pos, len(times) - 1)],
+                   float(times[-1]), online)
+
+    def gap_firsts(self, min_gap: float, linked: np.ndarray | None = None) -> np.ndarray:
+        """
+        合并同一玩家间隔小于 min_gap 的相邻在线时间段时, 每组的第一个时间段的位置
+        :param linked: 每个时间段是否与前一个时间段相连 (不论间隔都要合并)
+        """
+        same_player = self.players[1:] == self.players[:-1]
+        join = (self.starts[1:] - self.ends[:-1]) < min_gap
+        if linked is not None:
+            join |= linked[1:]
+        return np.flatnonzero(np.r_[True, ~(same_player & join)])
+
+    def merge_at(self, firsts: np.ndarray) -> "SessionTable":
+        """把 firsts 分隔出的每组相邻时间段合并为一个"""
+        return SessionTable(self.names, self.players[firsts], self.starts[firsts],
+                            np.maximum.reduceat(self.ends, firsts), self.last_time, self.online)
+
+    def merge_gaps(self, min_gap: float) -> "SessionTable":
+        """合并同一玩家间隔小于 min_gap 的相邻在线时间段"""
+        if len(self) == 0:
+            return self
+        return self.merge_at(self.gap_firsts(min_gap))
+
+    def drop_shorter(self, min_length: float) -> "SessionTable":
+        """删除时长小于 min_length 的在线时间段"""
+        keep = self.durations >= min_length
+        return SessionTable(self.names, self.players[keep], self.starts[keep], self.ends[keep],
+                            self.last_time, self.online)
+
+    def clip_from(self, from_time: float) -> "SessionTable":
+        """只保留 from_time 之后的部分"""
+        keep = self.ends > from_time
+        return SessionTable(self.names, self.players[keep], np.maximum(self.starts[keep], from_time), self.ends[keep],
+                            self.last_time, self.online)
+
+    def clipped_durations(self, from_time: float, to_time: float) -> np.ndarray:
+        """每个在线时间段在 [from_time, to_time] 内的时长"""
+        return np.clip(np.minimum(self.ends, to_time) - np.maximum(self.starts, from_time), 0, None)
+
+    def player_sum(self, values: np.ndarray) -> np.ndarray:
+        """按玩家求和"""
+        return np.bincount(self.players, weights=values, minlength=len(self.names))
+
+    def player_slices(self) -> np.ndarray:
+        """每个玩家的时间段在数组中的起始位置, 长度为 玩家数+1"""
+        return np.searchsorted(self.players, np.arange(len(self.names) + 1))
+
+
+def flat_runs(snapshot: IndexSnapshot) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    把快照中每个玩家的数据点位置区间拼接为数组
+    :return: 玩家名称列表, 玩家序号, 区间开始, 区间结束 (按 玩家序号, 区间开始 排序)
+    """
+    names = list(snapshot.runs.keys())
+    if not names or len(snapshot.times) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return names, empty, empty, empty
+    runs = [snapshot.runs[name] for name in names]
+    counts = np.fromiter((len(starts) for starts, _ in runs), dtype=np.int64, count=len(names))
+    players = np.repeat(np.arange(len(names), dtype=np.int64), counts)
+    return names, players, np.concatenate([starts for starts, _ in runs]), np.concatenate([stops for _, stops in runs])
+
+
+def shard_sessions(players: np.ndarray, start_pos: np.ndarray, stop_pos: np.ndarray, times: np.ndarray,
+                   lo: int, hi: int, min_gap: float) -> tuple[np.ndarray, ...]:
+    """
+    计算一个分片 (数据点位置 [lo, hi)) 内的在线时间段并合并间隔, 在进程池中运行
+    :param players: 与分片相交的区间的玩家序号, 区间开始, 区间结束 (全局位置)
+    :param times: 数据点时间 times[lo:hi + 1], 用于取得分片最后一个区间的结束时间
+    :return: 玩家序号, 开始时间, 结束时间, 是否从分片开始前延续, 是否延续到分片结束后
+    """
+    starts = times[np.maximum(start_pos, lo) - lo]
+    ends = times[np.minimum(np.minimum(stop_pos, hi) - lo, len(times) - 1)]
+    table = SessionTable([], players, starts, ends)
+    if len(table) == 0:
+        return players, starts, ends, start_pos < lo, stop_pos > hi
+    firsts = table.gap_firsts(min_gap)
+    merged = table.merge_at(firsts)
+    # 延续到分片外的时间段只会是该玩家在分片中的第一个 / 最后一个
+    open_start = (start_pos < lo)[firsts]
+    open_end = np.maximum.reduceat(stop_pos > hi, firsts)
+    return merged.players, merged.starts, merged.ends, open_start, open_end
+
+
+def session_table(snapshot: IndexSnapshot, min_gap: float, workers: int = 1,
+                  shard_points: int = 0) -> SessionTable:
+    """
+    从快照生成 合并了间隔小于 min_gap 的时间段 的在线时间段
+    数据点数量超过 shard_points 且 workers > 1 时, 按时间分片使用多个进程计算, 再把跨越分片边界的时间段连接起来
+    tip: 合并后每个玩家的首次上线 / 最后下线时间和在线状态不变, 可以代替原始时间段传给 analyze_sessions
+    """
+    times = snapshot.times
+    if workers <= 1 or shard_points <= 0 or len(times) <= shard_points:
+        return SessionTable.from_snapshot(snapshot).merge_gaps(min_gap)
+    names, players, start_pos, stop_pos = flat_runs(snapshot)
+    edges = list(range(0, len(times), shard_points)) + [len(times)]
+    tasks = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        hit = (start_pos < hi) & (stop_pos > lo)
+        tasks.append((players[hit], start_pos[hit], stop_pos[hit], times[lo:hi + 1], lo, hi, min_gap))
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        results = list(executor.map(shard_sessions, *zip(*tasks)))
+    # 按玩家稳定排序后, 同一玩家的时间段仍按分片顺序排列
+    shard_players, starts, ends, open_start, open_end = (np.concatenate(arrays) for arrays in zip(*results))
+    order = np.argsort(shard_players, kind="stable")
+    shard_players, starts, ends = shard_players[order], starts[order], ends[order]
+    open_start, open_end = open_start[order], open_end[order]
+    online = {names[i] for i in np.unique(players[stop_pos == len(times)])}
+    table = SessionTable(names, shard_players, starts, ends, float(times[-1]), online)
+    if len(table) == 0:
+        return table
+    linked = np.r_[False, open_start[1:] & open_end[:-1]]  # 上一个分片结束时仍在线, 这个分片开始时还在线
+    return table.merge_at(table.gap_firsts(min_gap, linked))
+
+
+def analyze_players(index: PlayerIndex, min_online_time: float,
+                    window: tuple[float, float] | None = None) -> dict[str, PlayerOnlineInfo]:
+    """
+    计算所有玩家的在线信息
+    :param index: 玩家倒排索引
+    :param min_online_time: 间隔小于该值的在线时间段会被合并, 合并后短于该值的会被删除
+    :param window: 计算 "今天在线时长" 使用的时间范围, 为None时使用总在线时长
+    """
+    sessions = session_table(index.sync(), min_online_time, config.analysis_workers, config.analysis_shard_points)
+    return analyze_sessions(sessions, min_online_time, window)
+
+
+def analyze_sessions(raw: SessionTable, min_online_time: float,
+                     window: tuple[float, float] | None = None) -> dict[str, PlayerOnlineInfo]:
+    """从原始的在线时间段计算所有玩家的在线信息, 参数见 analyze_players"""
+    infos: dict[str, PlayerOnlineInfo] = {}
+    if len(raw) == 0:
+        return infos
+    raw_slices = raw.player_slices()
+    join_times = raw.starts[raw_slices[:-1]]  # 每个玩家都至少有一个时间段
+    last_offline_times = raw.ends[raw_slices[1:] - 1]
+
+    sessions = raw.merge_gaps(min_online_time).drop_shorter(min_online_time)
+    durations = sessions.durations
+    totals = sessions.player_sum(durations)
+    counts = np.bincount(sessions.players, minlength=len(sessions.names))
+    window_totals = totals if window is None else sessions.player_sum(sessions.clipped_durations(*window))
+
+    # 在线天数: 同一玩家按开始时间排序, 所以只需统计 所在日期 与上一个时间段不同 的次数
+    day_counts = np.zeros(len(sessions.names))
+    maxs = np.zeros(len(sessions.names))
+    if len(sessions):
+        days = np.searchsorted(local_day_edges(sessions.starts.min(), sessions.starts.max()), sessions.starts,
+                               side="right")
+        new_day = np.r_[True, (sessions.players[1:] != sessions.players[:-1]) | (days[1:] != days[:-1])]
+        day_counts = sessions.player_sum(new_day.astype(np.float64))
+        np.maximum.at(maxs, sessions.players, durations)
+
+    slices = sessions.player_slices()
+    starts, ends = sessions.starts.tolist(), sessions.ends.tolist()
+    for i, name in enumerate(sessions.names):
+        info = infos[name] = PlayerOnlineInfo(name, float(last_offline_times[i]))
+        info.join_server_time = float(join_times[i])
+        info.online_times = list(zip(starts[slices[i]:slices[i + 1]], ends[slices[i]:slices[i + 1]]))
+        if counts[i] == 0:
+            continue
+        info.total_online_time = float(totals[i])
+        info.today_online_time = float(window_totals[i])
+        info.avg_online_per_day = float(totals[i] / day_counts[i])
+        info.avg_online_per_session = float(totals[i] / counts[i])
+        info.max_online_per_session = float(maxs[i])
+    return infos
+
+
+def get_all_online_ranges(index: PlayerIndex) -> dict[str, list[tuple[float, float]]]:
+    """
+    获取所有玩家的在线时间段范围
+    :return: 一个字典，键为玩家名称，值为该玩家的所有在线时间段列表
+    """
+    sessions = SessionTable.from_index(index)
+    slices = sessions.player_slices()
+    starts, ends = sessions.starts.tolist(), sessions.ends.tolist()
+    return {name: list(zip(starts[slices[i]:slices[i + 1]], ends[slices[i]:slices[i + 1]]))
+            for i, name in enumerate(sessions.names)}
@@ -0,0 +1,84 @@
+"""
+按时间桶汇总在线时长
+计算一组时间段与每个时间桶的重叠时长之和, 以及按本地日历对齐的时间桶边界
+"""
+from datetime import datetime, timedelta
+from enum import Enum
+
+import numpy as np
+
+
+class BucketUnit(Enum):
+    HOUR = 0
+    DAY = 1
+    WEEK = 2
+    MONTH = 3
+
+
+def overlap_integral(starts: np.ndarray, ends: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """
+    计算每个时间点之前所有时间段的累计时长
+    tip: 对每个时间段 在 t 之前的时长 = (t - start) [start <= t] - (t - end) [end <= t],
+         分别对开始/结束时间排序并求前缀和后即可二分求出, 时间段可以重叠、无需有序
+    """
+    sorted_starts, sorted_ends = np.sort(starts), np.sort(ends)
+    start_sums = np.r_[0.0, np.cumsum(sorted_starts)]
+    end_sums = np.r_[0.0, np.cumsum(sorted_ends)]
+    started = np.searchsorted(sorted_starts, times, side="right")
+    ended = np.searchsorted(sorted_ends, times, side="right")
+    return (started * times - start_sums[started]) - (ended * times - end_sums[ended])
+
+
+def bucket_overlap(starts: np.ndarray, ends: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    计算所有时间段与每个时间桶 [edges[i], edges[i + 1]) 的重叠时长之和
+    :param edges: 升序的时间桶边界
+    :return: 长度为 len(edges) - 1 的数组
+    """
+    if len(starts) == 0 or len(edges) == 0:
+        return np.zeros(max(len(edges) - 1, 0))
+    base = edges[0]  # 以第一个边界为原点, 减小前缀和的数值以保证精度
+    return np.diff(overlap_integral(np.asarray(starts, dtype=np.float64) - base,
+                                    np.asarray(ends, dtype=np.float64) - base,
+                                    np.asarray(edges, dtype=np.float64) - base))
+
+
+def align_time(dt: datetime, unit: BucketUnit) -> datetime:
+    """把本地时间对齐到所在 小时/天/周(周一)/月 的开始"""
+    dt = dt.replace(minute=0, second=0, microsecond=0)
+    if unit == BucketUnit.HOUR:
+        return dt
+    dt = dt.replace(hour=0)
+    if unit == BucketUnit.WEEK:
+        return dt - timedelta(days=dt.weekday())
+    elif unit == BucketUnit.MONTH:
+        return dt.replace(day=1)
+    return dt
+
+
+def add_units(dt: datetime, unit: BucketUnit, count: int) -> datetime:
+    """在本地时间上增加 count 个单位 (按日历计算, 会处理夏令时与大小月)"""
+    if unit == BucketUnit.HOUR:
+        return dt + timedelta(hours=count)
+    elif unit == BucketUnit.DAY:
+        return dt + timedelta(days=count)
+    elif unit == BucketUnit.WEEK:
+        return dt + timedelta(weeks=count)
+    month = dt.year * 12 + dt.month - 1 + count
+    return dt.replace(year=month // 12, month=month % 12 + 1)
+
+
+def calendar_edges(end_time: float, unit: BucketUnit, count: int, step: int = 1) -> np.ndarray:
+    """
+    获取按本地日历对齐的时间桶边界
+    :param end_time: 最后一个时间桶包含该时间
+    :param unit: 时间桶的单位
+    :param count: 时间桶数量
+    :param step: 每个时间桶包含几个单位
+    :return: 长度为 count + 1 的升序时间戳数组
+    """
+    last = align_time(datetime.fromtimestamp(end_time), unit)
+    if unit == BucketUnit.HOUR:  # 小时按实际经过的时间计算, 避免夏令时切换时出现重复/不存在的本地时间
+        return last.timestamp() + 3600 * step * np.arange(-(count - 1), 2, dtype=np.float64)
+    first = add_units(last, unit, -(count - 1) * step)
+    return np.array([add_units(first, unit, i * step).timestamp() for i in range(count + 1)], dtype=np.float64)
@@ -0,0 +1,313 @@
+"""
+服务器状态获取
+使用 mcstatus 的异步接口, 在一个常驻的事件循环中获取状态, 状态与延迟同时请求, 地址解析结果会被缓存
+多个服务器共用这一个事件循环, 同时进行的请求数量由信号量限制
+获取全部玩家时一批批并发地请求玩家样本, 按优惠券收集问题估计还需要的请求数
+"""
+import asyncio
+from dataclasses import dataclass
+from math import ceil, log
+from random import uniform
+from threading import Thread, Lock
+from time import time, perf_counter
+from typing import Any, Callable, Coroutine
+
+from mcstatus import JavaServer
+from mcstatus.status_response import JavaStatusResponse
+
+from lib.config import config
+from lib.data import ServerPoint, Player, DataManager
+from lib.log import logger
+
+LOOKUP_CACHE_TIME = 300  # 地址解析结果的缓存时间 (秒)
+FP_TARGET_MISSING = 0.5  # 请求到 预计仍未见过的玩家数 低于该值为止
+FP_GIVE_UP_PROBABILITY = 0.01  # 一批请求没有新玩家, 而随机样本出现这种情况的概率低于该值时, 认为服务器的样本不是随机的
+
+
+def translate_status(status: JavaStatusResponse, ping: float) -> ServerPoint:
+    """
+    将Java版服务器状态响应对象转换为ServerPoint对象。
+
+    此函数负责解析给定的Java版服务器状态响应（status），并结合服务器的ping值，
+    创建并返回一个ServerPoint对象，该对象包含了服务器的当前在线玩家数、玩家样本列表和ping值，
+    以及记录这些数据的时间点。
+
+    参数:
+    - status: JavaStatusResponse对象，包含了服务器状态的详细信息。
+    - ping: 浮点数，代表服务器的ping值，即网络延迟。
+
+    返回:
+    - ServerPoint对象，封装了记录时间、在线玩家数、玩家列表和ping值。
+    """
+
+    # 如果状态响应中的玩家列表存在，则直接使用；否则初始化为空列表
+    raw_players = status.players.sample if status.players.sample else []
+
+    # 通过列表推导式，将原始玩家样本列表中的每个玩家转换为Player对象
+    players = [Player(p.name, p.id) for p in raw_players]
+
+    # 创建并返回ServerPoint对象，包含当前时间、在线玩家数、玩家列表和ping值
+    return ServerPoint(
+        time(),
+        status.players.online,
+        players,
+        ping,
+    )
+
+
+def needed_requests(known: int, online: int, sample_size: int) -> int:
+    """
+    估计还需要多少次请求才能见到剩下的玩家
+    tip: 每次请求随机返回 sample_size 个玩家时, 一个玩家 r 次都没出现的概率为 (1 - sample_size / online) ^ r,
+         取 r 使预计仍未见过的玩家数 missing * (1 - sample_size / online) ^ r 低于 FP_TARGET_MISSING
+    """
+    missing = online - known
+    if missing <= 0:
+        return 0
+    if sample_size >= online:
+        return 1
+    return max(ceil(log(FP_TARGET_MISSING / missing) / log(1 - sample_size / online)), 1)
+
+
+def no_new_probability(known: int, online: int, sample_size: int) -> float:
+    """一次随机样本中全都是已见过的玩家的概率: C(known, sample_size) / C(online, sample_size)"""
+    probability = 1.0
+    for i in range(min(sample_size, online)):
+        probability *= max(known - i, 0) / (online - i)
+    return probability
+
+
+class StatusCollector:
+    """
+    状态获取器
+    事件循环运行在自己的线程中, 同步代码 (状态线程) 通过 get_status 提交请求并等待结果
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="Collector", daemon=True)
+        self.thread.start()
+        self.servers: dict[str, tuple[float, JavaServer]] = {}  # 地址 -> (解析时间, 服务器)
+
+    def run(self, coro: Coroutine) -> Any:
+        """在事件循环中运行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def lookup(self, addr: str) -> JavaServer:
+        """解析服务器地址 (SRV记录等), 结果缓存 LOOKUP_CACHE_TIME 秒"""
+        cached = self.servers.get(addr)
+        if cached is not None and perf_counter() - cached[0] < LOOKUP_CACHE_TIME:
+            return cached[1]
+        server = await JavaServer.async_lookup(addr, timeout=config.time_out)
+        self.servers[addr] = (perf_counter(), server)
+        return server
+
+    async def fetch(self, addr: str, use_ping: bool = True) -> ServerPoint | None:
+        """获取一次服务器状态, 延迟与状态同时请求"""
+        try:
+            server = await self.lookup(addr)
+        except Exception as e:
+            logger.warning(f"解析服务器地址失败: {e}")
+            return None
+        ping_task = asyncio.create_task(server.async_ping()) if use_ping else None
+        try:
+            status = await server.async_status()
+        except Exception as e:
+            logger.warning(f"获取服务器状态失败: {e}")
+            self.servers.pop(addr, None)  # 可能是地址变了, 下次重新解析
+            if ping_task is not None:
+                ping_task.cancel()
+                await asyncio.gather(ping_task, return_exceptions=True)  # 取走异常, 避免事件循环报警告
+            return None
+        ping = 0
+        if ping_task is not None:
+            try:
+                ping = await ping_task
+            except Exception as e:
+                logger.warning(f"获取延迟失败: {e}, 跳过检测")
+        return translate_status(status, ping)
+
+    async def fetch_retry(self, addr: str, use_ping: bool = True) -> ServerPoint | None:
+        """获取服务器状态, 失败时最多重试 config.retry_times 次"""
+        tries = max(config.retry_times, 1)
+        for i in range(tries):
+            point = await self.fetch(addr, use_ping)
+            if point is not None:
+                return point
+            if i + 1 < tries:
+                logger.warning(f"尝试第[{i + 1}]次..")
+        logger.error(f"重试[{config.retry_times}]次获取服务器状态后失败")
+        return None
+
+    def get_status(self, addr: str, use_ping: bool = True) -> ServerPoint | None:
+        return self.run(self.fetch_retry(addr, use_ping))
+
+    async def sample_players(self, addr: str, point: ServerPoint, cancelled: Callable[[], bool],
+                             progress: Callable[[int, int], None]) -> ServerPoint:
+        """
+        一批批并发地获取状态, 合并玩家样本直到覆盖全部在线玩家
+        :param point: 第一次获取的数据点 (不会被修改)
+        :param cancelled: 返回True时停止获取
+        :param progress: 每批请求开始前调用, 参数为 (第几批, 剩余玩家数)
+        :return: 合并后的数据点, completeness 为玩家列表的完整度
+        """
+        players = set(point.players)
+        online, sample_size, last_time = point.online, len(point.players), point.time
+        requests = 0
+        for burst in range(config.fp_max_try):
+            if len(players) >= online or cancelled():
+                break
+            if sample_size == 0:
+                logger.debug("服务器没有返回玩家样本, 放弃获取完整玩家列表")
+                break
+            size = min(needed_requests(len(players), online, sample_size), max(config.fp_burst_size, 1))
+            progress(burst + 1, online - len(players))
+            samples = [sample for sample in await asyncio.gather(*(self.fetch(addr, False) for _ in range(size)))
+                       if sample is not None]
+            requests += size
+            if not samples:
+                logger.debug("完整玩家列表获取失败, 返回当前数据")
+                break
+            known, reset = len(players), False
+            for sample in samples:
+                if sample.online != online:  # 玩家数量发生变化
+                    logger.debug(f"过程中玩家数量发生变化, 重置玩家列表 ({online}->{sample.online})")
+                    players, online, reset = set(sample.players), sample.online, True
+                else:
+                    players |= set(sample.players)
+                sample_size = max(sample_size, len(sample.players))
+                last_time = max(last_time, sample.time)
+            logger.debug(f"第{burst + 1}批 ({len(samples)}/{size}个请求), 已获取 {len(players)}/{online} 个玩家")
+            if not reset and len(players) == known < online and \
+                    no_new_probability(known, online, sample_size) ** len(samples) < FP_GIVE_UP_PROBABILITY:
+                logger.debug("玩家样本没有变化, 样本可能不是随机的, 放弃获取完整玩家列表")
+                break
+            if len(players) < online:
+                await asyncio.sleep(config.fp_burst_inv)
+        completeness = min(len(players) / online, 1.0) if online else 1.0
+        logger.debug(f"完整玩家列表获取结束, 共 {requests} 个请求, 完整度 {completeness:.0%}")
+        return ServerPoint(last_time, online, list(players), point.ping, completeness=completeness)
+
+    def get_full_players(self, addr: str, point: ServerPoint, cancelled: Callable[[], bool],
+                         progress: Callable[[int, int], None]) -> ServerPoint:
+        return self.run(self.sample_players(addr, point, cancelled, progress))
+
+
+@dataclass
+class ServerTarget:
+    """一个被监测的服务器"""
+    name: str
+    addr: str
+    data_dir: str
+    check_inv: float | None = None  # 为None时使用全局的 check_inv
+
+    @property
+    def interval(self) -> float:
+        return self.check_inv if self.check_inv else config.check_inv
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ServerTarget":
+        return cls(data["name"], data["addr"], data.get("data_dir", f"./data_{data['name']}"), data.get("check_inv"))
+
+
+def get_server_targets() -> list[ServerTarget]:
+    """所有被监测的服务器: 主服务器 (config.addr) + config.servers"""
+    targets = [ServerTarget(config.server_name, config.addr, config.data_dir)]
+    for data in config.servers:
+        target = ServerTarget.from_dict(data)
+        if any(t.name == target.name for t in targets):
+            logger.warning(f"服务器名称重复, 已忽略 -> {target.name}")
+            continue
+        targets.append(target)
+    return targets
+
+
+class ServerMonitor:
+    """一个服务器的目标与数据, 数据在第一次使用时加载"""
+
+    def __init__(self, target: ServerTarget):
+        self.target = target
+        self.data_manager = DataManager(target.data_dir)
+        self.load_lock = Lock()
+        self.loaded = False
+
+    def ensure_loaded(self):
+        with self.load_lock:
+            if not self.loaded:
+                self.data_manager.load_data()
+                self.loaded = True
+
+    def add_point(self, point: ServerPoint | None) -> ServerPoint | None:
+        """保存一次获取的结果, 获取失败时按设置保存空数据点"""
+        if point is None and config.save_empty_pts:
+            point = ServerPoint.create_offline_point()
+        if point is not None:
+            self.data_manager.add_point(point)
+        return point
+
+
+class MultiCollector(StatusCollector):
+    """
+    同时监测多个服务器
+    每个后台服务器在事件循环中有一个轮询任务; 界面正在显示的服务器由状态线程获取, 不在后台轮询
+    """
+
+    def __init__(self, targets: list[ServerTarget]):
+        super().__init__()
+        self.monitors: dict[str, ServerMonitor] = {target.name: ServerMonitor(target) for target in targets}
+        self.semaphore = asyncio.Semaphore(max(config.collector_concurrency, 1))
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.writes: dict[str, asyncio.Future] = {}  # 后台任务正在进行的数据保存
+
+    async def fetch(self, addr: str, use_ping: bool = True) -> ServerPoint | None:
+        async with self.semaphore:
+            return await super().fetch(addr, use_ping)
+
+    async def poll_loop(self, monitor: ServerMonitor):
+        """后台轮询一个服务器"""
+        name = monitor.target.name
+        await asyncio.sleep(uniform(0, min(monitor.target.interval, 10)))  # 错开各个服务器的请求
+        logger.info(f"开始后台监测服务器 [{name}]")
+        while True:
+            started = perf_counter()
+            try:
+                await self.loop.run_in_executor(None, monitor.ensure_loaded)
+                point = await self.fetch_retry(monitor.target.addr, config.status_ping)
+                if config.enable_full_players and point is not None and len(point.players) < point.online:
+                    point = await self.sample_players(monitor.target.addr, point, lambda: False, lambda *_: None)
+                # 保存数据时会读写文件; 任务被取消时保存仍会进行完, 由 cancel_background 等待
+                write = self.writes[name] = self.loop.run_in_executor(None, monitor.add_point, point)
+                await asyncio.shield(write)
+            except Exception as e:
+                logger.error(f"后台监测服务器 [{name}] 时出错: {e}")
+            await asyncio.sleep(max(monitor.target.interval - (perf_counter() - started), 1))
+
+    def start_background(self, name: str):
+        """开始在后台轮询服务器"""
+        def start():
+            if name not in self.tasks:
+                self.tasks[name] = self.loop.create_task(self.poll_loop(self.monitors[name]))
+
+        self.loop.call_soon_threadsafe(start)
+
+    async def cancel_background(self, name: str):
+        """取消后台轮询任务, 并等待正在进行的数据保存完成"""
+        task = self.tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        write = self.writes.pop(name, None)
+        if write is not None:
+            await asyncio.gather(write, return_exceptions=True)
+
+    def stop_background(self, name: str):
+        """停止在后台轮询服务器, 返回后该服务器的数据不会再被后台任务修改"""
+        self.run(self.cancel_background(name))
+
+    def save_all(self):
+        for monitor in self.monitors.values():
+            if monitor.loaded:
+                monitor.data_manager.save_data()
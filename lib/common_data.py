@@ -1,7 +1,13 @@
 from lib.data import DataManager
+from lib.hour_stats import HourHistogramCache
+from lib.interval_index import SessionIndexCache
+from lib.player_index import PlayerIndex
 
 class CommonData:
     def __init__(self):
         self.data_manager: DataManager = ...
+        self.player_index: PlayerIndex = ...
+        self.session_index: SessionIndexCache = ...
+        self.hour_histograms: HourHistogramCache = ...
 
 common_data = CommonData()
\ No newline at end of file
@@ -21,6 +21,19 @@ class SkinLoadWay(Enum):
     CUSTOM_SERVER = 63
     FAILED = 64
 
+
+class PlotGapMode(Enum):
+    """图表中数据空隙的绘制方式"""
+    BREAK = 0  # 断开折线
+    HOLD = 1  # 保持上一个值
+
+
+class PlotBackend(Enum):
+    """状态图表的绘制后端"""
+    MATPLOTLIB = 0
+    WX_NATIVE = 1
+
+
 class PlayerColorPickWay(Enum):
     """玩家头颅颜色选择方式"""
     EYE_COLOR = 0
@@ -34,10 +47,13 @@ class Configer:
     """配置文件管理器"""
     addr: str = "127.0.0.1:25565"
     server_name: str = "MC服务器"
+    servers: list[dict] = []  # 同时监测的其他服务器, 每项为 {"name", "addr", "data_dir"(可选), "check_inv"(可选)}
+    active_server: str = ""  # 界面显示的服务器名称, 为空时为主服务器
     check_inv: int = 60.0
     points_per_file: int = 1200
     saved_per_points: int = 10
     fix_sep: float = 300.0
+    plot_gap_mode: PlotGapMode = PlotGapMode.BREAK
     plot_line_color: str = "#31AAC6"
     plot_fg_color: str = "#000000"
     plot_grid_color: str = "#B0B0B0"
@@ -45,21 +61,29 @@ class Configer:
     plot_line_width: float = 1.5
     plot_line_alpha: float = 0.8
     plot_max_scale: float = 200
+    plot_backend: PlotBackend = PlotBackend.MATPLOTLIB
     save_empty_pts: bool = True
     min_online_time: int = 60
     data_load_threads: int = 8
+    analysis_workers: int = 1
+    analysis_shard_points: int = 200000
     data_dir: str = "./data"
     enable_data_save: bool = True
     data_save_fmt: DataSaveFmt = DataSaveFmt.NORMAL
     time_out: float = 3.0
     retry_times: int = 3
+    collector_concurrency: int = 8  # 同时进行的状态请求数量上限
     enable_full_players: bool = False
-    fp_re_status_inv: float = 4.0
-    fp_max_try: int = 5
+    fp_burst_size: int = 8  # 获取全部玩家时每批同时发出的请求数
+    fp_burst_inv: float = 0.2  # 获取全部玩家时两批请求的间隔
+    fp_max_try: int = 5  # 获取全部玩家时最多发出几批请求
     status_ping: bool = True
     today_player_calc_way: int = 1
     tcw_custom_hours: int = 24
     tcw_custom_start: int = 4
+    active_min_days: int = 4
+    active_window_days: int = 7
+    active_day_start: int = 0
     skin_load_way: SkinLoadWay = SkinLoadWay.MOJANG
     custom_skin_server: str = ""
     custom_skin_root: str = ""
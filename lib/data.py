@@ -4,6 +4,7 @@
 定义数据存储类
 定义数据过滤类
 """
+from bisect import bisect_left, bisect_right
 from copy import copy
 from ctypes import windll
 from dataclasses import dataclass
@@ -81,12 +82,14 @@ def get_players_hash(players: list[dict[str, str]]) -> str:
 class ServerPoint:
     """数据点类"""
 
-    def __init__(self, time: float, online: int, players: list[Player], ping: float = 0, is_offline: bool = False, **_):
+    def __init__(self, time: float, online: int, players: list[Player], ping: float = 0, is_offline: bool = False,
+                 completeness: float = 1.0, **_):
         self.time = time  # (sec)
         self.online = online
         self.players = players
         self.ping = ping  # (ms)
         self.is_offline: bool = is_offline
+        self.completeness = completeness  # 获取全部玩家时, 玩家列表的估计完整度 (0~1)
         self.id_ = randbytes(8).hex()
 
     @classmethod
@@ -103,11 +106,13 @@ class ServerPoint:
             data["ping"] = self.ping
         if self.is_offline:
             data["is_offline"] = True
+        if self.completeness < 1:
+            data["completeness"] = self.completeness
         return data
 
     def copy(self, time: float = None):
         time = time if time is not None else self.time  # 替换或者用本身的值
-        return ServerPoint(time, self.online, self.players, self.ping, self.is_offline)
+        return ServerPoint(time, self.online, self.players, self.ping, self.is_offline, self.completeness)
 
     @staticmethod
     def from_dict(dic: dict) -> "ServerPoint":
@@ -115,6 +120,66 @@ class ServerPoint:
         return ServerPoint(**dic, players=players)
 
 
+class TimeIndex:
+    """
+    按时间排序的数据点索引
+    提供 数据点 <-> 排序位置 的二分查找, 以及批量删除
+    """
+
+    def __init__(self):
+        self.times: list[float] = []
+        self.points: list[ServerPoint] = []
+
+    def __len__(self):
+        return len(self.points)
+
+    def build(self, sorted_points: list[ServerPoint]):
+        """用已按时间排序的数据点重建"""
+        self.points = list(sorted_points)
+        self.times = [point.time for point in self.points]
+
+    def add(self, point: ServerPoint) -> int:
+        """
+        添加一个数据点
+        :return: 数据点的位置
+        """
+        index = bisect_right(self.times, point.time)
+        self.times.insert(index, point.time)
+        self.points.insert(index, point)
+        return index
+
+    def index_of(self, point: ServerPoint) -> int:
+        """获取数据点的位置, 不存在时抛出 KeyError"""
+        index = bisect_left(self.times, point.time)
+        while index < len(self.points) and self.times[index] == point.time:
+            if self.points[index].id_ == point.id_:
+                return index
+            index += 1
+        raise KeyError(point.id_)
+
+    def remove_many(self, points: list[ServerPoint]) -> list[int]:
+        """
+        批量删除数据点, 整个批次只重建一次列表
+        :return: 被删除的数据点原来的位置 (升序)
+        """
+        indexes = sorted({self.index_of(point) for point in points})
+        if not indexes:
+            return []
+        times, kept_points, last = [], [], 0
+        for index in indexes:
+            times.extend(self.times[last:index])
+            kept_points.extend(self.points[last:index])
+            last = index + 1
+        times.extend(self.times[last:])
+        kept_points.extend(self.points[last:])
+        self.times, self.points = times, kept_points
+        return indexes
+
+    def range(self, from_time: float, to_time: float) -> tuple[int, int]:
+        """获取时间在 [from_time, to_time] 内的数据点的位置范围 [start, stop)"""
+        return bisect_left(self.times, from_time), bisect_right(self.times, to_time)
+
+
 def dumps_player_list_mapping(points: list[dict]):
     player_list_map: dict[str, list[dict[str, str]]] = {}
     for i, pt in enumerate(points):
@@ -163,6 +228,8 @@ class DataManager:
         self.data_dir = data_dir
         self.non_saved_counter = 0
         self.points_map: dict[str, ServerPoint] = {}
+        self.time_index = TimeIndex()  # 按时间排序的数据点
+        self.version = 0  # 数据点每次增删后递增, 用于判断缓存是否过期
         self.data_files: list[str] = []
         self.ranges_cache: dict[Player, list[tuple[float, float]]] = {}
         if not exists(self.data_dir):
@@ -181,6 +248,8 @@ class DataManager:
         """
         with self.data_ctl_lock:
             self.points_map[point.id_] = point
+            self.time_index.add(point)
+            self.version += 1
             self.non_saved_counter += 1
         if self.non_saved_counter >= config.saved_per_points:
             self.save_data()
@@ -200,9 +269,21 @@ class DataManager:
         删除一个数据点
         :param point: 数据点
         """
+        self.remove_points([point])
+
+    def remove_points(self, points: list[ServerPoint]) -> list[int]:
+        """
+        批量删除数据点
+        :param points: 数据点列表
+        :return: 被删除的数据点在时间索引中原来的位置 (升序)
+        """
         with self.data_ctl_lock:
-            self.points_map.pop(point.id_)
+            indexes = self.time_index.remove_many(points)
+            for point in points:
+                self.points_map.pop(point.id_, None)
+            self.version += 1
         self.ranges_cache.clear()
+        return indexes
 
     def load_data(self):
         """从文件夹中查找并加载数据点"""
@@ -235,6 +316,8 @@ class DataManager:
 
             sorted_points = sorted(self.points_map.values(), key=lambda pt: pt.time)
             self.points_map = {point.id_: point for point in sorted_points}
+            self.time_index.build(sorted_points)
+            self.version += 1
         logger.info(f"加载完成, 共 {len(self.points_map)} 个数据点, 耗时 {timer.endT()}")
 
     def load_a_file(self, file_path: str, lock: Lock):
@@ -356,42 +439,19 @@ class DataManager:
             logger.info(f"保存文件 [{hash_hex + '.json'}]")
         self.data_files.append(hash_hex + ".json")
 
-    def get_all_online_ranges(self) -> dict[str, list[tuple[float, float]]]:
+    def get_players_at(self, timestamp: float) -> set[str]:
         """
-        获取所有玩家的在线时间段范围
-        :return: 一个字典，键为玩家名称，值为该玩家的所有在线时间段列表
+        获取某时刻在线的玩家
+        tip: 使用该时刻及之前最近的数据点, 与它相距超过 fix_sep 时视为没有数据, 返回空集合
         """
-        player_active_times: dict[str, list[tuple[float, float | None]]] = {}  # 记录每个玩家的在线时间段
-        range_start_players: dict[str, float] = {}
-        last_players = set()  # 上一个数据点中的玩家集合
-        last_point = None
-        points_len = len(self.points_map)
         with self.data_ctl_lock:
-            for i, point in enumerate(self.points):
-                now_players = set(p.name for p in point.players)  # 当前数据点中的玩家集合
-
-                # 处理新上线的玩家
-                for player in now_players - last_players:
-                    range_start_players[player] = point.time
-
-                # 处理下线的玩家
-                for player in last_players - now_players:
-                    if player not in player_active_times:
-                        player_active_times[player] = []
-                    player_active_times[player].append((range_start_players.pop(player), point.time))  # 记录上线时间
-
-                last_players = now_players
-                if i == points_len - 1:
-                    last_point = point
-
-        # 处理仍然在线的玩家
-        for player, start in range_start_players.items():
-            if player not in player_active_times:
-                player_active_times[player] = []
-            player_active_times[player].append((start, last_point.time))
-
-        # 转换为元组形式
-        return player_active_times
+            index = bisect_right(self.time_index.times, timestamp) - 1
+            if index < 0:
+                return set()
+            point = self.time_index.points[index]
+        if timestamp - point.time > config.fix_sep:
+            return set()
+        return {player.name for player in point.players}
 
     def get_player_online_ranges(self, player_name: str) -> list[tuple[float, float]]:
         """
@@ -439,3 +499,9 @@ class DataFilter:
         if self.from_time is None and self.to_time is None:
             return True
         return self.from_time <= point.time <= self.to_time
+
+    def slice(self, time_index: TimeIndex) -> tuple[int, int]:
+        """获取时间索引中通过过滤的数据点的位置范围 [start, stop)"""
+        if self.from_time is None and self.to_time is None:
+            return 0, len(time_index)
+        return time_index.range(self.from_time, self.to_time)
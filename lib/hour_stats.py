@@ -0,0 +1,82 @@
+"""
+玩家逐小时在线统计
+把在线时间段按本地时间的整点切分, 统计 每天各小时 / 每周各天各小时 的在线占比
+"""
+from threading import Lock
+from time import localtime
+
+import numpy as np
+
+from lib.buckets import bucket_overlap
+from lib.interval_index import SessionIndexCache
+
+
+def local_offsets(times: np.ndarray) -> np.ndarray:
+    """
+    获取每个时间戳的本地时区偏移 (秒)
+    tip: 只对每个 (UTC) 日期的首尾调用 localtime, 首尾偏移不同 (夏令时切换) 的那天才逐个计算
+    """
+    days = np.floor(times / 86400).astype(np.int64)
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    day_first = np.array([localtime(int(day) * 86400).tm_gmtoff for day in unique_days], dtype=np.int64)
+    day_last = np.array([localtime(int(day) * 86400 + 86399).tm_gmtoff for day in unique_days], dtype=np.int64)
+    offsets = day_first[inverse]
+    changed = (day_first != day_last)[inverse]
+    offsets[changed] = [localtime(int(t)).tm_gmtoff for t in times[changed]]
+    return offsets
+
+
+class HourHistogram:
+    """一个玩家的逐小时在线占比"""
+
+    def __init__(self, hours: np.ndarray, week: np.ndarray, days: int):
+        self.hours = hours  # (24,) 每天各小时平均在线的比例
+        self.week = week  # (7, 24) 周一至周日 各小时平均在线的比例
+        self.days = days  # 有在线的天数
+
+
+def hour_histogram(starts: np.ndarray, ends: np.ndarray) -> HourHistogram:
+    """
+    计算逐小时在线占比
+    先得到每个整点小时内的在线时长, 再按 小时 / 星期×小时 分组求和
+    """
+    if len(starts) == 0:
+        return HourHistogram(np.zeros(24), np.zeros((7, 24)), 0)
+    first_offset = localtime(int(starts[0])).tm_gmtoff
+    first = np.floor((starts[0] + first_offset) / 3600) * 3600 - first_offset
+    edges = np.arange(first, ends.max() + 3600, 3600, dtype=np.float64)
+    online = bucket_overlap(starts, ends, edges)
+    local = edges[:-1] + local_offsets(edges[:-1])
+    hours = (local // 3600 % 24).astype(np.int64)
+    day_numbers = (local // 86400).astype(np.int64)
+    weekdays = (day_numbers + 3) % 7  # 1970-01-01 是星期四
+
+    active_days = np.unique(day_numbers[online > 0])
+    day_count = len(active_days)
+    weekday_days = np.bincount((active_days + 3) % 7, minlength=7)
+    hour_totals = np.bincount(hours, weights=online, minlength=24)
+    week_totals = np.bincount(weekdays * 24 + hours, weights=online, minlength=7 * 24).reshape(7, 24)
+    return HourHistogram(hour_totals / max(day_count, 1) / 3600,
+                         week_totals / np.maximum(weekday_days, 1)[:, None] / 3600,
+                         day_count)
+
+
+class HourHistogramCache:
+    """按 玩家, 数据版本 缓存逐小时在线统计"""
+
+    def __init__(self, sessions: SessionIndexCache):
+        self.sessions = sessions
+        self.lock = Lock()
+        self.cache: dict[str, tuple[int, HourHistogram]] = {}
+
+    def get(self, player: str) -> HourHistogram:
+        session_index = self.sessions.get()
+        version = session_index.version
+        with self.lock:
+            cached = self.cache.get(player)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        histogram = hour_histogram(*session_index.player_sessions(player))
+        with self.lock:
+            self.cache[player] = (version, histogram)
+        return histogram
@@ -0,0 +1,152 @@
+"""
+在线时间段的区间索引
+用中心区间树回答 "某时刻谁在线" / "某时间范围内谁在线", 用每个玩家的前缀和回答 "某玩家在某时间范围内的在线时长"
+"""
+from threading import Lock
+
+import numpy as np
+
+from lib.analysis import SessionTable
+from lib.player_index import PlayerIndex
+
+
+class IntervalTree:
+    """
+    静态的中心区间树, 时间段为闭区间 [start, end]
+    每个节点保存跨越中心点的时间段 (分别按开始/结束时间排序), 查询某时刻时只需沿一条路径向下
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+        # 节点: (中心, 按开始排序的序号, 排序后的开始时间, 按结束排序的序号, 排序后的结束时间, 左子节点, 右子节点)
+        self.nodes: list[tuple] = []
+        self.root = self.build(np.arange(len(starts), dtype=np.int64)) if len(starts) else -1
+
+    def build(self, indexes: np.ndarray) -> int:
+        starts, ends = self.starts[indexes], self.ends[indexes]
+        # 使用所有端点的中位数作为中心, 左右子树各自最多包含一半的时间段
+        center = float(np.median(np.concatenate([starts, ends])))
+        crossing = (starts <= center) & (ends >= center)
+        node = len(self.nodes)
+        self.nodes.append(())
+        cross = indexes[crossing]
+        by_start = cross[np.argsort(self.starts[cross], kind="stable")]
+        by_end = cross[np.argsort(self.ends[cross], kind="stable")]
+        left = right = -1
+        if not crossing.all():
+            left_indexes = indexes[ends < center]
+            right_indexes = indexes[starts > center]
+            left = self.build(left_indexes) if len(left_indexes) else -1
+            right = self.build(right_indexes) if len(right_indexes) else -1
+        self.nodes[node] = (center, by_start, self.starts[by_start], by_end, self.ends[by_end], left, right)
+        return node
+
+    def stab(self, time: float) -> np.ndarray:
+        """获取包含 time 的所有时间段的序号"""
+        result = []
+        node = self.root
+        while node != -1:
+            center, by_start, starts, by_end, ends, left, right = self.nodes[node]
+            if time < center:  # 跨越中心的时间段结束时间都 >= time
+                result.append(by_start[:np.searchsorted(starts, time, side="right")])
+                node = left
+            elif time > center:  # 跨越中心的时间段开始时间都 <= time
+                result.append(by_end[np.searchsorted(ends, time, side="left"):])
+                node = right
+            else:
+                result.append(by_start)
+                break
+        return np.concatenate(result) if result else np.empty(0, dtype=np.int64)
+
+
+class SessionIndex:
+    """
+    所有玩家在线时间段的索引
+    tip: 同一玩家的时间段互不重叠, 且在 SessionTable 中按开始时间排列
+    """
+
+    def __init__(self, table: SessionTable, version: int = -1):
+        self.table = table
+        self.version = version  # 建立索引时的数据版本
+        self.tree = IntervalTree(table.starts, table.ends)
+        self.start_order = np.argsort(table.starts, kind="stable")
+        self.sorted_starts = table.starts[self.start_order]
+        self.slices = table.player_slices()
+        self.cum_durations = np.r_[0.0, np.cumsum(table.durations)]  # 同一玩家的时间段是连续的, 区间和即为前缀和之差
+        self.player_ids = {name: i for i, name in enumerate(table.names)}
+
+    @classmethod
+    def from_ranges(cls, ranges: dict[str, list[tuple[float, float]]]) -> "SessionIndex":
+        """从 玩家名称 -> 在线时间段列表 的字典建立索引"""
+        names = [name for name, times in ranges.items() if times]
+        counts = [len(ranges[name]) for name in names]
+        flat = np.array([time_range for name in names for time_range in ranges[name]],
+                        dtype=np.float64).reshape(-1, 2)
+        players = np.repeat(np.arange(len(names), dtype=np.int64), counts)
+        order = np.lexsort((flat[:, 0], players))
+        return cls(SessionTable(names, players[order], flat[order, 0], flat[order, 1]))
+
+    @property
+    def total_online_time(self) -> float:
+        return float(self.cum_durations[-1])
+
+    def overlapping(self, from_time: float, to_time: float) -> np.ndarray:
+        """获取与 [from_time, to_time] 相交的所有时间段的序号"""
+        in_range = self.start_order[np.searchsorted(self.sorted_starts, from_time, side="right"):
+                                    np.searchsorted(self.sorted_starts, to_time, side="right")]
+        return np.concatenate([self.tree.stab(from_time), in_range])
+
+    def players_at(self, time: float) -> set[str]:
+        """获取在 time 时在线的玩家"""
+        return {self.table.names[i] for i in np.unique(self.table.players[self.tree.stab(time)])}
+
+    def players_between(self, from_time: float, to_time: float) -> set[str]:
+        """获取在 [from_time, to_time] 内在线过的玩家"""
+        return {self.table.names[i] for i in np.unique(self.table.players[self.overlapping(from_time, to_time)])}
+
+    def player_sessions(self, player: str) -> tuple[np.ndarray, np.ndarray]:
+        """获取某玩家的所有时间段 (开始时间数组, 结束时间数组)"""
+        i = self.player_ids.get(player)
+        if i is None:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+        lo, hi = self.slices[i], self.slices[i + 1]
+        return self.table.starts[lo:hi], self.table.ends[lo:hi]
+
+    def player_span(self, player: str, from_time: float, to_time: float) -> tuple[int, int]:
+        """获取某玩家与 [from_time, to_time] 相交的时间段在表中的范围 [first, last)"""
+        i = self.player_ids.get(player)
+        if i is None:
+            return 0, 0
+        lo, hi = self.slices[i], self.slices[i + 1]
+        first = lo + np.searchsorted(self.table.ends[lo:hi], from_time, side="left")
+        last = lo + np.searchsorted(self.table.starts[lo:hi], to_time, side="right")
+        return int(first), int(max(first, last))
+
+    def online_seconds(self, player: str, from_time: float, to_time: float) -> float:
+        """某玩家在 [from_time, to_time] 内的在线时长"""
+        first, last = self.player_span(player, from_time, to_time)
+        if first == last:
+            return 0.0
+        total = self.cum_durations[last] - self.cum_durations[first]
+        total -= max(from_time - self.table.starts[first], 0)  # 减去超出范围的首尾部分
+        total -= max(self.table.ends[last - 1] - to_time, 0)
+        return float(total)
+
+
+class SessionIndexCache:
+    """原始在线时间段的索引, 数据变化后在下一次使用时重建, 供各个面板共用"""
+
+    def __init__(self, index: PlayerIndex):
+        self.index = index
+        self.lock = Lock()
+        self.version = -1
+        self.session_index: SessionIndex | None = None
+
+    def get(self) -> SessionIndex:
+        with self.lock:
+            snapshot = self.index.sync()
+            if self.session_index is None or self.version != snapshot.version:
+                self.version = snapshot.version
+                self.session_index = SessionIndex(SessionTable.from_snapshot(snapshot), snapshot.version)
+            return self.session_index
@@ -0,0 +1,82 @@
+"""
+后台任务管理
+提供可取消的任务, 同类任务同时只运行一个, 相同的任务不会重复提交
+"""
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Hashable
+
+from lib.log import logger
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class CancelToken:
+    """任务的取消标志, 由任务在合适的地方调用 check 检查"""
+
+    def __init__(self):
+        self._event = Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """任务已被取消时抛出 JobCancelled"""
+        if self._event.is_set():
+            raise JobCancelled
+
+
+class Job:
+    def __init__(self, key: Hashable, token: CancelToken, thread: Thread):
+        self.key = key  # 用于判断两个任务是否相同
+        self.token = token
+        self.thread = thread
+
+    @property
+    def running(self) -> bool:
+        return self.thread.is_alive() and not self.token.cancelled
+
+
+class JobManager:
+    """
+    同一类任务的管理器
+    提交新任务时会取消正在运行的旧任务, 如果正在运行的任务与新任务相同则不会重复提交
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = Lock()
+        self.job: Job | None = None
+
+    def submit(self, key: Hashable, func: Callable[..., Any], *args) -> Job:
+        """
+        提交一个任务
+        :param key: 任务的标识, 相同标识的任务正在运行时直接返回它
+        :param func: 任务函数, 第一个参数为 CancelToken
+        """
+        with self.lock:
+            if self.job is not None and self.job.running and self.job.key == key:
+                logger.debug(f"[{self.name}] 相同的任务正在运行, 不重复提交")
+                return self.job
+            self.cancel()
+            token = CancelToken()
+            thread = Thread(name=f"{self.name}-Job", target=self.run, args=(func, token, args), daemon=True)
+            self.job = Job(key, token, thread)
+            thread.start()
+            return self.job
+
+    def run(self, func: Callable[..., Any], token: CancelToken, args: tuple):
+        try:
+            func(token, *args)
+        except JobCancelled:
+            logger.debug(f"[{self.name}] 任务已取消")
+
+    def cancel(self):
+        """取消正在运行的任务"""
+        if self.job is not None:
+            self.job.token.cancel()
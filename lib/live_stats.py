@@ -0,0 +1,179 @@
+"""
+玩家在线信息的实时更新
+在一次完整分析的结果上, 根据每次获取到的数据点中 玩家的上线/下线 增量更新统计信息
+"""
+from time import localtime
+
+import numpy as np
+
+from lib.analysis import PlayerOnlineInfo, SessionTable
+from lib.data import ServerPoint
+
+
+def day_key(timestamp: float) -> tuple[int, int, int]:
+    return localtime(timestamp)[:3]
+
+
+class LivePlayer:
+    """
+    一个玩家的增量统计状态
+    已确定的时间段 (committed) 不会再变化, 最后一个时间段 (tail) 可能仍在线, 或者会与下一次上线合并
+    """
+
+    def __init__(self, info: PlayerOnlineInfo):
+        self.info = info
+        self.total: float = 0  # 已确定的时间段的统计
+        self.count: int = 0
+        self.max: float = 0
+        self.window_total: float = 0
+        self.day_count: int = 0
+        self.last_day: tuple[int, int, int] | None = None
+        self.tail_start: float = 0
+        self.tail_end: float = 0
+        self.has_tail = False
+        self.tail_shown = False  # tail 是否已在 info.online_times 中
+
+    def commit_tail(self, min_online_time: float, window: tuple[float, float] | None):
+        """把最后一个时间段确定下来, 短于 min_online_time 的会被丢弃"""
+        if not self.has_tail:
+            return
+        duration = self.tail_end - self.tail_start
+        if duration >= min_online_time:
+            self.total += duration
+            self.count += 1
+            self.max = max(self.max, duration)
+            self.window_total += clip_duration(self.tail_start, self.tail_end, window)
+            day = day_key(self.tail_start)
+            if day != self.last_day:
+                self.day_count += 1
+                self.last_day = day
+        self.has_tail = self.tail_shown = False
+
+    def recount_window(self, window: tuple[float, float] | None):
+        """重新统计已确定的时间段在 window 内的时长, 时间段按开始时间排列且互不重叠, 只需从后往前扫描到范围开始处"""
+        committed = self.info.online_times[:-1] if self.tail_shown else self.info.online_times
+        total = 0.0
+        for start, end in reversed(committed):
+            if window is not None and end <= window[0]:
+                break
+            total += clip_duration(start, end, window)
+        self.window_total = total
+
+    def refresh_info(self, min_online_time: float, window: tuple[float, float] | None):
+        """用 已确定的统计 + 最后一个时间段 计算展示的信息"""
+        info = self.info
+        total, count, max_, window_total, day_count = self.total, self.count, self.max, self.window_total, self.day_count
+        shown = self.has_tail and self.tail_end - self.tail_start >= min_online_time
+        if shown:
+            duration = self.tail_end - self.tail_start
+            total += duration
+            count += 1
+            max_ = max(max_, duration)
+            window_total += clip_duration(self.tail_start, self.tail_end, window)
+            day_count += day_key(self.tail_start) != self.last_day
+            if self.tail_shown:
+                info.online_times[-1] = (self.tail_start, self.tail_end)
+            else:
+                info.online_times.append((self.tail_start, self.tail_end))
+        elif self.tail_shown:
+            info.online_times.pop()
+        self.tail_shown = shown
+        if self.has_tail:
+            info.last_offline_time = self.tail_end
+        info.total_online_time = total
+        info.today_online_time = window_total
+        info.max_online_per_session = max_
+        info.avg_online_per_session = total / count if count else 0
+        info.avg_online_per_day = total / day_count if day_count else 0
+
+
+def clip_duration(start: float, end: float, window: tuple[float, float] | None) -> float:
+    if window is None:
+        return end - start
+    return max(min(end, window[1]) - max(start, window[0]), 0)
+
+
+class LiveStats:
+    """
+    所有玩家的在线信息, 每个数据点只更新 上线/下线/在线 的玩家, 不需要重新分析全部数据
+    """
+
+    def __init__(self, infos: dict[str, PlayerOnlineInfo], raw: SessionTable, min_online_time: float,
+                 window: tuple[float, float] | None, version: int = -1):
+        """
+        :param infos: 完整分析的结果
+        :param raw: 完整分析使用的原始在线时间段
+        :param version: 分析使用的数据版本, 数据被其它方式修改 (删除数据点) 后统计不再可靠
+        """
+        self.infos = infos
+        self.version = version
+        self.min_online_time = min_online_time
+        self.window = window
+        self.players: dict[str, LivePlayer] = {}
+        self.online: set[str] = set(raw.online)
+        self.last_time: float = raw.last_time
+        self.init_from_sessions(raw)
+
+    def init_from_sessions(self, raw: SessionTable):
+        """从完整分析的结果中拆出每个玩家的最后一个 (合并后, 未删除短时间段的) 时间段"""
+        merged = raw.merge_gaps(self.min_online_time)
+        slices = merged.player_slices()
+        for i, name in enumerate(merged.names):
+            info = self.infos.get(name)
+            if info is None or slices[i] == slices[i + 1]:
+                continue
+            player = self.players[name] = LivePlayer(info)
+            last = slices[i + 1] - 1
+            player.has_tail = True
+            player.tail_start, player.tail_end = float(merged.starts[last]), float(merged.ends[last])
+            # 已确定的部分 = 分析结果 - 最后一个时间段
+            committed = info.online_times
+            if committed and committed[-1] == (player.tail_start, player.tail_end):
+                committed = committed[:-1]
+                player.tail_shown = True
+            durations = np.array([end - start for start, end in committed])
+            player.total = float(durations.sum())
+            player.count = len(committed)
+            player.max = float(durations.max()) if len(committed) else 0
+            player.window_total = float(sum(clip_duration(s, e, self.window) for s, e in committed))
+            for start, _ in committed:
+                day = day_key(start)
+                if day != player.last_day:
+                    player.day_count += 1
+                    player.last_day = day
+
+    def set_window(self, window: tuple[float, float] | None):
+        """更换计算 "今天在线时长" 的时间范围 (例如过了零点), 重新统计每个玩家在范围内的时长"""
+        self.window = window
+        for player in self.players.values():
+            player.recount_window(window)
+            player.refresh_info(self.min_online_time, window)
+
+    def update(self, point: ServerPoint) -> tuple[set[str], set[str]]:
+        """
+        根据新的数据点更新统计
+        :return: 信息有变化的玩家, 其中新出现的玩家
+        """
+        if point.time <= self.last_time:  # 已经包含在分析结果中
+            return set(), set()
+        now = {p.name for p in point.players}
+        joined, left = now - self.online, self.online - now
+        new_players = set()
+        for name in joined:
+            player = self.players.get(name)
+            if player is None:
+                info = self.infos[name] = PlayerOnlineInfo(name, point.time)
+                player = self.players[name] = LivePlayer(info)
+                new_players.add(name)
+            if player.has_tail and point.time - player.tail_end < self.min_online_time:  # 与上一个时间段合并
+                continue
+            player.commit_tail(self.min_online_time, self.window)
+            player.has_tail = True
+            player.tail_start = player.tail_end = point.time
+        for name in now | left:
+            player = self.players[name]
+            player.tail_end = point.time  # 下线的玩家的时间段结束于第一个不在线的数据点
+            player.refresh_info(self.min_online_time, self.window)
+        self.online = now
+        self.last_time = point.time
+        return now | left, new_players
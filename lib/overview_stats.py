@@ -0,0 +1,146 @@
+"""
+总览面板的统计数字
+玩家总数、今日在线、活跃人数、总在线时长 在每次获取到数据点时增量更新, 读取时不需要遍历数据
+活跃人数使用每个玩家的在线日期位图 (每天一位), 任意 "最近M天中至少N天在线" 的查询都只需数位
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from lib.analysis import local_day_edges
+from lib.data import ServerPoint
+from lib.interval_index import SessionIndex
+
+
+def day_ordinal(timestamp: float, day_start: int = 0) -> int:
+    """获取时间戳所在的日期序号, 一天从 day_start 点开始"""
+    return (datetime.fromtimestamp(timestamp) - timedelta(hours=day_start)).date().toordinal()
+
+
+@dataclass
+class ActiveRule:
+    """活跃玩家的规则: 最近 window_days 天 (包括今天) 中至少 min_days 天在线过"""
+    min_days: int
+    window_days: int
+
+    def __str__(self):
+        return f"{self.window_days}天内{self.min_days}天在线"
+
+
+class OverviewCounters:
+    """
+    总览统计的增量状态
+    tip: 时间段的定义与原始在线时间段相同, 玩家在线到第一个不在线的数据点为止
+    """
+
+    def __init__(self, rule: ActiveRule, day_start: int = 0):
+        self.rule = rule
+        self.day_start = day_start  # 一天从几点开始
+        self.version = -1  # 对应的数据版本
+        self.known_players: set[str] = set()
+        self.total_online_time: float = 0
+        self.last_time: float | None = None  # 最后一个数据点的时间
+        self.last_players: set[str] = set()  # 最后一个数据点中在线的玩家
+        self.last_seen: dict[str, float] = {}  # 玩家最后在线的时间
+        self.today_start: float = 0
+        self.today_seen: OrderedDict[str, float] = OrderedDict()  # today_start 之后在线过的玩家, 按最后在线时间排序
+        self.base_day = 0  # 位图第0位对应的日期序号
+        self.day_bits: dict[str, int] = {}  # 玩家在线过的日期位图
+        self.today = 0  # active_players 对应的日期序号
+        self.active_players: set[str] = set()
+
+    def rebuild(self, index: SessionIndex, version: int, now: float):
+        """从在线时间段索引重建全部状态"""
+        table = index.table
+        self.version = version
+        self.known_players = set(table.names)
+        self.total_online_time = index.total_online_time
+        self.last_time = table.last_time if len(table) else None
+        self.last_players = set(table.online)
+        slices = table.player_slices()
+        self.last_seen = {name: float(table.ends[slices[i + 1] - 1]) for i, name in enumerate(table.names)
+                          if slices[i + 1] > slices[i]}
+        self.set_today_start(self.today_start, force=True)
+
+        self.day_bits.clear()
+        if len(table):
+            self.build_day_bits(table.names, table.players, table.starts, table.ends)
+        self.update_active(day_ordinal(now, self.day_start))
+
+    def build_day_bits(self, names: list[str], players: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+        """把每个时间段覆盖的日期 [开始日期, 结束日期] 写入位图"""
+        edges = local_day_edges(float(starts.min()), float(ends.max()), self.day_start)
+        self.base_day = day_ordinal(edges[0], self.day_start)
+        first_days = (np.searchsorted(edges, starts, side="right") - 1).tolist()
+        last_days = (np.searchsorted(edges, ends, side="right") - 1).tolist()
+        for player, first, last in zip(players.tolist(), first_days, last_days):
+            name = names[player]
+            self.day_bits[name] = self.day_bits.get(name, 0) | (((1 << (last - first + 1)) - 1) << first)
+
+    def add_point(self, point: ServerPoint, version: int):
+        """添加一个追加到末尾的数据点"""
+        now_players = {player.name for player in point.players}
+        if self.last_time is not None:
+            self.total_online_time += len(self.last_players) * (point.time - self.last_time)
+        touched = now_players | self.last_players  # 刚下线的玩家在线到这个数据点为止
+        day = day_ordinal(point.time, self.day_start)
+        if not self.day_bits:
+            self.base_day = day
+        if day != self.today:
+            self.update_active(day)
+        bit = 1 << (day - self.base_day)
+        for name in touched:
+            self.last_seen[name] = point.time
+            if point.time >= self.today_start:
+                self.today_seen[name] = point.time
+                self.today_seen.move_to_end(name)
+            bits = self.day_bits.get(name, 0)
+            if not bits & bit:
+                bits = self.day_bits[name] = bits | bit
+                if self.is_active(bits, self.rule, day):
+                    self.active_players.add(name)
+        self.known_players |= now_players
+        self.last_players = now_players
+        self.last_time = point.time
+        self.version = version
+
+    def window_bits(self, bits: int, window_days: int, today: int) -> int:
+        """取出位图中 最近 window_days 天 (包括 today) 的部分"""
+        shift = today - window_days + 1 - self.base_day
+        bits = bits >> shift if shift >= 0 else bits << -shift
+        return bits & ((1 << window_days) - 1)
+
+    def is_active(self, bits: int, rule: ActiveRule, today: int) -> bool:
+        return self.window_bits(bits, rule.window_days, today).bit_count() >= rule.min_days
+
+    def count_active(self, rule: ActiveRule, today: int) -> set[str]:
+        """获取符合任意规则的活跃玩家"""
+        return {name for name, bits in self.day_bits.items() if self.is_active(bits, rule, today)}
+
+    def update_active(self, today: int):
+        """日期变化或规则变化后重新计算活跃玩家"""
+        self.today = today
+        self.active_players = self.count_active(self.rule, today)
+
+    def set_rule(self, rule: ActiveRule):
+        self.rule = rule
+        self.update_active(self.today)
+
+    def set_today_start(self, start: float, force: bool = False):
+        """设置 "今日在线" 的开始时间, 开始时间向后移动时只需移除过期的玩家"""
+        if force or start < self.today_start:
+            self.today_seen = OrderedDict(sorted(((name, seen) for name, seen in self.last_seen.items()
+                                                  if seen >= start), key=lambda item: item[1]))
+        else:
+            while self.today_seen and next(iter(self.today_seen.values())) < start:
+                self.today_seen.popitem(last=False)
+        self.today_start = start
+
+    def refresh(self, now: float, today_start: float):
+        """使时间窗口跟随当前时间"""
+        self.set_today_start(today_start)
+        today = day_ordinal(now, self.day_start)
+        if today != self.today:
+            self.update_active(today)
@@ -0,0 +1,170 @@
+"""
+玩家倒排索引
+记录每个玩家出现在哪些数据点中 (按时间索引中的位置, 以连续区间的形式保存)
+"""
+from threading import Lock
+
+import numpy as np
+
+from lib.data import DataManager, ServerPoint
+from lib.log import logger
+from lib.perf import Counter
+
+
+class PlayerRuns:
+    """一个玩家出现过的数据点位置, 以 [start, stop) 的连续区间保存"""
+
+    def __init__(self):
+        self.starts: list[int] = []
+        self.stops: list[int] = []
+
+    def add(self, position: int):
+        if self.stops and self.stops[-1] == position:  # 与上一个区间连续
+            self.stops[-1] = position + 1
+        else:
+            self.starts.append(position)
+            self.stops.append(position + 1)
+
+    def __len__(self):
+        return len(self.starts)
+
+
+def frozen_array(values: list[int]) -> np.ndarray:
+    array = np.array(values, dtype=np.int64)
+    array.setflags(write=False)
+    return array
+
+
+class IndexSnapshot:
+    """
+    玩家索引某一版本的只读快照
+    tip: 快照中的数组不会再被修改, 可以在任意线程中使用, 不需要持有索引的锁
+    """
+
+    def __init__(self, version: int, runs: dict[str, tuple[np.ndarray, np.ndarray]], times: np.ndarray):
+        self.version = version  # 快照对应的数据版本
+        self.runs = runs  # 玩家名称 -> (区间开始数组, 区间结束数组)
+        self.times = times  # 所有数据点的时间, 与区间中的位置对应
+
+    def find_players(self, query: str) -> list[str]:
+        """
+        查找名称匹配的玩家
+        :param query: 玩家名称, 完全匹配 (不区分大小写) 时只返回该玩家, 否则返回名称包含它的玩家
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        exact = [name for name in self.runs if name.lower() == query]
+        if exact:
+            return exact
+        return [name for name in self.runs if query in name.lower()]
+
+    def get_runs(self, names: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        获取这些玩家任意一人在线的数据点位置区间 (已合并, 升序)
+        :return: 区间开始数组, 区间结束数组
+        """
+        runs = [self.runs[name] for name in names if name in self.runs]
+        if not runs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        if len(runs) == 1:
+            return runs[0]
+        starts = np.concatenate([r[0] for r in runs])
+        stops = np.concatenate([r[1] for r in runs])
+        order = np.argsort(starts, kind="stable")
+        starts, stops = starts[order], np.maximum.accumulate(stops[order])
+        new_run = np.r_[True, starts[1:] > stops[:-1]]  # 与前面的区间不相交
+        ends = np.r_[np.flatnonzero(new_run)[1:] - 1, len(starts) - 1]
+        return starts[new_run], stops[ends]
+
+
+class PlayerIndex:
+    """
+    玩家名称 -> 出现的数据点位置区间
+    tip: 只在数据点追加到末尾时增量更新, 其它修改 (删除/乱序插入) 会在下一次使用时完整重建
+    读取索引时使用 sync 返回的快照, 不要直接读取 runs / times (它们会被其它线程的 sync 原地修改)
+    """
+
+    def __init__(self, data_manager: DataManager):
+        self.data_manager = data_manager
+        self.runs: dict[str, PlayerRuns] = {}
+        self.version = -1  # 索引对应的数据版本
+        self.indexed = 0  # 已索引的数据点数量
+        self.last_point: ServerPoint | None = None  # 已索引的最后一个数据点
+        self.times = np.empty(0, dtype=np.float64)  # 已索引的数据点的时间
+        self.frozen: dict[str, tuple[np.ndarray, np.ndarray]] = {}  # 每个玩家的区间的只读副本
+        self.snapshot = IndexSnapshot(-1, {}, self.times)
+        self.lock = Lock()
+
+    def sync(self) -> IndexSnapshot:
+        """
+        使索引与数据管理器保持一致, 并返回最新的快照
+        tip: 只在数据管理器的锁内取出需要索引的数据点, 建立索引时不阻塞数据点的添加与查询
+        """
+        dm = self.data_manager
+        snapshot = self.snapshot
+        if snapshot.version == dm.version:
+            return snapshot
+        with self.lock:
+            with dm.data_ctl_lock:
+                version = dm.version
+                if self.version == version:
+                    return self.snapshot
+                points = dm.time_index.points
+                appended = len(points) - self.indexed
+                only_appended = (self.last_point is not None and appended == version - self.version
+                                 and points[self.indexed - 1] is self.last_point)
+                new_points = points[self.indexed:] if only_appended else list(points)
+            if only_appended:
+                changed = self.index_points(new_points, self.indexed)
+            else:
+                changed = self.rebuild(new_points)
+            for name in changed:
+                runs = self.runs[name]
+                self.frozen[name] = frozen_array(runs.starts), frozen_array(runs.stops)
+            self.times.setflags(write=False)
+            self.version = version
+            self.snapshot = IndexSnapshot(version, dict(self.frozen), self.times)
+            return self.snapshot
+
+    def rebuild(self, points: list[ServerPoint]) -> set[str]:
+        timer = Counter()
+        timer.start()
+        self.runs = {}
+        self.frozen = {}
+        changed = self.index_points(points, 0)
+        logger.debug(f"玩家索引重建用时: {timer.endT()}, 共 {len(self.runs)} 个玩家")
+        return changed
+
+    def index_points(self, points: list[ServerPoint], offset: int) -> set[str]:
+        """
+        索引从位置 offset 开始的数据点
+        :return: 区间有变化的玩家
+        """
+        changed = set()
+        for position, point in enumerate(points, offset):
+            for player in point.players:
+                runs = self.runs.get(player.name)
+                if runs is None:
+                    runs = self.runs[player.name] = PlayerRuns()
+                runs.add(position)
+                changed.add(player.name)
+        self.times = np.concatenate([self.times[:offset], [point.time for point in points]])
+        self.indexed = offset + len(points)
+        if points:
+            self.last_point = points[-1]
+        elif offset == 0:
+            self.last_point = None
+        return changed
+
+    def get_times(self) -> np.ndarray:
+        """获取所有数据点的时间数组, 与区间中的位置对应"""
+        return self.sync().times
+
+    def find_players(self, query: str) -> list[str]:
+        """查找名称匹配的玩家, 见 IndexSnapshot.find_players"""
+        return self.sync().find_players(query)
+
+    def get_runs(self, names: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """获取这些玩家任意一人在线的数据点位置区间, 见 IndexSnapshot.get_runs"""
+        return self.sync().get_runs(names)
@@ -0,0 +1,186 @@
+"""
+图表数据瓦片金字塔
+把数据点按缩放级别聚合成固定桶数的瓦片, 并用LRU缓存起来
+无论选择的时间范围是一小时还是三年, 图表平移/缩放时只需要处理与屏幕宽度相当的数据量
+"""
+from collections import OrderedDict
+from math import ceil, log2
+
+import numpy as np
+
+TILE_BUCKETS = 256  # 每个瓦片的桶数量
+BASE_BUCKET_WIDTH = 1.0  # 第0级每个桶的时间宽度 (秒), 第n级为 BASE_BUCKET_WIDTH * 2^n
+MAX_LEVEL = 40
+RAW_POINTS_PER_PIXEL = 2  # 可视范围内数据点少于 像素数*该值 时直接使用原始数据点
+TILE_CACHE_SIZE = 512
+
+
+class PlotTile:
+    """一个瓦片: 某个级别下固定时间范围内按桶聚合的 最小/最大/平均 在线人数"""
+
+    def __init__(self, times: np.ndarray, mins: np.ndarray, maxs: np.ndarray, means: np.ndarray):
+        self.times = times  # 每个非空桶的中心时间
+        self.mins = mins
+        self.maxs = maxs
+        self.means = means
+
+
+class PlotView:
+    """图表某一可视范围内用于绘制的数组"""
+
+    def __init__(self, times: np.ndarray, values: np.ndarray, mins: np.ndarray | None = None,
+                 maxs: np.ndarray | None = None, bucket_width: float = 0):
+        self.times = times
+        self.values = values
+        self.mins = mins  # 聚合视图的最小值包络, 原始视图为None
+        self.maxs = maxs
+        self.bucket_width = bucket_width  # 原始视图为0
+
+    @property
+    def is_raw(self) -> bool:
+        return self.mins is None
+
+
+def bucket_width(level: int) -> float:
+    return BASE_BUCKET_WIDTH * (2 ** level)
+
+
+def tile_span(level: int) -> float:
+    return bucket_width(level) * TILE_BUCKETS
+
+
+class TilePyramid:
+    """
+    按时间排序的数据点数组 + 按需计算的多级瓦片
+    tip: 只缓存被访问过的瓦片, 新数据点只会让它所在的瓦片失效
+    """
+
+    def __init__(self, cache_size: int = TILE_CACHE_SIZE):
+        self._times = np.empty(0, dtype=np.float64)
+        self._values = np.empty(0, dtype=np.float64)
+        self.length = 0
+        self.cache_size = cache_size
+        self.cache: OrderedDict[tuple[int, int], PlotTile] = OrderedDict()
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[:self.length]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:self.length]
+
+    @property
+    def time_range(self) -> tuple[float, float]:
+        return float(self._times[0]), float(self._times[self.length - 1])
+
+    def __len__(self):
+        return self.length
+
+    def set_data(self, times: list[float], values: list[float]):
+        """用已排序的数据重建"""
+        self._times = np.array(times, dtype=np.float64)
+        self._values = np.array(values, dtype=np.float64)
+        self.length = len(self._times)
+        self.cache.clear()
+
+    def append(self, time_: float, value: float):
+        """添加一个数据点, 并使包含它的瓦片失效"""
+        if self.length and time_ < self._times[self.length - 1]:  # 乱序的数据点, 直接重建
+            index = int(np.searchsorted(self.times, time_))
+            self.set_data(np.insert(self.times, index, time_), np.insert(self.values, index, value))
+            return
+        if self.length == len(self._times):  # 扩容
+            capacity = max(64, self.length * 2)
+            self._times = np.resize(self._times, capacity)
+            self._values = np.resize(self._values, capacity)
+        self._times[self.length] = time_
+        self._values[self.length] = value
+        self.length += 1
+        for level in range(MAX_LEVEL + 1):
+            self.cache.pop((level, int(time_ // tile_span(level))), None)
+
+    def nearest_time(self, time_: float) -> float | None:
+        """获取 不晚于给定时间 的数据点时间"""
+        if self.length == 0:
+            return None
+        index = int(np.searchsorted(self.times, time_, side="right")) - 1
+        return float(self._times[max(index, 0)])
+
+    @staticmethod
+    def level_for(span: float, pixels: int) -> int:
+        """获取 每个桶宽度不小于一个像素对应时间 的级别"""
+        per_pixel = span / max(pixels, 1)
+        if per_pixel <= BASE_BUCKET_WIDTH:
+            return 0
+        return min(MAX_LEVEL, ceil(log2(per_pixel / BASE_BUCKET_WIDTH)))
+
+    def get_tile(self, level: int, index: int) -> PlotTile:
+        key = (level, index)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        tile = self.compute_tile(level, index)
+        self.cache[key] = tile
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return tile
+
+    def compute_tile(self, level: int, index: int) -> PlotTile:
+        """从数据点数组计算一个瓦片"""
+        width = bucket_width(level)
+        tile_start = index * tile_span(level)
+        lo, hi = np.searchsorted(self.times, [tile_start, tile_start + tile_span(level)])
+        seg_times = self._times[lo:hi]
+        seg_values = self._values[lo:hi]
+        if len(seg_times) == 0:
+            empty = np.empty(0, dtype=np.float64)
+            return PlotTile(empty, empty, empty, empty)
+        buckets = np.minimum(((seg_times - tile_start) // width).astype(np.int64), TILE_BUCKETS - 1)
+        firsts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])  # 每个非空桶的第一个数据点
+        counts = np.diff(np.r_[firsts, len(seg_times)])
+        return PlotTile(
+            tile_start + (buckets[firsts] + 0.5) * width,
+            np.minimum.reduceat(seg_values, firsts),
+            np.maximum.reduceat(seg_values, firsts),
+            np.add.reduceat(seg_values, firsts) / counts,
+        )
+
+    def tile_indexes(self, level: int, start: float, end: float) -> range:
+        span = tile_span(level)
+        return range(int(start // span), int(end // span) + 1)
+
+    def view(self, start: float, end: float, pixels: int) -> PlotView:
+        """
+        获取可视范围 [start, end] 的绘制数组
+        数据点较少时返回原始数据点 (两侧各多取一个, 保证折线连续), 否则返回对应级别的聚合瓦片
+        """
+        lo, hi = np.searchsorted(self.times, [start, end])
+        if hi - lo <= pixels * RAW_POINTS_PER_PIXEL:
+            lo, hi = max(lo - 1, 0), min(hi + 1, self.length)
+            return PlotView(self._times[lo:hi], self._values[lo:hi])
+        level = self.level_for(end - start, pixels)
+        tiles = [self.get_tile(level, i) for i in self.tile_indexes(level, start, end)]
+        return PlotView(
+            np.concatenate([t.times for t in tiles]),
+            np.concatenate([t.means for t in tiles]),
+            np.concatenate([t.mins for t in tiles]),
+            np.concatenate([t.maxs for t in tiles]),
+            bucket_width(level),
+        )
+
+    def prefetch(self, start: float, end: float, pixels: int):
+        """预先计算可视范围两侧, 以及相邻级别的瓦片, 供拖动/缩放时使用"""
+        if self.length == 0:
+            return
+        level = self.level_for(end - start, pixels)
+        data_start, data_end = self.time_range
+        for lv in (level, level - 1, level + 1):
+            if not 0 <= lv <= MAX_LEVEL:
+                continue
+            indexes = self.tile_indexes(lv, start, end)
+            for index in (indexes.start - 1, *indexes, indexes.stop):
+                span = tile_span(lv)
+                if index * span > data_end or (index + 1) * span < data_start:
+                    continue
+                self.get_tile(lv, index)